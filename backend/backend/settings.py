@@ -69,6 +69,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',      
     'corsheaders', 
     'userapp',
@@ -194,7 +195,7 @@ CORS_ALLOW_ALL_ORIGINS = True  # For development only
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'userapp.authentication.UserCookieJWTAuthentication',
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'userapp.authentication.CachedJWTAuthentication',
 
     ],
     'DEFAULT_PERMISSION_CLASSES': [
@@ -225,6 +226,13 @@ SIMPLE_JWT = {
 
 AUTH_USER_MODEL = 'userapp.User'
 
+# Verified-token and user cache used by the JWT authenticators (see userapp/auth_cache.py)
+AUTH_CACHE = {
+    'LOCAL_MAXSIZE': 1024,
+    'LOCAL_TTL': 30,    # seconds; bounds how long another process may serve a stale user
+    'REDIS_TTL': 300,
+}
+
 AUTHENTICATION_BACKENDS = [
     'userapp.backends.EmailBackend',
 ]
@@ -257,10 +265,29 @@ cloudinary.config(
 RAZORPAY_KEY_ID = config('RAZORPAY_KEY_ID')
 RAZORPAY_KEY_SECRET = config('RAZORPAY_KEY_SECRET')
 
+# Payment gateway client (userapp.payments); BACKEND 'fake' keeps orders in memory
+PAYMENT_GATEWAY = {
+    'BACKEND': config('PAYMENT_GATEWAY_BACKEND', default='razorpay'),
+    'CONNECT_TIMEOUT': 3.05,   # seconds
+    'READ_TIMEOUT': 10,
+    'POOL_SIZE': 20,           # keep-alive connections per process
+    'MAX_RETRIES': 2,
+    'BACKOFF': 0.2,            # seconds, doubled per retry, with full jitter
+    'BACKOFF_MAX': 2,
+    'BREAKER_THRESHOLD': 5,    # consecutive failures that open the circuit
+    'BREAKER_RESET': 30,       # seconds before a trial call is let through
+}
+
 WEBRTC_CONFIG = {
     'SESSION_DURATIONS': [15, 25, 50],
     'MAX_PARTICIPANTS': 8,
     'ENABLE_CHAT': True,
+    # Trickle ICE candidates are coalesced per (sender, target) for this long, 0 disables
+    'ICE_BATCH_WINDOW_MS': 30,
+    'ICE_BATCH_MAX_SIZE': 10,
+    # Cached WebSocket admission verdicts: host/approved/mentor vs pending/rejected/not-registered
+    'ACCESS_CACHE_TTL': 300,
+    'ACCESS_CACHE_SHORT_TTL': 30,
     'ICE_SERVERS': [
         {
             'urls': ['stun:stun.l.google.com:19302']
@@ -273,6 +300,57 @@ WEBRTC_CONFIG = {
     ]
 }
 
+# Presence registry for WebRTC rooms, shared by all signalling workers
+PRESENCE_CONFIG = {
+    'REDIS_URL': config('PRESENCE_REDIS_URL', default='redis://redis:6379/2'),
+    'TTL': 60,  # seconds a participant stays present without a heartbeat
+    'HEARTBEAT_INTERVAL': 20,
+}
+
+# Admin platform statistics snapshot (focusadminapp.metrics)
+PLATFORM_METRICS = {
+    'REFRESH_INTERVAL': 60,  # seconds between scheduled rebuilds
+    'STALE_AFTER': 300,      # readers queue a rebuild once the snapshot is this old
+}
+
+# Mentor schedules (userapp.availability). Availability and booked sessions are
+# wall-clock times in this zone, as in send_session_reminders.
+MENTOR_SCHEDULE = {
+    'TIMEZONE': 'Asia/Kolkata',
+    'HORIZON_DAYS': 14,    # how far ahead next_available_at looks
+    'UPCOMING_SLOTS': 5,   # open slots listed on mentor cards
+}
+
+# Mentor browse facet counts (userapp.mentor_facets); also invalidated on mentor changes
+MENTOR_FACETS_CACHE_TTL = 600
+
+# Mentor session checkout (userapp.slot_holds): a slot stays reserved for the
+# student who created a payment order this many seconds, or until they confirm
+SLOT_HOLDS = {
+    'TTL': 600,
+}
+
+# Booking side-effects outbox (userapp.outbox)
+OUTBOX = {
+    'BATCH_SIZE': 100,
+    'MAX_ATTEMPTS': 5,
+    'RETRY_BACKOFF': 30,    # seconds before the first retry, doubled after each failure
+    'RETENTION_DAYS': 7,    # dispatched events are purged after this
+    'LEASE': 300,           # seconds a claimed batch is hidden from other workers while it runs
+}
+
+# How long a confirmed booking's response is replayed from the cache for
+# retries (userapp.booking_confirmations); after that it is rebuilt from the row
+BOOKING_CONFIRMATION_TTL = 86400
+
+# Admin dashboard cache (focusadminapp.dashboard_cache), all in seconds
+ADMIN_DASHBOARD_CACHE = {
+    'METRICS_MAX_AGE': 18000,  # key metrics are also invalidated by dependency versions
+    'USAGE_MAX_AGE': 300,      # usage buckets roll over with the clock
+    'ENTRY_TIMEOUT': 86400,    # how long a stale entry may still be served
+    'LOCK_TTL': 60,            # bounds a refresh whose worker died
+}
+
 # Celery
 CELERY_BROKER_URL = config('CELERY_BROKER_URL', default='redis://redis:6379/0')
 CELERY_RESULT_BACKEND = config('CELERY_RESULT_BACKEND', default='redis://redis:6379/0')
@@ -286,6 +364,30 @@ CELERY_BEAT_SCHEDULE = {
         'task': 'userapp.tasks.send_session_reminders',
         'schedule': 60.0,  
     },
+    'expire-focus-sessions': {
+        'task': 'userapp.tasks.expire_focus_sessions',
+        'schedule': 30.0,
+    },
+    'dispatch-outbox': {
+        'task': 'userapp.tasks.dispatch_outbox',
+        'schedule': 15.0,  # safety net; commits queue a dispatch themselves
+    },
+    'purge-outbox-events': {
+        'task': 'userapp.tasks.purge_outbox_events',
+        'schedule': 86400.0,
+    },
+    'snapshot-ledger-balances': {
+        'task': 'userapp.tasks.snapshot_ledger_balances',
+        'schedule': 3600.0,
+    },
+    'refresh-mentor-availability': {
+        'task': 'userapp.tasks.refresh_mentor_availability',
+        'schedule': 300.0,
+    },
+    'refresh-platform-metrics': {
+        'task': 'focusadminapp.tasks.refresh_platform_metrics_task',
+        'schedule': float(PLATFORM_METRICS['REFRESH_INTERVAL']),
+    },
 }
 
 GOOGLE_CLIENT_ID = config('GOOGLE_CLIENT_ID')
@@ -0,0 +1,157 @@
+"""
+Versioned, dependency-tracked cache for the admin dashboard.
+
+Every cached entry (a single key metric, or the usage series for a period)
+declares the data it depends on. Each dependency has a version counter in
+the cache, and model signals bump only the counters whose inputs changed.
+An entry remembers the versions it was computed from, so a bump makes just
+the affected entries stale; nothing is deleted.
+
+Reads are stale-while-revalidate: a stale entry is still served while one
+Celery worker, elected with cache.add(), recomputes it in the background.
+Only an entry that has never been computed is built inline.
+"""
+import logging
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from userapp.models import FocusBuddySession, Mentor, MentorApprovalRequest, MentorSession, User
+
+from .analytics import USAGE_PERIODS, usage_for_period
+
+logger = logging.getLogger(__name__)
+
+KEY_METRICS = {
+    'registered_users': (('users',), lambda: User.objects.count()),
+    'approved_mentors': (('approved_mentors',), lambda: Mentor.objects.filter(is_approved=True).count()),
+    'total_focus_sessions': (('focus_sessions',), lambda: FocusBuddySession.objects.count()),
+    'total_mentor_sessions': (('mentor_sessions',), lambda: MentorSession.objects.count()),
+    'pending_mentor_approvals': (
+        ('mentor_approvals',),
+        lambda: MentorApprovalRequest.objects.filter(status='pending').count(),
+    ),
+}
+
+
+def _usage_entry(period):
+    return f"usage:{period}"
+
+
+def _entries():
+    """name -> (dependencies, max age in seconds, compute)"""
+    config = settings.ADMIN_DASHBOARD_CACHE
+    entries = {
+        name: (dependencies, config['METRICS_MAX_AGE'], compute)
+        for name, (dependencies, compute) in KEY_METRICS.items()
+    }
+    for period in USAGE_PERIODS:
+        # Buckets also roll over with the clock, so usage expires sooner
+        entries[_usage_entry(period)] = (
+            ('focus_sessions', 'mentor_sessions'),
+            config['USAGE_MAX_AGE'],
+            lambda period=period: usage_for_period(period),
+        )
+    return entries
+
+
+def _entry_key(name):
+    return f"admin_dashboard:entry:{name}"
+
+
+def _version_key(dependency):
+    return f"admin_dashboard:version:{dependency}"
+
+
+def _lock_key(name):
+    return f"admin_dashboard:refresh:{name}"
+
+
+def bump(*dependencies):
+    """Mark every entry that depends on these inputs as stale"""
+    for dependency in dependencies:
+        key = _version_key(dependency)
+        try:
+            cache.incr(key)
+        except ValueError:
+            # Unset counts as version 0, so starting at 1 still invalidates
+            cache.add(key, 1, timeout=None)
+
+
+def _versions(dependencies):
+    keys = {dependency: _version_key(dependency) for dependency in dependencies}
+    values = cache.get_many(list(keys.values()))
+    return {dependency: values.get(key, 0) for dependency, key in keys.items()}
+
+
+def refresh(name):
+    """Recompute one entry and store it with the versions it was built from"""
+    dependencies, _, compute = _entries()[name]
+    # Read versions first so a change during the compute leaves the entry stale
+    versions = _versions(dependencies)
+    value = compute()
+    cache.set(
+        _entry_key(name),
+        {'value': value, 'versions': versions, 'computed_at': time.time()},
+        timeout=settings.ADMIN_DASHBOARD_CACHE['ENTRY_TIMEOUT'],
+    )
+    return value
+
+
+def schedule_refresh(name):
+    """Queue a background recompute unless another worker already owns it"""
+    if not cache.add(_lock_key(name), True, settings.ADMIN_DASHBOARD_CACHE['LOCK_TTL']):
+        return
+    from .tasks import refresh_dashboard_entry
+    try:
+        refresh_dashboard_entry.delay(name)
+    except Exception as e:
+        logger.warning(f"Could not queue dashboard refresh for {name}, recomputing inline: {e}")
+        try:
+            refresh(name)
+        finally:
+            release_refresh(name)
+
+
+def release_refresh(name):
+    cache.delete(_lock_key(name))
+
+
+def get_entries(names):
+    """
+    Read several entries with two cache round trips, serving stale values
+    while they are recomputed in the background.
+
+    Returns:
+        dict: {name: value}
+    """
+    entries = _entries()
+    cached = cache.get_many([_entry_key(name) for name in names])
+    versions = _versions({dependency for name in names for dependency in entries[name][0]})
+    now = time.time()
+
+    values = {}
+    for name in names:
+        dependencies, max_age, _ = entries[name]
+        entry = cached.get(_entry_key(name))
+        if entry is None:
+            values[name] = refresh(name)
+            continue
+
+        current = {dependency: versions[dependency] for dependency in dependencies}
+        if entry['versions'] != current or now - entry['computed_at'] > max_age:
+            schedule_refresh(name)
+        values[name] = entry['value']
+    return values
+
+
+def get_key_metrics():
+    return get_entries(list(KEY_METRICS))
+
+
+def get_usage_data(period):
+    if period not in USAGE_PERIODS:
+        raise ValueError(f"Unknown period: {period}")
+    name = _usage_entry(period)
+    return get_entries([name])[name]
@@ -0,0 +1,127 @@
+"""
+Materialized platform statistics.
+
+compute_platform_metrics() gathers every figure on the admin stats page with
+one conditional aggregate per table. refresh_platform_metrics() stores the
+result in the PlatformMetricsSnapshot row, so AdminPlatformStatsView reads a
+single row however large the tables grow. The snapshot is rewritten on the
+beat schedule; readers get its age and trigger a refresh when it is overdue.
+"""
+import logging
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Avg, Count, Q, Sum
+from django.utils import timezone
+
+from userapp.models import (
+    FocusBuddySession, Journal, Mentor, MentorSession, SessionPayment, Task, User
+)
+
+from .models import PlatformMetricsSnapshot
+
+logger = logging.getLogger(__name__)
+
+REFRESH_LOCK_KEY = "platform_metrics_refresh_lock"
+
+METRIC_FIELDS = (
+    'total_users', 'active_users_today', 'active_users_week', 'active_users_month',
+    'total_mentors', 'active_mentors', 'pending_mentors',
+    'total_sessions', 'completed_sessions', 'cancelled_sessions',
+    'total_focus_sessions', 'active_focus_sessions',
+    'total_tasks', 'completed_tasks',
+    'total_journal_entries', 'journal_entries_today',
+    'avg_session_rating', 'total_revenue',
+)
+
+
+def compute_platform_metrics():
+    """Compute every platform statistic, one aggregate query per table"""
+    now = timezone.now()
+    today_start = timezone.localtime(now).replace(hour=0, minute=0, second=0, microsecond=0)
+
+    users = User.objects.aggregate(
+        total_users=Count('id'),
+        active_users_today=Count('id', filter=Q(last_login__gte=today_start)),
+        active_users_week=Count('id', filter=Q(last_login__gte=now - timedelta(days=7))),
+        active_users_month=Count('id', filter=Q(last_login__gte=now - timedelta(days=30))),
+    )
+    mentors = Mentor.objects.aggregate(
+        total_mentors=Count('id'),
+        active_mentors=Count('id', filter=Q(is_approved=True, is_available=True)),
+        pending_mentors=Count('id', filter=Q(approval_status='pending')),
+    )
+    sessions = MentorSession.objects.aggregate(
+        total_sessions=Count('id'),
+        completed_sessions=Count('id', filter=Q(status='completed')),
+        cancelled_sessions=Count('id', filter=Q(status='cancelled')),
+        avg_session_rating=Avg('student_rating'),
+    )
+    focus_sessions = FocusBuddySession.objects.aggregate(
+        total_focus_sessions=Count('id'),
+        active_focus_sessions=Count('id', filter=Q(status='active')),
+    )
+    tasks = Task.objects.aggregate(
+        total_tasks=Count('id'),
+        completed_tasks=Count('id', filter=Q(is_completed=True)),
+    )
+    journals = Journal.objects.aggregate(
+        total_journal_entries=Count('id'),
+        journal_entries_today=Count('id', filter=Q(created_at__gte=today_start)),
+    )
+    revenue = SessionPayment.objects.filter(status='completed').aggregate(
+        total_revenue=Sum('amount'),
+    )
+
+    metrics = {**users, **mentors, **sessions, **focus_sessions, **tasks, **journals, **revenue}
+    metrics['avg_session_rating'] = round(Decimal(metrics['avg_session_rating'] or 0), 2)
+    metrics['total_revenue'] = metrics['total_revenue'] or 0
+    return metrics
+
+
+def refresh_platform_metrics():
+    """Recompute the statistics and overwrite the snapshot row"""
+    started = time.monotonic()
+    metrics = compute_platform_metrics()
+    snapshot, _ = PlatformMetricsSnapshot.objects.update_or_create(
+        pk=PlatformMetricsSnapshot.SINGLETON_ID,
+        defaults={
+            **metrics,
+            'computed_at': timezone.now(),
+            'compute_ms': int((time.monotonic() - started) * 1000),
+        },
+    )
+    return snapshot
+
+
+def get_platform_metrics():
+    """
+    Read the snapshot row, computing it inline only if it has never been built.
+
+    Returns:
+        tuple: (snapshot, staleness in seconds)
+    """
+    snapshot = PlatformMetricsSnapshot.objects.filter(
+        pk=PlatformMetricsSnapshot.SINGLETON_ID
+    ).first()
+    if snapshot is None:
+        snapshot = refresh_platform_metrics()
+
+    staleness = max(0.0, (timezone.now() - snapshot.computed_at).total_seconds())
+    if staleness > settings.PLATFORM_METRICS['STALE_AFTER']:
+        request_refresh()
+    return snapshot, staleness
+
+
+def request_refresh():
+    """Queue one background refresh, e.g. when the beat schedule has fallen behind"""
+    if not cache.add(REFRESH_LOCK_KEY, True, settings.PLATFORM_METRICS['REFRESH_INTERVAL']):
+        return
+    from .tasks import refresh_platform_metrics_task
+    try:
+        refresh_platform_metrics_task.delay()
+    except Exception as e:
+        logger.warning(f"Could not queue platform metrics refresh: {e}")
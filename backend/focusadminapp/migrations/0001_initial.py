@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PlatformMetricsSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_users', models.PositiveIntegerField(default=0)),
+                ('active_users_today', models.PositiveIntegerField(default=0)),
+                ('active_users_week', models.PositiveIntegerField(default=0)),
+                ('active_users_month', models.PositiveIntegerField(default=0)),
+                ('total_mentors', models.PositiveIntegerField(default=0)),
+                ('active_mentors', models.PositiveIntegerField(default=0)),
+                ('pending_mentors', models.PositiveIntegerField(default=0)),
+                ('total_sessions', models.PositiveIntegerField(default=0)),
+                ('completed_sessions', models.PositiveIntegerField(default=0)),
+                ('cancelled_sessions', models.PositiveIntegerField(default=0)),
+                ('total_focus_sessions', models.PositiveIntegerField(default=0)),
+                ('active_focus_sessions', models.PositiveIntegerField(default=0)),
+                ('total_tasks', models.PositiveIntegerField(default=0)),
+                ('completed_tasks', models.PositiveIntegerField(default=0)),
+                ('total_journal_entries', models.PositiveIntegerField(default=0)),
+                ('journal_entries_today', models.PositiveIntegerField(default=0)),
+                ('avg_session_rating', models.DecimalField(decimal_places=2, default=0, max_digits=3)),
+                ('total_revenue', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('computed_at', models.DateTimeField()),
+                ('compute_ms', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+    ]
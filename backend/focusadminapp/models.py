@@ -1,3 +1,42 @@
 from django.db import models
 
 # Create your models here.
+
+
+class PlatformMetricsSnapshot(models.Model):
+    """
+    Precomputed platform statistics for the admin stats page.
+    A single row, rewritten by the refresh_platform_metrics task.
+    """
+    total_users = models.PositiveIntegerField(default=0)
+    active_users_today = models.PositiveIntegerField(default=0)
+    active_users_week = models.PositiveIntegerField(default=0)
+    active_users_month = models.PositiveIntegerField(default=0)
+
+    total_mentors = models.PositiveIntegerField(default=0)
+    active_mentors = models.PositiveIntegerField(default=0)
+    pending_mentors = models.PositiveIntegerField(default=0)
+
+    total_sessions = models.PositiveIntegerField(default=0)
+    completed_sessions = models.PositiveIntegerField(default=0)
+    cancelled_sessions = models.PositiveIntegerField(default=0)
+
+    total_focus_sessions = models.PositiveIntegerField(default=0)
+    active_focus_sessions = models.PositiveIntegerField(default=0)
+
+    total_tasks = models.PositiveIntegerField(default=0)
+    completed_tasks = models.PositiveIntegerField(default=0)
+
+    total_journal_entries = models.PositiveIntegerField(default=0)
+    journal_entries_today = models.PositiveIntegerField(default=0)
+
+    avg_session_rating = models.DecimalField(max_digits=3, decimal_places=2, default=0)
+    total_revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    computed_at = models.DateTimeField()
+    compute_ms = models.PositiveIntegerField(default=0)
+
+    SINGLETON_ID = 1
+
+    def __str__(self):
+        return f"Platform metrics at {self.computed_at}"
@@ -0,0 +1,135 @@
+"""
+Keyset (cursor) pagination for admin list endpoints.
+
+Pages are read newest first on a (timestamp, id) ordering. The cursor
+encodes the last row of the previous page, so every page is an index range
+scan instead of an OFFSET that gets slower the deeper it goes. Totals come
+from Postgres statistics for large tables instead of a full count().
+"""
+import base64
+import json
+
+from django.db import connections
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+# Below this many rows an exact count is cheap, and more useful than an estimate
+EXACT_COUNT_BELOW = 10000
+
+
+def _reltuples(queryset):
+    """Planner row estimate for the whole table, None if it was never analyzed"""
+    with connections[queryset.db].cursor() as cursor:
+        cursor.execute(
+            "SELECT reltuples FROM pg_class WHERE oid = %s::regclass",
+            [queryset.model._meta.db_table],
+        )
+        row = cursor.fetchone()
+    if row is None or row[0] < 0:
+        return None
+    return int(row[0])
+
+
+def _planner_rows(queryset):
+    """Planner row estimate for a filtered queryset, from EXPLAIN"""
+    sql, params = queryset.order_by().values('pk').query.sql_with_params()
+    with connections[queryset.db].cursor() as cursor:
+        cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+def estimated_count(queryset, exact_below=EXACT_COUNT_BELOW):
+    """
+    Row count that avoids scanning large tables.
+
+    Returns:
+        tuple: (count, is_estimate)
+    """
+    if connections[queryset.db].vendor == 'postgresql':
+        if queryset.query.where:
+            estimate = _planner_rows(queryset)
+        else:
+            estimate = _reltuples(queryset)
+        if estimate is not None and estimate >= exact_below:
+            return estimate, True
+    return queryset.count(), False
+
+
+class KeysetPaginator:
+    """Paginate a queryset newest first on (field, id)"""
+
+    def __init__(self, queryset, field='created_at', page_size=20, max_page_size=100, min_page_size=1):
+        self.queryset = queryset
+        self.field = field
+        self.page_size = max(min_page_size, min(int(page_size), max_page_size))
+
+    def encode_cursor(self, obj):
+        value = getattr(obj, self.field)
+        payload = json.dumps([value.isoformat(), obj.pk])
+        return base64.urlsafe_b64encode(payload.encode()).decode()
+
+    def decode_cursor(self, cursor):
+        try:
+            value, pk = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            value = parse_datetime(value)
+            pk = int(pk)
+        except (ValueError, TypeError, UnicodeDecodeError):
+            value = None
+        if value is None:
+            raise ValueError("Invalid cursor")
+        return value, pk
+
+    def ordered(self):
+        return self.queryset.order_by(f'-{self.field}', '-pk')
+
+    def _slice(self, queryset):
+        # One extra row tells us whether another page exists
+        rows = list(queryset[:self.page_size + 1])
+        items = rows[:self.page_size]
+        next_cursor = self.encode_cursor(items[-1]) if len(rows) > self.page_size else None
+        return items, next_cursor
+
+    def page(self, cursor=None):
+        """
+        Returns:
+            tuple: (list of objects, cursor for the next page or None)
+        """
+        queryset = self.ordered()
+        if cursor:
+            value, pk = self.decode_cursor(cursor)
+            queryset = queryset.filter(
+                Q(**{f'{self.field}__lt': value}) | Q(**{self.field: value, 'pk__lt': pk})
+            )
+        return self._slice(queryset)
+
+    def offset_page(self, page):
+        """Numbered page for clients that do not send cursors yet"""
+        start = (page - 1) * self.page_size
+        return self._slice(self.ordered()[start:])
+
+    def paginate(self, params, total_key='total_count'):
+        """
+        Serve ?cursor= when given, otherwise the legacy ?page= number.
+
+        Returns:
+            tuple: (list of objects, pagination dict keeping the fields
+            page-number clients already read, plus next_cursor)
+        """
+        page = max(1, int(params.get('page', 1)))
+        cursor = params.get('cursor')
+        items, next_cursor = self.page(cursor) if cursor else self.offset_page(page)
+
+        total, is_estimate = estimated_count(self.queryset)
+        return items, {
+            total_key: total,
+            'total_pages': (total + self.page_size - 1) // self.page_size,
+            'current_page': page,
+            'page_size': self.page_size,
+            'has_next': next_cursor is not None,
+            'has_previous': page > 1,
+            'next_cursor': next_cursor,
+            'count_is_estimate': is_estimate,
+        }
@@ -326,7 +326,11 @@ class PlatformStatsSerializer(serializers.Serializer):
     journal_entries_today = serializers.IntegerField()
     
     avg_session_rating = serializers.DecimalField(max_digits=3, decimal_places=2)
-    total_revenue = serializers.DecimalField(max_digits=10, decimal_places=2)
+    total_revenue = serializers.DecimalField(max_digits=12, decimal_places=2)
+
+    # When the figures were computed and how old they are
+    computed_at = serializers.DateTimeField()
+    staleness_seconds = serializers.IntegerField()
 
 class MentorReportListSerializer(serializers.ModelSerializer):
     mentor_id = serializers.IntegerField(source='mentor.user.id', read_only=True)
@@ -1,45 +1,73 @@
-from django.db.models.signals import post_save, post_delete
+from django.db.models.signals import post_save, post_delete, post_init
 from django.dispatch import receiver
-from django.core.cache import cache
 import logging
 from userapp.models import User, Mentor, MentorApprovalRequest, FocusBuddySession, MentorSession
+from .dashboard_cache import bump
 
 logger = logging.getLogger(__name__)
 
-# Cache keys (must match your view)
-METRICS_CACHE_KEY = "admin_dashboard_metrics"
-USAGE_CACHE_KEY_PREFIX = "admin_dashboard_usage"
+# Only changes that can move a dashboard figure bump its dependency version
+# (see dashboard_cache); logins, OTP writes and profile edits leave it alone.
 
-@receiver([post_save, post_delete], sender=User)
-def invalidate_user_cache(sender, **kwargs):
-    """Clear metrics cache when user data changes"""
-    cache.delete(METRICS_CACHE_KEY)
-    logger.info("Cleared metrics cache due to User change")
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, **kwargs):
+    """Registered user count only changes on sign-up"""
+    if created:
+        bump('users')
 
-@receiver([post_save, post_delete], sender=Mentor)
-def invalidate_mentor_cache(sender, **kwargs):
-    """Clear metrics cache when mentor data changes"""
-    cache.delete(METRICS_CACHE_KEY)
-    logger.info("Cleared metrics cache due to Mentor change")
+@receiver(post_delete, sender=User)
+def user_deleted(sender, **kwargs):
+    bump('users')
+
+def _remember(instance, field):
+    # Read __dict__ so a deferred field is not fetched just to remember it
+    instance.__dict__[f'_loaded_{field}'] = instance.__dict__.get(field)
+
+def _changed(instance, field):
+    loaded = instance.__dict__.get(f'_loaded_{field}')
+    _remember(instance, field)
+    return loaded is None or loaded != instance.__dict__.get(field)
+
+@receiver(post_init, sender=Mentor)
+def remember_mentor_approval(sender, instance, **kwargs):
+    """Keep the loaded approval flag so post_save can tell whether it changed"""
+    _remember(instance, 'is_approved')
+
+@receiver(post_save, sender=Mentor)
+def mentor_saved(sender, instance, created, **kwargs):
+    """Approved mentor count only changes when is_approved flips"""
+    if _changed(instance, 'is_approved') or created:
+        bump('approved_mentors')
+
+@receiver(post_delete, sender=Mentor)
+def mentor_deleted(sender, **kwargs):
+    bump('approved_mentors')
 
 @receiver([post_save, post_delete], sender=MentorApprovalRequest)
-def invalidate_approval_cache(sender, **kwargs):
-    """Clear metrics cache when approval requests change"""
-    cache.delete(METRICS_CACHE_KEY)
-    logger.info("Cleared metrics cache due to MentorApprovalRequest change")
-
-@receiver([post_save, post_delete], sender=FocusBuddySession)
-def invalidate_focus_session_cache(sender, **kwargs):
-    """Clear both metrics and usage cache when focus sessions change"""
-    cache.delete(METRICS_CACHE_KEY)
-    cache.delete(f"{USAGE_CACHE_KEY_PREFIX}_daily")
-    cache.delete(f"{USAGE_CACHE_KEY_PREFIX}_weekly")
-    logger.info("Cleared session caches due to FocusBuddySession change")
-
-@receiver([post_save, post_delete], sender=MentorSession)
-def invalidate_mentor_session_cache(sender, **kwargs):
-    """Clear both metrics and usage cache when mentor sessions change"""
-    cache.delete(METRICS_CACHE_KEY)
-    cache.delete(f"{USAGE_CACHE_KEY_PREFIX}_daily")
-    cache.delete(f"{USAGE_CACHE_KEY_PREFIX}_weekly")
-    logger.info("Cleared session caches due to MentorSession change")
+def approval_request_changed(sender, **kwargs):
+    """Pending approvals change with every status update"""
+    bump('mentor_approvals')
+
+@receiver(post_save, sender=FocusBuddySession)
+def focus_session_saved(sender, instance, created, **kwargs):
+    """Counts and usage buckets depend on creation, not on status changes"""
+    if created:
+        bump('focus_sessions')
+
+@receiver(post_delete, sender=FocusBuddySession)
+def focus_session_deleted(sender, **kwargs):
+    bump('focus_sessions')
+
+@receiver(post_init, sender=MentorSession)
+def remember_mentor_session_duration(sender, instance, **kwargs):
+    _remember(instance, 'duration_minutes')
+
+@receiver(post_save, sender=MentorSession)
+def mentor_session_saved(sender, instance, created, **kwargs):
+    """Counts depend on creation; usage hours also on duration_minutes"""
+    if _changed(instance, 'duration_minutes') or created:
+        bump('mentor_sessions')
+
+@receiver(post_delete, sender=MentorSession)
+def mentor_session_deleted(sender, **kwargs):
+    bump('mentor_sessions')
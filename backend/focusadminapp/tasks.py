@@ -0,0 +1,25 @@
+# focusadminapp/tasks.py
+from celery import shared_task
+
+from .dashboard_cache import refresh, release_refresh
+from .metrics import refresh_platform_metrics
+
+
+@shared_task
+def refresh_platform_metrics_task():
+    """
+    Rebuild the PlatformMetricsSnapshot row.
+    Runs on the beat schedule so the admin stats page only reads one row.
+    """
+    snapshot = refresh_platform_metrics()
+    return f"Platform metrics refreshed in {snapshot.compute_ms}ms"
+
+
+@shared_task
+def refresh_dashboard_entry(name):
+    """Recompute one stale admin dashboard cache entry (see dashboard_cache)"""
+    try:
+        refresh(name)
+    finally:
+        release_refresh(name)
+    return f"Refreshed dashboard entry {name}"
@@ -14,6 +14,7 @@ from rest_framework.permissions import AllowAny
 from rest_framework.decorators import permission_classes
 from django.utils import timezone
 from userapp.authentication import AdminCookieJWTAuthentication
+from userapp.ledger import PLATFORM_REVENUE, system_account, wallet_summary
 from django.db.models import Sum
 from django.http import JsonResponse
 import traceback
@@ -22,7 +23,12 @@ from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
 from django.db.models import Count, Sum, Avg, Q
 from django.utils import timezone
 from datetime import datetime, timedelta
+from django.utils.dateparse import parse_date, parse_datetime
 from django.core.cache import cache
+from .analytics import GRANULARITIES, USAGE_PERIODS, annotate_activity_counts, usage_buckets
+from .pagination import KeysetPaginator
+from . import dashboard_cache
+from .metrics import METRIC_FIELDS, get_platform_metrics
 
 
 logger = logging.getLogger(__name__)
@@ -289,7 +295,6 @@ class UserListView(APIView):
         try:
             # Get search query, pagination parameters, and mentor filter
             search_query = request.query_params.get('search', '')
-            page = int(request.query_params.get('page', 1))
             page_size = int(request.query_params.get('page_size', 10))
             mentor_filter = request.query_params.get('mentor_only', '').lower() == 'true'
             
@@ -307,14 +312,11 @@ class UserListView(APIView):
             if mentor_filter:
                 users = users.filter(is_mentor=True)
             
-            # Calculate pagination
-            total_users = users.count()
-            total_pages = (total_users + page_size - 1) // page_size
-            start_index = (page - 1) * page_size
-            end_index = start_index + page_size
-            
-            # Get paginated users
-            paginated_users = users[start_index:end_index]
+            # Keyset pages on (date_joined, id); ?page= still works for older clients
+            paginator = KeysetPaginator(users, 'date_joined', page_size=page_size)
+            paginated_users, pagination = paginator.paginate(
+                request.query_params, total_key='total_users'
+            )
             
             # Serialize the data
             serializer = UserListSerializer(paginated_users, many=True)
@@ -322,14 +324,7 @@ class UserListView(APIView):
             
             return Response({
                 "users": serializer.data,
-                "pagination": {
-                    "total_users": total_users,
-                    "total_pages": total_pages,
-                    "current_page": page,
-                    "page_size": page_size,
-                    "has_next": page < total_pages,
-                    "has_previous": page > 1
-                }
+                "pagination": pagination
             }, status=status.HTTP_200_OK)
             
         except Exception as e:
@@ -418,7 +413,6 @@ class AdminJournalListView(APIView):
         try:
             # Get query parameters
             search_query = request.query_params.get('search', '')
-            page = int(request.query_params.get('page', 1))
             page_size = int(request.query_params.get('page_size', 10))
 
             # Filter journals based on search
@@ -426,16 +420,15 @@ class AdminJournalListView(APIView):
                 journals = Journal.objects.filter(
                     Q(user__name__icontains=search_query) |
                     Q(mood__icontains=search_query)
-                ).select_related('user').order_by('-created_at')
+                ).select_related('user')
             else:
-                journals = Journal.objects.all().select_related('user').order_by('-created_at')
+                journals = Journal.objects.all().select_related('user')
 
-            # Manual pagination calculation
-            total_journals = journals.count()
-            total_pages = (total_journals + page_size - 1) // page_size
-            start_index = (page - 1) * page_size
-            end_index = start_index + page_size
-            paginated_journals = journals[start_index:end_index]
+            # Keyset pages on (created_at, id), newest first
+            paginator = KeysetPaginator(journals, page_size=page_size)
+            paginated_journals, pagination = paginator.paginate(
+                request.query_params, total_key='total_journals'
+            )
 
             # Serialize
             serializer = JournalListSerializer(paginated_journals, many=True)
@@ -443,14 +436,7 @@ class AdminJournalListView(APIView):
             
             return Response({
                 "journals": serializer.data,
-                "pagination": {
-                    "total_journals": total_journals,
-                    "total_pages": total_pages,
-                    "current_page": page,
-                    "page_size": page_size,
-                    "has_next": page < total_pages,
-                    "has_previous": page > 1
-                }
+                "pagination": pagination
             }, status=status.HTTP_200_OK)
 
         except Exception as e:
@@ -524,7 +510,6 @@ class MentorApprovalListView(APIView):
             # Get query parameters
             search_query = request.query_params.get('search', '')
             status_filter = request.query_params.get('status', 'pending')
-            page = int(request.query_params.get('page', 1))
             page_size = int(request.query_params.get('page_size', 10))
             
             # Base queryset
@@ -541,15 +526,11 @@ class MentorApprovalListView(APIView):
                     Q(user__email__icontains=search_query)
                 )
             
-            # Order by submission date (latest first)
-            queryset = queryset.order_by('-submitted_at', '-created_at')
-            
-            # Manual pagination calculation
-            total_mentors = queryset.count()
-            total_pages = (total_mentors + page_size - 1) // page_size
-            start_index = (page - 1) * page_size
-            end_index = start_index + page_size
-            paginated_mentors = queryset[start_index:end_index]
+            # Keyset pages on (created_at, id), latest first
+            paginator = KeysetPaginator(queryset, page_size=page_size)
+            paginated_mentors, pagination = paginator.paginate(
+                request.query_params, total_key='total_mentors'
+            )
             
             # Serialize the data
             serializer = MentorApprovalSerializer(paginated_mentors, many=True)
@@ -557,16 +538,15 @@ class MentorApprovalListView(APIView):
             
             return Response({
                 'mentors': serializer.data,
-                'pagination': {
-                    'total_mentors': total_mentors,
-                    'total_pages': total_pages,
-                    'current_page': page,
-                    'page_size': page_size,
-                    'has_next': page < total_pages,
-                    'has_previous': page > 1,
-                }
+                'pagination': pagination
             }, status=status.HTTP_200_OK)
             
+        except ValueError as e:
+            logger.error(f"Invalid parameter in mentor list: {str(e)}", exc_info=True)
+            return Response(
+                {'error': 'Invalid pagination parameters'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         except Exception as e:
             logger.error(f"Error listing mentors: {str(e)}", exc_info=True)
             return Response(
@@ -832,13 +812,13 @@ class AdminWalletView(APIView):
                 'mentor', 'mentor__user', 'session', 'session__student'
             ).prefetch_related('session__subjects')
 
-            # Wallet summary for admin (platform commissions)
-            wallet_summary = self.calculate_admin_wallet_summary(all_earnings)
-
             # Pagination
             earnings_queryset = all_earnings.order_by('-created_at')
             paginator = Paginator(earnings_queryset, page_size)
 
+            # Wallet summary for admin (platform revenue); one earning per paid session
+            wallet_summary = self.calculate_admin_wallet_summary(all_earnings, paginator.count)
+
             try:
                 earnings_page = paginator.page(page)
             except PageNotAnInteger:
@@ -877,43 +857,24 @@ class AdminWalletView(APIView):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
-    def calculate_admin_wallet_summary(self, earnings):
+    def calculate_admin_wallet_summary(self, earnings, session_count):
         now = timezone.now()
         current_month_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
 
-        # Platform's total commission earnings
-        total_platform_commission = earnings.aggregate(
-            total=Sum('platform_commission')
-        )['total'] or Decimal('0.00')
-
-        # Available balance (could be same as total or minus any admin payouts if applicable)
-        available_balance = total_platform_commission
-
-        # Pending commissions (if you track admin payout status) for future use
-        pending_commissions = earnings.filter(
-            payout_status__in=['pending', 'processing']
-        ).aggregate(
-            total=Sum('platform_commission')
-        )['total'] or Decimal('0.00')
-
-        # This month's commission
-        this_month_commission = earnings.filter(
-            created_at__gte=current_month_start
-        ).aggregate(
-            total=Sum('platform_commission')
-        )['total'] or Decimal('0.00')
+        # Platform revenue (fees and commissions, less refunds) from the ledger
+        revenue = wallet_summary(system_account(PLATFORM_REVENUE), current_month_start)
 
         # Additional stats for admin
-        total_sessions = MentorSession.objects.count()
         total_mentors = Mentor.objects.count()
         total_students = earnings.values('session__student').distinct().count()
 
         return {
-            'total_platform_commission': total_platform_commission,
-            'available_balance': available_balance,
-            'pending_commissions': pending_commissions,
-            'total_sessions': total_sessions,
-            'this_month_commission': this_month_commission,
+            'total_platform_commission': revenue['balance'],
+            'available_balance': revenue['balance'],
+            # Nothing is paid out yet, so the whole balance is still due
+            'pending_commissions': revenue['balance'],
+            'total_sessions': session_count,
+            'this_month_commission': revenue['credits'],
             'total_mentors': total_mentors,
             'total_students': total_students
         }
@@ -929,12 +890,8 @@ class AdminFocusBuddySessionListView(APIView):
             # Get query parameters
             search_query = request.query_params.get('search', '')
             status_filter = request.query_params.get('status', 'all')
-            page = int(request.query_params.get('page', 1))
             page_size = int(request.query_params.get('page_size', 10))
             
-            # Validate page_size
-            page_size = max(5, min(50, page_size))
-            
             # Base queryset
             queryset = FocusBuddySession.objects.select_related('creator_id').all()
             
@@ -952,15 +909,11 @@ class AdminFocusBuddySessionListView(APIView):
                     Q(session_type__icontains=search_query)
                 )
             
-            # Order by creation date (newest first)
-            queryset = queryset.order_by('-created_at')
-            
-            # Manual pagination
-            total_sessions = queryset.count()
-            total_pages = (total_sessions + page_size - 1) // page_size
-            start_index = (page - 1) * page_size
-            end_index = start_index + page_size
-            paginated_sessions = queryset[start_index:end_index]
+            # Keyset pages on (created_at, id), newest first; page_size stays within 5..50
+            paginator = KeysetPaginator(queryset, page_size=page_size, max_page_size=50, min_page_size=5)
+            paginated_sessions, pagination = paginator.paginate(
+                request.query_params, total_key='total_sessions'
+            )
             
             # Serialize the sessions
             serializer = FocusBuddySessionSerializer(paginated_sessions, many=True)
@@ -968,14 +921,7 @@ class AdminFocusBuddySessionListView(APIView):
             
             return Response({
                 'sessions': serializer.data,
-                'pagination': {
-                    'total_sessions': total_sessions,
-                    'total_pages': total_pages,
-                    'current_page': page,
-                    'page_size': page_size,
-                    'has_next': page < total_pages,
-                    'has_previous': page > 1
-                }
+                'pagination': pagination
             }, status=status.HTTP_200_OK)
             
         except ValueError as e:
@@ -1122,7 +1068,7 @@ class AdminEndFocusBuddySessionView(APIView):
                 reason = 'admin_ended'
             
             # End the session
-            session.end_session(reason=reason)
+            session.end_session(reason=reason, message="Session ended by an administrator")
             
             logger.info(f"Focus buddy session {session_id} ended by admin {request.user.email}, reason: {reason}")
             
@@ -1147,40 +1093,14 @@ class AdminDashboardView(APIView):#cached
     authentication_classes = [AdminCookieJWTAuthentication]
     permission_classes = [IsAuthenticated, IsAdminUser]
 
-    # Cache settings
-    CACHE_TIMEOUT = 18000  # 5 hour
-    METRICS_CACHE_KEY = "admin_dashboard_metrics"
-    USAGE_CACHE_KEY_PREFIX = "admin_dashboard_usage"
-
     def get(self, request):
         
         try:
             period = request.GET.get('period', 'daily')
             
-            # Try to get cached data
-            metrics = cache.get(self.METRICS_CACHE_KEY)
-            usage_data = cache.get(f"{self.USAGE_CACHE_KEY_PREFIX}_{period}")
-            
-            if metrics and usage_data:
-                logger.info("Returning cached dashboard data")
-                # Always fetch recent activities live
-                recent_activities = self.get_recent_activities()
-                dashboard_data = {
-                    'metrics': metrics,
-                    'usage_data': usage_data,
-                    'recent_activities': recent_activities
-                }
-                serializer = AdminDashboardSerializer(dashboard_data)
-                return Response(serializer.data, status=status.HTTP_200_OK)
-
-            # Get fresh data only for what's not cached
-            if not metrics:
-                metrics = self.get_key_metrics()
-                cache.set(self.METRICS_CACHE_KEY, metrics, timeout=self.CACHE_TIMEOUT)
-                
-            if not usage_data:
-                usage_data = self.get_usage_data(period)
-                cache.set(f"{self.USAGE_CACHE_KEY_PREFIX}_{period}", usage_data, timeout=self.CACHE_TIMEOUT)
+            # Cached per metric; stale entries are served while they recompute in the background
+            metrics = self.get_key_metrics()
+            usage_data = self.get_usage_data(period)
             
             # Always get fresh recent activities
             recent_activities = self.get_recent_activities()
@@ -1205,71 +1125,11 @@ class AdminDashboardView(APIView):#cached
 
     def get_key_metrics(self):
         """Get key platform metrics"""
-        return {
-            'registered_users': User.objects.count(),
-            'approved_mentors': Mentor.objects.filter(is_approved=True).count(),
-            'total_focus_sessions': FocusBuddySession.objects.count(),
-            'total_mentor_sessions': MentorSession.objects.count(),
-            'pending_mentor_approvals': MentorApprovalRequest.objects.filter(status='pending').count()
-        }
+        return dashboard_cache.get_key_metrics()
 
     def get_usage_data(self, period='daily'):
-        """Get usage statistics for charts"""
-        now = timezone.now()
-        
-        if period == 'daily':
-            # Get last 7 days
-            data = []
-            for i in range(6, -1, -1):
-                date = now - timedelta(days=i)
-                day_start = date.replace(hour=0, minute=0, second=0, microsecond=0)
-                day_end = day_start + timedelta(days=1)
-                
-                # Count sessions for this day
-                focus_sessions = FocusBuddySession.objects.filter(
-                    created_at__range=[day_start, day_end]
-                ).count()
-                
-                mentor_sessions = MentorSession.objects.filter(
-                    created_at__range=[day_start, day_end]
-                ).count()
-                
-                # Calculate total hours (approximate)
-                total_hours = (focus_sessions * 0.5) + (mentor_sessions * 1.0)  # Rough estimate
-                
-                data.append({
-                    'day': date.strftime('%a'),
-                    'sessions': focus_sessions + mentor_sessions,
-                    'hours': total_hours
-                })
-        
-        elif period == 'weekly':
-            # Get last 4 weeks
-            data = []
-            for i in range(3, -1, -1):
-                week_start = now - timedelta(weeks=i+1)
-                week_end = week_start + timedelta(weeks=1)
-                
-                focus_sessions = FocusBuddySession.objects.filter(
-                    created_at__range=[week_start, week_end]
-                ).count()
-                
-                mentor_sessions = MentorSession.objects.filter(
-                    created_at__range=[week_start, week_end]
-                ).count()
-                
-                total_hours = (focus_sessions * 0.5) + (mentor_sessions * 1.0)
-                
-                data.append({
-                    'week': f'Week {4-i}',
-                    'sessions': focus_sessions + mentor_sessions,
-                    'hours': total_hours
-                })
-        
-        return {
-            'period': period,
-            'data': data
-        }
+        """Get usage statistics for charts, ending with the current bucket"""
+        return dashboard_cache.get_usage_data(period)
 
     def get_recent_activities(self):
         """Get recent platform activities"""
@@ -1365,12 +1225,31 @@ class AdminUsageGraphView(APIView):
     permission_classes = [IsAuthenticated, IsAdminUser]
 
     def get(self, request):
-        
+        """
+        Either a preset ?period=hourly|daily|weekly|monthly, or an explicit
+        range with ?start=&end=&granularity=hour|day|week|month
+        (ISO dates or datetimes, end defaults to now)
+        """
         period = request.GET.get('period', 'daily')
-        
+        granularity = request.GET.get('granularity')
+        start_param = request.GET.get('start')
+
         try:
-            dashboard_view = AdminDashboardView()
-            usage_data = dashboard_view.get_usage_data(period)
+            if granularity or start_param:
+                try:
+                    usage_data = self.get_range_usage(
+                        start_param, request.GET.get('end'), granularity or 'day'
+                    )
+                except ValueError as e:
+                    return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+            else:
+                if period not in USAGE_PERIODS:
+                    return Response(
+                        {'error': f'Invalid period: {period}'},
+                        status=status.HTTP_400_BAD_REQUEST
+                    )
+                dashboard_view = AdminDashboardView()
+                usage_data = dashboard_view.get_usage_data(period)
             
             serializer = UsageDataSerializer(usage_data)
            
@@ -1383,6 +1262,33 @@ class AdminUsageGraphView(APIView):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
+    def parse_bound(self, value, name):
+        parsed = parse_datetime(value)
+        if parsed is None:
+            day = parse_date(value)
+            if day is None:
+                raise ValueError(f"Invalid {name}: {value}")
+            parsed = datetime.combine(day, datetime.min.time())
+        if timezone.is_naive(parsed):
+            parsed = timezone.make_aware(parsed)
+        return parsed
+
+    def get_range_usage(self, start, end, granularity):
+        if granularity not in GRANULARITIES:
+            raise ValueError(f"granularity must be one of {', '.join(GRANULARITIES)}")
+        if not start:
+            raise ValueError("start is required")
+        start = self.parse_bound(start, 'start')
+        end = self.parse_bound(end, 'end') if end else timezone.now()
+
+        data = usage_buckets(start, end, granularity)
+        for row in data:
+            row['start'] = row['start'].isoformat()
+        return {
+            'period': granularity,
+            'data': data
+        }
+
 
 class AdminRecentActivityView(APIView):
     """
@@ -1423,7 +1329,7 @@ class AdminMetricsView(APIView):
             metrics = dashboard_view.get_key_metrics()
             
             serializer = AdminMetricsSerializer(metrics)
-            l
+            
             return Response(serializer.data, status=status.HTTP_200_OK)
             
         except Exception as e:
@@ -1444,30 +1350,26 @@ class AdminUserListView(APIView):
     def get(self, request):
         
         try:
-            users = User.objects.annotate(
-                total_focus_sessions=Count('focus_participations'),
-                total_mentor_sessions=Count('student_sessions'),
-                total_tasks=Count('tasks'),
-                total_journal_entries=Count('journals')
-            ).order_by('-date_joined')
-            
-            page = int(request.GET.get('page', 1))
-            page_size = int(request.GET.get('page_size', 20))
-            
-            start = (page - 1) * page_size
-            end = start + page_size
-            
-            paginated_users = users[start:end]
-            
-            serializer = UserActivitySerializer(paginated_users, many=True)
+            try:
+                paginator = KeysetPaginator(
+                    annotate_activity_counts(User.objects.all()),
+                    'date_joined',
+                    page_size=request.GET.get('page_size', 20),
+                )
+                users, pagination = paginator.paginate(request.GET)
+            except ValueError as e:
+                return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
             
+            serializer = UserActivitySerializer(users, many=True)
             
             return Response({
                 'users': serializer.data,
-                'total_count': users.count(),
-                'page': page,
-                'page_size': page_size,
-                'total_pages': (users.count() + page_size - 1) // page_size
+                'total_count': pagination['total_count'],
+                'page': pagination['current_page'],
+                'page_size': pagination['page_size'],
+                'total_pages': pagination['total_pages'],
+                'next_cursor': pagination['next_cursor'],
+                'has_next': pagination['has_next'],
             }, status=status.HTTP_200_OK)
             
         except Exception as e:
@@ -1489,87 +1391,14 @@ class AdminPlatformStatsView(APIView):
     def get(self, request):
         
         try:
-            now = timezone.now()
-            today = now.date()
-            week_ago = now - timedelta(days=7)
-            month_ago = now - timedelta(days=30)
-            
-            # User statistics
-            total_users = User.objects.count()
-            active_users_today = User.objects.filter(
-                last_login__date=today
-            ).count()
-            active_users_week = User.objects.filter(
-                last_login__gte=week_ago
-            ).count()
-            active_users_month = User.objects.filter(
-                last_login__gte=month_ago
-            ).count()
-            
-            # Mentor statistics
-            total_mentors = Mentor.objects.count()
-            active_mentors = Mentor.objects.filter(
-                is_approved=True, is_available=True
-            ).count()
-            pending_mentors = Mentor.objects.filter(
-                approval_status='pending'
-            ).count()
-            
-            # Session statistics
-            total_sessions = MentorSession.objects.count()
-            completed_sessions = MentorSession.objects.filter(
-                status='completed'
-            ).count()
-            cancelled_sessions = MentorSession.objects.filter(
-                status='cancelled'
-            ).count()
-            
-            # Focus session statistics
-            total_focus_sessions = FocusBuddySession.objects.count()
-            active_focus_sessions = FocusBuddySession.objects.filter(
-                status='active'
-            ).count()
-            
-            # Task statistics
-            total_tasks = Task.objects.count()
-            completed_tasks = Task.objects.filter(is_completed=True).count()
-            
-            # Journal statistics
-            total_journal_entries = Journal.objects.count()
-            journal_entries_today = Journal.objects.filter(
-                created_at__date=today
-            ).count()
-            
-            # Rating statistics
-            avg_session_rating = MentorSession.objects.filter(
-                student_rating__isnull=False
-            ).aggregate(Avg('student_rating'))['student_rating__avg'] or 0
-            
-            # Revenue statistics
-            total_revenue = SessionPayment.objects.filter(
-                status='completed'
-            ).aggregate(Sum('amount'))['amount__sum'] or 0
-            
+            # One row, rebuilt on the beat schedule instead of ~20 full-table queries per request
+            snapshot, staleness = get_platform_metrics()
             stats = {
-                'total_users': total_users,
-                'active_users_today': active_users_today,
-                'active_users_week': active_users_week,
-                'active_users_month': active_users_month,
-                'total_mentors': total_mentors,
-                'active_mentors': active_mentors,
-                'pending_mentors': pending_mentors,
-                'total_sessions': total_sessions,
-                'completed_sessions': completed_sessions,
-                'cancelled_sessions': cancelled_sessions,
-                'total_focus_sessions': total_focus_sessions,
-                'active_focus_sessions': active_focus_sessions,
-                'total_tasks': total_tasks,
-                'completed_tasks': completed_tasks,
-                'total_journal_entries': total_journal_entries,
-                'journal_entries_today': journal_entries_today,
-                'avg_session_rating': round(avg_session_rating, 2),
-                'total_revenue': total_revenue
+                field: getattr(snapshot, field)
+                for field in METRIC_FIELDS
             }
+            stats['computed_at'] = snapshot.computed_at
+            stats['staleness_seconds'] = int(staleness)
             
             serializer = PlatformStatsSerializer(stats)
             
@@ -713,6 +713,9 @@ class WalletSummarySerializer(serializers.Serializer):
     pending_earnings = serializers.DecimalField(max_digits=10, decimal_places=2)
     total_sessions = serializers.IntegerField()
     this_month_earnings = serializers.DecimalField(max_digits=10, decimal_places=2)
+    wallet_balance = serializers.DecimalField(max_digits=12, decimal_places=2)
+    this_month_credits = serializers.DecimalField(max_digits=12, decimal_places=2)
+    this_month_debits = serializers.DecimalField(max_digits=12, decimal_places=2)
 
 
 class MentorWalletSerializer(serializers.Serializer):
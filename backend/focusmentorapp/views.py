@@ -15,6 +15,7 @@ from django.conf import settings
 from django.utils import timezone
 from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
 from userapp.authentication import MentorCookieJWTAuthentication
+from userapp.ledger import mentor_account, wallet_summary
 from django.shortcuts import get_object_or_404
 from django.db.models import Sum
 from decimal import Decimal
@@ -831,13 +832,13 @@ class MentorWalletView(APIView):
                 'session', 'session__student'
             ).prefetch_related('session__subjects')
 
-            # Wallet summary
-            wallet_summary = self.calculate_wallet_summary(mentor, all_earnings)
-
             # Pagination
             earnings_queryset = all_earnings.order_by('-created_at')
             paginator = Paginator(earnings_queryset, page_size)
 
+            # Wallet summary; one earning per paid session
+            wallet_summary = self.calculate_wallet_summary(mentor, paginator.count)
+
             try:
                 earnings_page = paginator.page(page)
             except PageNotAnInteger:
@@ -875,39 +876,24 @@ class MentorWalletView(APIView):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
-    def calculate_wallet_summary(self, mentor, earnings):
+    def calculate_wallet_summary(self, mentor, session_count):
         now = timezone.now()
         current_month_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
 
-        # Only include non-cancelled sessions in wallet calculations
-        non_cancelled_earnings = earnings.exclude(session__status='cancelled')
-
-        total_earnings = non_cancelled_earnings.aggregate(
-            total=Sum('mentor_earning')
-        )['total'] or Decimal('0.00')
-
-        available_balance = total_earnings
-
-        pending_earnings = non_cancelled_earnings.filter(
-            payout_status__in=['pending', 'processing']
-        ).aggregate(
-            total=Sum('mentor_earning')
-        )['total'] or Decimal('0.00')
-
-        this_month_earnings = non_cancelled_earnings.filter(
-            created_at__gte=current_month_start
-        ).aggregate(
-            total=Sum('mentor_earning')
-        )['total'] or Decimal('0.00')
-
-        total_sessions = MentorSession.objects.filter(mentor=mentor).exclude(status='cancelled').count()
+        # Everything from the ledger (snapshot + recent entries): refunds are
+        # debited there, so no cancelled-session exclusions are needed
+        ledger = wallet_summary(mentor_account(mentor.id), current_month_start)
 
         return {
-            'total_earnings': total_earnings,
-            'available_balance': available_balance,
-            'pending_earnings': pending_earnings,
-            'total_sessions': total_sessions,
-            'this_month_earnings': this_month_earnings
+            'total_earnings': ledger['total_credits'],
+            'available_balance': ledger['balance'],
+            # Nothing is paid out yet, so the whole balance is still due
+            'pending_earnings': ledger['balance'],
+            'total_sessions': session_count,
+            'this_month_earnings': ledger['credits'],
+            'wallet_balance': ledger['balance'],
+            'this_month_credits': ledger['credits'],
+            'this_month_debits': ledger['debits'],
         }
 
 class MentorSessionReviewListView(APIView):
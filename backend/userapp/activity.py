@@ -0,0 +1,196 @@
+"""
+Incremental maintenance of the UserDailyActivity rollup.
+
+Every write to PomodoroSession, Journal or FocusBuddySession turns into a
+counter delta on one (user, date) row. Each row also stores the length of
+the streak ending on its date, so current and longest streaks are a single
+aggregate over the user's rows. Streaks only need recomputing when a day
+becomes active or inactive, and then only for the run of consecutive days
+that follows it.
+"""
+from collections import Counter
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Count, Max, Q
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import FocusBuddySession, Journal, PomodoroSession, Task, UserDailyActivity
+
+COUNTERS = ('pomodoros', 'journals', 'focus_sessions')
+
+
+def _local_date(value):
+    return timezone.localdate(value) if timezone.is_aware(value) else value.date()
+
+
+def record_activity(user_id, day, **deltas):
+    """
+    Apply counter deltas (pomodoros=1, journals=-1, ...) to a user's day.
+    Decrements never create rows, so cascading deletes stay safe.
+    """
+    with transaction.atomic():
+        if any(delta > 0 for delta in deltas.values()):
+            row, created = UserDailyActivity.objects.select_for_update().get_or_create(
+                user_id=user_id, date=day
+            )
+        else:
+            row = UserDailyActivity.objects.select_for_update().filter(
+                user_id=user_id, date=day
+            ).first()
+            created = False
+            if row is None:
+                return
+
+        for counter, delta in deltas.items():
+            setattr(row, counter, max(0, getattr(row, counter) + delta))
+
+        if not any(getattr(row, counter) for counter in COUNTERS):
+            # The day is no longer active; the run after it loses its prefix
+            row.delete()
+            rebuild_streaks(user_id, day)
+        elif created:
+            row.save()
+            rebuild_streaks(user_id, day)
+        else:
+            row.save(update_fields=list(deltas))
+
+
+def rebuild_streaks(user_id, day):
+    """Recompute stored streaks for the run of consecutive active days starting at `day`"""
+    previous_streak = UserDailyActivity.objects.filter(
+        user_id=user_id, date=day - timedelta(days=1)
+    ).values_list('streak', flat=True).first() or 0
+
+    expected_date = day
+    streak = previous_streak
+    changed = []
+    rows = UserDailyActivity.objects.filter(user_id=user_id, date__gte=day).order_by('date')
+    for row in rows.iterator():
+        if row.date != expected_date:
+            if expected_date == day:
+                # `day` itself is inactive: the run after it starts from scratch
+                expected_date, streak = row.date, 0
+            else:
+                break
+        streak += 1
+        if row.streak != streak:
+            row.streak = streak
+            changed.append(row)
+        expected_date += timedelta(days=1)
+
+    if changed:
+        UserDailyActivity.objects.bulk_update(changed, ['streak'])
+
+
+def record_pomodoros_completed(user_id, start_times):
+    """Count pomodoros completed in bulk (Task.save), one update per day touched"""
+    for day, count in Counter(_local_date(start_time) for start_time in start_times).items():
+        record_activity(user_id, day, pomodoros=count)
+
+
+def rebuild_user_activity(user_id):
+    """Recompute a user's rollup rows from the source tables (backfill and repair)"""
+    days = {}
+    sources = (
+        ('pomodoros', PomodoroSession.objects.filter(task__user_id=user_id, is_completed=True), 'start_time'),
+        ('journals', Journal.objects.filter(user_id=user_id), 'date'),
+        ('focus_sessions', FocusBuddySession.objects.filter(creator_id_id=user_id), 'started_at'),
+    )
+    for counter, queryset, field in sources:
+        lookup = field if field == 'date' else f'{field}__date'
+        for day, count in queryset.values_list(lookup).annotate(count=Count('id')).order_by():
+            days.setdefault(day, {})[counter] = count
+
+    rows = []
+    streak, previous_day = 0, None
+    for day in sorted(days):
+        streak = streak + 1 if previous_day and day - previous_day == timedelta(days=1) else 1
+        rows.append(UserDailyActivity(user_id=user_id, date=day, streak=streak, **days[day]))
+        previous_day = day
+
+    with transaction.atomic():
+        UserDailyActivity.objects.filter(user_id=user_id).delete()
+        UserDailyActivity.objects.bulk_create(rows)
+    return len(rows)
+
+
+def get_streaks(user):
+    """
+    Current and longest streak in one query.
+    The current streak is 0 unless the user was active today.
+    """
+    streaks = UserDailyActivity.objects.filter(user=user).aggregate(
+        current=Max('streak', filter=Q(date=timezone.localdate())),
+        longest=Max('streak'),
+    )
+    return streaks['current'] or 0, streaks['longest'] or 0
+
+
+# ---------- Signal receivers ----------
+@receiver(pre_save, sender=PomodoroSession)
+@receiver(pre_save, sender=Journal)
+def remember_previous_activity(sender, instance, **kwargs):
+    """Keep the pre-save state so post_save can move counts between days"""
+    instance._previous_activity = None
+    if instance.pk:
+        if sender is PomodoroSession:
+            instance._previous_activity = sender.objects.filter(pk=instance.pk).values(
+                'is_completed', 'start_time', 'task__user_id'
+            ).first()
+        else:
+            instance._previous_activity = sender.objects.filter(pk=instance.pk).values(
+                'date', 'user_id'
+            ).first()
+
+
+@receiver(post_save, sender=PomodoroSession)
+def pomodoro_saved(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_previous_activity', None)
+    was_counted = bool(previous and previous['is_completed'])
+    old_day = _local_date(previous['start_time']) if was_counted else None
+    new_day = _local_date(instance.start_time) if instance.is_completed else None
+    if old_day == new_day:
+        return
+
+    user_id = instance.task.user_id
+    if old_day:
+        record_activity(previous['task__user_id'], old_day, pomodoros=-1)
+    if new_day:
+        record_activity(user_id, new_day, pomodoros=1)
+
+
+@receiver(post_delete, sender=PomodoroSession)
+def pomodoro_deleted(sender, instance, **kwargs):
+    if instance.is_completed:
+        user_id = Task.objects.filter(pk=instance.task_id).values_list('user_id', flat=True).first()
+        if user_id:
+            record_activity(user_id, _local_date(instance.start_time), pomodoros=-1)
+
+
+@receiver(post_save, sender=Journal)
+def journal_saved(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_previous_activity', None)
+    if previous and previous['date'] == instance.date:
+        return
+    if previous:
+        record_activity(previous['user_id'], previous['date'], journals=-1)
+    record_activity(instance.user_id, instance.date, journals=1)
+
+
+@receiver(post_delete, sender=Journal)
+def journal_deleted(sender, instance, **kwargs):
+    record_activity(instance.user_id, instance.date, journals=-1)
+
+
+@receiver(post_save, sender=FocusBuddySession)
+def focus_session_saved(sender, instance, created, **kwargs):
+    if created:
+        record_activity(instance.creator_id_id, _local_date(instance.started_at), focus_sessions=1)
+
+
+@receiver(post_delete, sender=FocusBuddySession)
+def focus_session_deleted(sender, instance, **kwargs):
+    record_activity(instance.creator_id_id, _local_date(instance.started_at), focus_sessions=-1)
@@ -4,3 +4,10 @@ from django.apps import AppConfig
 class UserappConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'userapp'
+
+    def ready(self):
+        import userapp.auth_cache  # registers the cached-user invalidation receivers
+        import userapp.activity  # registers the daily activity rollup receivers
+        import userapp.mentor_search  # keeps mentor search documents up to date
+        import userapp.mentor_facets  # invalidates cached mentor facet counts
+        import userapp.availability  # mirrors Mentor.availability into slot rows
@@ -0,0 +1,125 @@
+"""
+Shared cache for JWT authentication.
+
+Verified access tokens are kept in a small per-process LRU keyed by a hash
+of the raw token, so repeated decodes of the same token are free. Users are
+kept in the same kind of LRU keyed by (user_id, jti), and behind that in
+Redis keyed by user_id. A cache hit costs zero database queries.
+
+User rows are evicted from Redis (and this process's LRU) whenever a User is
+saved or deleted, or changed by a queryset update() (see UserQuerySet). Other processes drop their local copy within
+AUTH_CACHE['LOCAL_TTL'] seconds.
+"""
+import copy
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.settings import api_settings
+
+from .models import User
+
+
+class LRUCache:
+    """Thread-safe LRU with per-entry expiry"""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete_where(self, predicate):
+        with self._lock:
+            for key in [key for key in self._data if predicate(key)]:
+                del self._data[key]
+
+
+_tokens = LRUCache(settings.AUTH_CACHE['LOCAL_MAXSIZE'])
+_users = LRUCache(settings.AUTH_CACHE['LOCAL_MAXSIZE'])
+
+
+def _user_cache_key(user_id):
+    return f"auth:user:{user_id}"
+
+
+def get_validated_token(raw_token, validate):
+    """
+    Return the verified token for raw_token, calling validate(raw_token)
+    only on a cache miss. Validation errors propagate and are not cached.
+    """
+    if isinstance(raw_token, str):
+        raw_token = raw_token.encode()
+    key = hashlib.sha256(raw_token).hexdigest()
+
+    token = _tokens.get(key)
+    if token is None:
+        token = validate(raw_token)
+        # Never keep a token past its own expiry
+        ttl = min(settings.AUTH_CACHE['LOCAL_TTL'], token['exp'] - time.time())
+        if ttl > 0:
+            _tokens.set(key, token, ttl)
+    return token
+
+
+def get_user(validated_token, load):
+    """
+    Return the user for a verified token, calling load() only when neither
+    the local LRU nor Redis has it. A copy is returned so callers can modify
+    their request.user without touching the cached instance.
+    """
+    # Claims may carry the id as a string; normalise so invalidation matches
+    user_id = str(validated_token.get(api_settings.USER_ID_CLAIM))
+    local_key = (user_id, validated_token.get(api_settings.JTI_CLAIM))
+
+    user = _users.get(local_key)
+    if user is None:
+        user = cache.get(_user_cache_key(user_id))
+        if user is None:
+            user = load()
+            cache.set(_user_cache_key(user_id), user, settings.AUTH_CACHE['REDIS_TTL'])
+        _users.set(local_key, user, settings.AUTH_CACHE['LOCAL_TTL'])
+    # load() refuses inactive users; hold cached copies to the same rule
+    if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+        raise AuthenticationFailed("User is inactive", code="user_inactive")
+    return copy.copy(user)
+
+
+def invalidate_user(user_id):
+    invalidate_users([user_id])
+
+
+def invalidate_users(user_ids):
+    user_ids = {str(user_id) for user_id in user_ids}
+    cache.delete_many([_user_cache_key(user_id) for user_id in user_ids])
+    _users.delete_where(lambda key: key[0] in user_ids)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_cached_user(sender, instance, **kwargs):
+    invalidate_user(instance.pk)
@@ -1,10 +1,22 @@
 from rest_framework_simplejwt.authentication import JWTAuthentication
 from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
 import logging
+from . import auth_cache
 
 logger = logging.getLogger(__name__)
 
-class UserCookieJWTAuthentication(JWTAuthentication):
+class CachedTokenMixin:
+    """Serve verified tokens and users from auth_cache instead of decoding and querying each time"""
+    def get_validated_token(self, raw_token):
+        return auth_cache.get_validated_token(raw_token, super().get_validated_token)
+
+    def get_user(self, validated_token):
+        return auth_cache.get_user(validated_token, lambda: super(CachedTokenMixin, self).get_user(validated_token))
+
+class CachedJWTAuthentication(CachedTokenMixin, JWTAuthentication):
+    """Authorization header authentication backed by the auth cache"""
+
+class UserCookieJWTAuthentication(CachedTokenMixin, JWTAuthentication):
     """Authentication for regular users"""
     def authenticate(self, request):
         raw_token = request.COOKIES.get('access')  # User token
@@ -29,7 +41,7 @@ class UserCookieJWTAuthentication(JWTAuthentication):
             logger.error(f"User authentication failed: {str(e)}")
             return None
 
-class MentorCookieJWTAuthentication(JWTAuthentication):
+class MentorCookieJWTAuthentication(CachedTokenMixin, JWTAuthentication):
     """Authentication for mentors"""
     def authenticate(self, request):
         raw_token = request.COOKIES.get('mentor_access')  # Mentor token
@@ -54,7 +66,7 @@ class MentorCookieJWTAuthentication(JWTAuthentication):
             logger.error(f"Mentor authentication failed: {str(e)}")
             return None
 
-class AdminCookieJWTAuthentication(JWTAuthentication):
+class AdminCookieJWTAuthentication(CachedTokenMixin, JWTAuthentication):
     """Authentication for admins"""
     def authenticate(self, request):
         raw_token = request.COOKIES.get('admin_access')  # Admin token
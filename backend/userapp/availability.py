@@ -0,0 +1,263 @@
+"""
+Normalised mentor availability.
+
+Mentor.availability stays the source of truth that mentors edit: a JSON dict
+of weekday name -> list of slot start times such as "7:00 PM". Whenever it
+is saved, the slots are mirrored into MentorAvailabilitySlot rows, so
+"is this mentor free then" and "who is free then" become indexed lookups.
+
+Each mentor also stores next_available_at and a short list of upcoming open
+slots: the weekly slots unrolled over MENTOR_SCHEDULE['HORIZON_DAYS'], minus
+those overlapping a pending, confirmed or ongoing session. They are
+recomputed for one mentor whenever their availability or bookings change,
+and periodically for mentors whose soonest slot has passed.
+"""
+import copy
+from collections import defaultdict
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import Mentor, MentorAvailabilitySlot, MentorSession
+
+WEEKDAYS = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
+
+# Every listed time opens a bookable window of this length
+SLOT_MINUTES = 60
+
+TIME_FORMATS = ('%I:%M %p', '%H:%M', '%H:%M:%S')
+
+
+def parse_time(value):
+    """Minutes from midnight for "7:00 PM", "07:00 PM", "19:00" or "19:00:00"; None if unparseable"""
+    for time_format in TIME_FORMATS:
+        try:
+            parsed = datetime.strptime(value.strip(), time_format)
+        except (AttributeError, ValueError):
+            continue
+        return parsed.hour * 60 + parsed.minute
+    return None
+
+
+def parse_weekday(value):
+    """Weekday number (Monday=0) from a day name or number; None if invalid"""
+    value = str(value).strip().lower()
+    if value in WEEKDAYS:
+        return WEEKDAYS.index(value)
+    if value.isdigit() and int(value) < 7:
+        return int(value)
+    return None
+
+
+def parse_availability(availability):
+    """
+    Windows in an availability dict. Non-day keys (the profile form also keeps
+    languages and a title in this field) and unparseable times are skipped.
+
+    Returns:
+        set: (weekday, start_minute, end_minute) tuples
+    """
+    windows = set()
+    if not isinstance(availability, dict):
+        return windows
+    for day, times in availability.items():
+        weekday = WEEKDAYS.index(day) if day in WEEKDAYS else None
+        if weekday is None or not isinstance(times, list):
+            continue
+        for value in times:
+            start = parse_time(value)
+            if start is not None:
+                windows.add((weekday, start, min(start + SLOT_MINUTES, 24 * 60)))
+    return windows
+
+
+def sync_availability_slots(mentor):
+    """Bring a mentor's slot rows in line with mentor.availability, writing only the difference"""
+    wanted = parse_availability(mentor.availability)
+    with transaction.atomic():
+        existing = {
+            (slot.weekday, slot.start_minute, slot.end_minute): slot.pk
+            for slot in MentorAvailabilitySlot.objects.select_for_update().filter(mentor=mentor)
+        }
+        stale = [pk for window, pk in existing.items() if window not in wanted]
+        if stale:
+            MentorAvailabilitySlot.objects.filter(pk__in=stale).delete()
+        MentorAvailabilitySlot.objects.bulk_create([
+            MentorAvailabilitySlot(mentor=mentor, weekday=weekday, start_minute=start, end_minute=end)
+            for weekday, start, end in wanted - existing.keys()
+        ])
+    return wanted
+
+
+def starting_slots(weekday, minute):
+    """Slots that start at exactly `minute` on `weekday`; bookings are made at a slot's start"""
+    return MentorAvailabilitySlot.objects.filter(weekday=weekday, start_minute=minute)
+
+
+def is_available_at(mentor_id, scheduled_date, scheduled_time):
+    """Whether a mentor has a weekly slot starting at a booking's start time (one indexed lookup)"""
+    minute = scheduled_time.hour * 60 + scheduled_time.minute
+    return starting_slots(scheduled_date.weekday(), minute).filter(mentor_id=mentor_id).exists()
+
+
+def free_at(weekday, minute):
+    """Exists() condition for Mentor querysets: has a slot starting on `weekday` at `minute`"""
+    return Exists(starting_slots(weekday, minute).filter(mentor_id=OuterRef('pk')))
+
+
+# Sessions in these states hold their time slot
+BLOCKING_STATUSES = ('pending', 'confirmed', 'ongoing')
+
+# Session fields that decide which slot a booking blocks
+BOOKING_FIELDS = ('mentor_id', 'scheduled_date', 'scheduled_time', 'duration_minutes', 'status')
+
+
+def schedule_timezone():
+    return ZoneInfo(settings.MENTOR_SCHEDULE['TIMEZONE'])
+
+
+def compute_open_slots(windows, bookings, now, horizon_days, limit):
+    """
+    Open slot starts after `now`, soonest first.
+
+    Args:
+        windows: (weekday, start_minute, end_minute) tuples
+        bookings: (scheduled_date, scheduled_time, duration_minutes) tuples
+        now: aware datetime
+        horizon_days: number of days to look ahead, today included
+        limit: maximum number of slots to return
+
+    Returns:
+        list: aware datetimes in the schedule timezone
+    """
+    tz = schedule_timezone()
+    today = timezone.localtime(now, tz).date()
+
+    busy = defaultdict(list)
+    for scheduled_date, scheduled_time, duration in bookings:
+        start = scheduled_time.hour * 60 + scheduled_time.minute
+        busy[scheduled_date].append((start, start + (duration or 0)))
+
+    by_weekday = defaultdict(list)
+    for weekday, start, end in windows:
+        by_weekday[weekday].append((start, end))
+
+    slots = []
+    for offset in range(horizon_days):
+        day = today + timedelta(days=offset)
+        for start, end in sorted(by_weekday[day.weekday()]):
+            slot_start = datetime.combine(day, datetime.min.time(), tzinfo=tz) + timedelta(minutes=start)
+            if slot_start <= now:
+                continue
+            if any(booked_start < end and start < booked_end for booked_start, booked_end in busy[day]):
+                continue
+            slots.append(slot_start)
+            if len(slots) >= limit:
+                return slots
+    return slots
+
+
+def refresh_next_available(mentor_ids, now=None):
+    """Recompute next_available_at and upcoming_slots for the given mentors (two reads, one write each)"""
+    mentor_ids = list(mentor_ids)
+    if not mentor_ids:
+        return
+    now = now or timezone.now()
+    horizon_days = settings.MENTOR_SCHEDULE['HORIZON_DAYS']
+    limit = settings.MENTOR_SCHEDULE['UPCOMING_SLOTS']
+    today = timezone.localtime(now, schedule_timezone()).date()
+
+    windows = defaultdict(list)
+    for mentor_id, weekday, start, end in MentorAvailabilitySlot.objects.filter(
+        mentor_id__in=mentor_ids
+    ).values_list('mentor_id', 'weekday', 'start_minute', 'end_minute'):
+        windows[mentor_id].append((weekday, start, end))
+
+    bookings = defaultdict(list)
+    for mentor_id, scheduled_date, scheduled_time, duration in MentorSession.objects.filter(
+        mentor_id__in=mentor_ids,
+        status__in=BLOCKING_STATUSES,
+        scheduled_date__gte=today,
+        scheduled_date__lt=today + timedelta(days=horizon_days),
+    ).values_list('mentor_id', 'scheduled_date', 'scheduled_time', 'duration_minutes'):
+        bookings[mentor_id].append((scheduled_date, scheduled_time, duration))
+
+    for mentor_id in mentor_ids:
+        slots = compute_open_slots(windows[mentor_id], bookings[mentor_id], now, horizon_days, limit)
+        # update() rather than save() so the Mentor receivers do not fire again
+        Mentor.objects.filter(pk=mentor_id).update(
+            next_available_at=slots[0] if slots else None,
+            upcoming_slots=[slot.isoformat() for slot in slots],
+        )
+
+
+def refresh_due_mentors(now=None, batch_size=500):
+    """
+    Refresh mentors whose soonest slot has passed, or who had nothing open
+    but have slots that a new day may bring into the horizon.
+    """
+    now = now or timezone.now()
+    due = Mentor.objects.filter(
+        Q(next_available_at__lte=now) | Q(next_available_at__isnull=True, availability_slots__isnull=False)
+    ).values_list('pk', flat=True).distinct().order_by('pk')
+
+    refreshed = 0
+    last_pk = 0
+    while True:
+        batch = list(due.filter(pk__gt=last_pk)[:batch_size])
+        if not batch:
+            return refreshed
+        refresh_next_available(batch, now=now)
+        refreshed += len(batch)
+        last_pk = batch[-1]
+
+
+# ---------- Signal receivers ----------
+@receiver(post_init, sender=Mentor)
+def remember_availability(sender, instance, **kwargs):
+    # A copy, so an edit made to the dict in place still counts as a change
+    instance.__dict__['_availability_source'] = copy.deepcopy(instance.__dict__.get('availability'))
+
+
+@receiver(post_save, sender=Mentor)
+def mentor_saved(sender, instance, created, update_fields=None, **kwargs):
+    """Only a new mentor or an edited availability changes the slot rows"""
+    if update_fields is not None and 'availability' not in update_fields:
+        return
+    current = instance.__dict__.get('availability')
+    changed = current != instance.__dict__.get('_availability_source')
+    instance.__dict__['_availability_source'] = copy.deepcopy(current)
+    if created or changed:
+        sync_availability_slots(instance)
+        refresh_next_available([instance.pk])
+
+
+@receiver(post_init, sender=MentorSession)
+def remember_booking(sender, instance, **kwargs):
+    # Read __dict__ so deferred fields are not fetched just to remember them
+    instance.__dict__['_booking_source'] = tuple(instance.__dict__.get(field) for field in BOOKING_FIELDS)
+
+
+@receiver(post_save, sender=MentorSession)
+def session_saved(sender, instance, created, **kwargs):
+    """Booking, cancelling or rescheduling frees or takes a slot; notes and meeting links do not"""
+    previous = instance.__dict__.get('_booking_source')
+    current = tuple(instance.__dict__.get(field) for field in BOOKING_FIELDS)
+    instance.__dict__['_booking_source'] = current
+    if created or current != previous:
+        mentor_ids = {instance.mentor_id}
+        if previous and previous[0]:
+            mentor_ids.add(previous[0])
+        refresh_next_available(mentor_ids)
+
+
+@receiver(post_delete, sender=MentorSession)
+def session_deleted(sender, instance, **kwargs):
+    if instance.status in BLOCKING_STATUSES:
+        refresh_next_available([instance.mentor_id])
@@ -0,0 +1,68 @@
+"""
+Idempotent booking confirmation.
+
+A confirmation is identified by its Razorpay order id. The first successful
+confirmation stores its response in the cache. A retry with the same order
+and payment id gets that response back without verifying the signature or
+running the booking transaction again. If the cache entry is gone, the
+response is rebuilt from the SessionPayment row, which is unique per
+gateway order.
+"""
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import SessionPayment
+from .serializers import MentorSessionSerializer, SessionPaymentSerializer
+
+
+def _result_key(order_id):
+    return f"booking_confirmation:{order_id}"
+
+
+def booking_response(session, payment):
+    """Response body for a confirmed booking"""
+    return {
+        'success': True,
+        'message': 'Session booked successfully',
+        'session': MentorSessionSerializer(session).data,
+        'payment': SessionPaymentSerializer(payment).data if payment else None,
+    }
+
+
+def remember_confirmation(order_id, payment_id, student_id, body):
+    """Store the first response for an order so retries can replay it"""
+    cache.set(
+        _result_key(order_id),
+        {'payment_id': payment_id, 'student_id': student_id, 'body': body},
+        settings.BOOKING_CONFIRMATION_TTL,
+    )
+
+
+def find_confirmation(order_id, payment_id, student_id):
+    """
+    The stored response for an already confirmed order.
+
+    Returns:
+        tuple: (body or None, conflict); conflict is True when the order was
+        confirmed with another payment or by another student
+    """
+    if not order_id:
+        return None, False
+
+    stored = cache.get(_result_key(order_id))
+    if stored is not None:
+        if stored['payment_id'] != payment_id or stored['student_id'] != student_id:
+            return None, True
+        return stored['body'], False
+
+    payment = SessionPayment.objects.select_related(
+        'session__mentor__user', 'session__student'
+    ).filter(gateway_order_id=order_id).first()
+    if payment is None:
+        return None, False
+    if payment.gateway_payment_id != payment_id or payment.session.student_id != student_id:
+        return None, True
+
+    body = booking_response(payment.session, payment)
+    remember_confirmation(order_id, payment_id, student_id, body)
+    return body, False
@@ -1,13 +1,16 @@
+import asyncio
 import json
 import logging
+from urllib.parse import parse_qs
 from channels.generic.websocket import AsyncWebsocketConsumer
 from asgiref.sync import sync_to_async
-from .models import FocusBuddyParticipant, FocusBuddySession, MentorSession
+from channels.db import database_sync_to_async
+from django.conf import settings
+from .presence import PresenceRegistry
+from .session_access import resolve_session_access
 
 logger = logging.getLogger(__name__)
 
-active_participants = {}  # { session_id: set(user_id) }
-
 class WebRTCConsumer(AsyncWebsocketConsumer):
     async def connect(self):
         self.session_id = self.scope['url_route']['kwargs']['session_id']
@@ -15,6 +18,12 @@ class WebRTCConsumer(AsyncWebsocketConsumer):
         self.user_group_name = f'user_{self.scope["user"].id}'  # User-specific group
         self.user = self.scope['user']
 
+        # Clients that understand batched 'ice-candidates' frames opt in with ?ice_batching=1
+        query = parse_qs(self.scope.get('query_string', b'').decode())
+        self.ice_batching = query.get('ice_batching', ['0'])[0] == '1'
+        self.ice_buffers = {}      # { target_id: [candidate, ...] }
+        self.ice_flush_tasks = {}  # { target_id: asyncio.Task }
+
         logger.info(f"[WebSocket] Connection attempt for session {self.session_id}")
         logger.info(f"[WebSocket] User from scope: {self.user}")
         logger.info(f"[WebSocket] User type: {type(self.user)}")
@@ -30,112 +39,71 @@ class WebRTCConsumer(AsyncWebsocketConsumer):
             await self.close(code=4001)
             return
 
-        # Try FocusBuddySession first, then MentorSession
-        session = None
-        session_type = None
-        try:
-            session = await sync_to_async(FocusBuddySession.objects.get)(id=self.session_id)
-            session_type = 'focusbuddy'
-        except FocusBuddySession.DoesNotExist:
-            try:
-                session = await sync_to_async(MentorSession.objects.get)(id=self.session_id)
-                session_type = 'mentor'
-            except MentorSession.DoesNotExist:
-                logger.error(f"[WebSocket] No session found for id {self.session_id}")
-                await self.close(code=4000)
-                return
+        # One cached lookup decides admission for both session types
+        session_type, verdict = await database_sync_to_async(resolve_session_access)(
+            self.session_id, self.user.id
+        )
+        if session_type is None:
+            logger.error(f"[WebSocket] No session found for id {self.session_id}")
+            await self.close(code=4000)
+            return
 
         if session_type == 'focusbuddy':
             # Host admit logic: Only allow approved participants
-            try:
-                if session.creator_id_id != self.user.id:
-                    try:
-                        participant = await sync_to_async(FocusBuddyParticipant.objects.get)(session_id=self.session_id, user_id=self.user.id)
-                        if participant.status == 'pending':
-                            await self.accept()
-                            await self.channel_layer.group_add(self.user_group_name, self.channel_name)
-                            print(f"WebSocket: Added user {self.user.id} to group {self.user_group_name} (pending)")
-                            await self.send(text_data=json.dumps({
-                                'type': 'admission-status',
-                                'status': 'pending',
-                                'message': 'Waiting for host approval.'
-                            }))
-                            return
-                        elif participant.status == 'rejected':
-                            await self.accept()
-                            await self.send(text_data=json.dumps({
-                                'type': 'admission-status',
-                                'status': 'rejected',
-                                'message': 'Your join request was rejected by the host.'
-                            }))
-                            await self.close(code=4003)
-                            return
-                        elif participant.status != 'approved':
-                            await self.accept()
-                            await self.send(text_data=json.dumps({
-                                'type': 'admission-status',
-                                'status': participant.status,
-                                'message': 'You are not approved to join this session.'
-                            }))
-                            await self.close(code=4004)
-                            return
-                    except FocusBuddyParticipant.DoesNotExist:
-                        await self.accept()
-                        await self.send(text_data=json.dumps({
-                            'type': 'admission-status',
-                            'status': 'not-registered',
-                            'message': 'You are not registered as a participant.'
-                        }))
-                        await self.close(code=4005)
-                        return
-                # If host or approved participant, proceed as before
+            if verdict == 'pending':
                 await self.accept()
-                await self.channel_layer.group_add(self.room_group_name, self.channel_name)
                 await self.channel_layer.group_add(self.user_group_name, self.channel_name)
-                print(f"WebSocket: Added user {self.user.id} to group {self.user_group_name} (approved/host)")
-
-                if self.session_id not in active_participants:
-                    active_participants[self.session_id] = set()
-
-                other_users = list(active_participants[self.session_id])
-                active_participants[self.session_id].add(self.user.id)
-
+                print(f"WebSocket: Added user {self.user.id} to group {self.user_group_name} (pending)")
                 await self.send(text_data=json.dumps({
-                    'type': 'authenticated',
-                    'user_id': self.user.id,
-                    'username': self.user.username
+                    'type': 'admission-status',
+                    'status': 'pending',
+                    'message': 'Waiting for host approval.'
                 }))
-
+                return
+            elif verdict == 'rejected':
+                await self.accept()
+                await self.send(text_data=json.dumps({
+                    'type': 'admission-status',
+                    'status': 'rejected',
+                    'message': 'Your join request was rejected by the host.'
+                }))
+                await self.close(code=4003)
+                return
+            elif verdict == 'not-registered':
+                await self.accept()
+                await self.send(text_data=json.dumps({
+                    'type': 'admission-status',
+                    'status': 'not-registered',
+                    'message': 'You are not registered as a participant.'
+                }))
+                await self.close(code=4005)
+                return
+            elif verdict not in ('host', 'approved'):
+                await self.accept()
                 await self.send(text_data=json.dumps({
-                    'type': 'existing-users',
-                    'users': other_users
+                    'type': 'admission-status',
+                    'status': verdict,
+                    'message': 'You are not approved to join this session.'
                 }))
+                await self.close(code=4004)
+                return
 
-                await self.channel_layer.group_send(
-                    self.room_group_name,
-                    {
-                        'type': 'user_joined',
-                        'user_id': self.user.id,
-                        'user_name': self.user.username
-                    }
-                )
+            # If host or approved participant, proceed as before
+            try:
+                await self.accept()
+                await self.channel_layer.group_add(self.room_group_name, self.channel_name)
+                await self.channel_layer.group_add(self.user_group_name, self.channel_name)
+                print(f"WebSocket: Added user {self.user.id} to group {self.user_group_name} (approved/host)")
+
+                await self.enter_room()
 
             except Exception as e:
                 logger.error(f"[WebSocket] Error during connection setup: {e}")
                 await self.close(code=4000)
         elif session_type == 'mentor':
             # Mentor session: allow only mentor or student
-            # Get the actual IDs from the foreign key fields
-            mentor_user_id = await sync_to_async(lambda: session.mentor.user_id if session.mentor else None)()
-            student_id = session.student_id if hasattr(session, 'student_id') else None
-            
-            # Debug logging
-            logger.info(f"[WebSocket] Mentor session {self.session_id} - mentor_user_id: {mentor_user_id}, student_id: {student_id}")
-            logger.info(f"[WebSocket] Current user ID: {self.user.id}")
-            
-            if self.user.id not in [mentor_user_id, student_id]:
+            if verdict != 'allowed':
                 logger.warning(f"[WebSocket] User {self.user.id} not authorized for mentor session {self.session_id}")
-                logger.warning(f"[WebSocket] Allowed users: mentor_user_id={mentor_user_id}, student_id={student_id}")
                 await self.close(code=4002)
                 return
             
@@ -144,42 +112,64 @@ class WebRTCConsumer(AsyncWebsocketConsumer):
             await self.channel_layer.group_add(self.user_group_name, self.channel_name)
             print(f"WebSocket: Added user {self.user.id} to group {self.user_group_name} (mentor session)")
 
-            if self.session_id not in active_participants:
-                active_participants[self.session_id] = set()
+            await self.enter_room()
 
-            other_users = list(active_participants[self.session_id])
-            active_participants[self.session_id].add(self.user.id)
+    async def enter_room(self):
+        """Register presence, tell the client who is already here and announce the join"""
+        # Per-room inbox for point-to-point signalling (offer/answer/ICE)
+        self.peer_group_name = self.peer_group(self.user.id)
+        await self.channel_layer.group_add(self.peer_group_name, self.channel_name)
 
-            await self.send(text_data=json.dumps({
-                'type': 'authenticated',
+        other_users = await PresenceRegistry.join(self.session_id, self.user.id)
+        self.in_room = True
+        self.heartbeat_task = asyncio.create_task(self.presence_heartbeat())
+
+        await self.send(text_data=json.dumps({
+            'type': 'authenticated',
+            'user_id': self.user.id,
+            'username': self.user.username
+        }))
+
+        await self.send(text_data=json.dumps({
+            'type': 'existing-users',
+            'users': other_users
+        }))
+
+        await self.channel_layer.group_send(
+            self.room_group_name,
+            {
+                'type': 'user_joined',
                 'user_id': self.user.id,
-                'username': self.user.username
-            }))
+                'user_name': self.user.username
+            }
+        )
 
-            await self.send(text_data=json.dumps({
-                'type': 'existing-users',
-                'users': other_users
-            }))
+    async def presence_heartbeat(self):
+        """Keep this user's presence entry alive while the socket is open"""
+        interval = settings.PRESENCE_CONFIG['HEARTBEAT_INTERVAL']
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await PresenceRegistry.heartbeat(self.session_id, self.user.id)
+            except Exception as e:
+                logger.warning(f"[WebSocket] Presence heartbeat failed: {e}")
 
-            await self.channel_layer.group_send(
-                self.room_group_name,
-                {
-                    'type': 'user_joined',
-                    'user_id': self.user.id,
-                    'user_name': self.user.username
-                }
-            )
     async def disconnect(self, close_code):
         try:
             await self.channel_layer.group_discard(self.room_group_name, self.channel_name)
             # Also remove from user-specific group
             if hasattr(self, 'user_group_name'):
                 await self.channel_layer.group_discard(self.user_group_name, self.channel_name)
+            if hasattr(self, 'peer_group_name'):
+                await self.channel_layer.group_discard(self.peer_group_name, self.channel_name)
+
+            # Candidates still buffered for peers are useless once we are gone
+            for task in self.ice_flush_tasks.values():
+                task.cancel()
 
-            if self.session_id in active_participants:
-                active_participants[self.session_id].discard(self.user.id)
-                if not active_participants[self.session_id]:
-                    del active_participants[self.session_id]
+            if getattr(self, 'in_room', False):
+                self.heartbeat_task.cancel()
+                await PresenceRegistry.leave(self.session_id, self.user.id)
 
                 await self.channel_layer.group_send(
                     self.room_group_name,
@@ -201,6 +191,7 @@ class WebRTCConsumer(AsyncWebsocketConsumer):
                 'offer': self.handle_offer,
                 'answer': self.handle_answer,
                 'ice-candidate': self.handle_ice_candidate,
+                'ice-candidates': self.handle_ice_candidates,
                 'media-state': self.handle_media_state,
                 'chat-message': self.handle_chat_message,  
             }
@@ -216,38 +207,78 @@ class WebRTCConsumer(AsyncWebsocketConsumer):
             logger.error(f"[WebSocket] Receive error: {e}")
 
     # ---------- WebRTC Handlers ----------
+    def peer_group(self, user_id):
+        """
+        Group holding only user_id's connection to this room. Offers, answers and
+        ICE candidates go here instead of the room group, so each message costs
+        one delivery rather than one per participant. (user_{id} is not used
+        because it spans every session the user has open, including pending ones.)
+        """
+        return f'{self.room_group_name}_user_{user_id}'
+
+    async def send_to_peer(self, target_id, event):
+        event['sender_id'] = self.user.id
+        event['target_id'] = target_id
+        await self.channel_layer.group_send(self.peer_group(target_id), event)
+
     async def handle_offer(self, data):
-        await self.channel_layer.group_send(
-            self.room_group_name,
-            {
-                'type': 'webrtc_offer',
-                'offer': data['offer'],
-                'sender_id': self.user.id,
-                'target_id': data['target_id']
-            }
-        )
+        await self.send_to_peer(data['target_id'], {
+            'type': 'webrtc_offer',
+            'offer': data['offer']
+        })
 
     async def handle_answer(self, data):
-        await self.channel_layer.group_send(
-            self.room_group_name,
-            {
-                'type': 'webrtc_answer',
-                'answer': data['answer'],
-                'sender_id': self.user.id,
-                'target_id': data['target_id']
-            }
-        )
+        await self.send_to_peer(data['target_id'], {
+            'type': 'webrtc_answer',
+            'answer': data['answer']
+        })
 
     async def handle_ice_candidate(self, data):
-        await self.channel_layer.group_send(
-            self.room_group_name,
-            {
-                'type': 'webrtc_ice_candidate',
-                'candidate': data['candidate'],
-                'sender_id': self.user.id,
-                'target_id': data['target_id']
-            }
-        )
+        await self.queue_ice_candidates(data['target_id'], [data['candidate']])
+
+    async def handle_ice_candidates(self, data):
+        await self.queue_ice_candidates(data['target_id'], data['candidates'])
+
+    # ---------- ICE Batching ----------
+    async def queue_ice_candidates(self, target_id, candidates):
+        """
+        Coalesce trickle ICE candidates per target over a short window so a burst
+        costs one channel-layer message instead of one per candidate.
+        """
+        window_ms = settings.WEBRTC_CONFIG['ICE_BATCH_WINDOW_MS']
+        if not window_ms:
+            for candidate in candidates:
+                await self.send_to_peer(target_id, {
+                    'type': 'webrtc_ice_candidate',
+                    'candidate': candidate
+                })
+            return
+
+        buffer = self.ice_buffers.setdefault(target_id, [])
+        buffer.extend(candidates)
+        if len(buffer) >= settings.WEBRTC_CONFIG['ICE_BATCH_MAX_SIZE']:
+            await self.flush_ice_candidates(target_id)
+        elif target_id not in self.ice_flush_tasks:
+            self.ice_flush_tasks[target_id] = asyncio.create_task(
+                self.flush_ice_candidates_later(target_id, window_ms / 1000)
+            )
+
+    async def flush_ice_candidates_later(self, target_id, delay):
+        await asyncio.sleep(delay)
+        # Drop our own handle first so flush_ice_candidates does not cancel us
+        self.ice_flush_tasks.pop(target_id, None)
+        await self.flush_ice_candidates(target_id)
+
+    async def flush_ice_candidates(self, target_id):
+        task = self.ice_flush_tasks.pop(target_id, None)
+        if task:
+            task.cancel()
+        candidates = self.ice_buffers.pop(target_id, None)
+        if candidates:
+            await self.send_to_peer(target_id, {
+                'type': 'webrtc_ice_candidates',
+                'candidates': candidates
+            })
 
     async def handle_media_state(self, data):
         await self.channel_layer.group_send(
@@ -328,6 +359,24 @@ class WebRTCConsumer(AsyncWebsocketConsumer):
                 'sender_id': event['sender_id']
             }))
 
+    async def webrtc_ice_candidates(self, event):
+        if event['target_id'] != self.user.id:
+            return
+        if self.ice_batching:
+            await self.send(text_data=json.dumps({
+                'type': 'ice-candidates',
+                'candidates': event['candidates'],
+                'sender_id': event['sender_id']
+            }))
+        else:
+            # Older clients only understand one candidate per frame
+            for candidate in event['candidates']:
+                await self.send(text_data=json.dumps({
+                    'type': 'ice-candidate',
+                    'candidate': candidate,
+                    'sender_id': event['sender_id']
+                }))
+
     async def user_joined(self, event):
         if event['user_id'] != self.user.id:
             await self.send(text_data=json.dumps({
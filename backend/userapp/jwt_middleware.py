@@ -6,50 +6,34 @@ from django.contrib.auth.models import AnonymousUser
 from rest_framework_simplejwt.tokens import AccessToken
 from rest_framework_simplejwt.exceptions import TokenError, InvalidToken
 from asgiref.sync import sync_to_async
-import jwt
-from datetime import datetime
+from . import auth_cache
 
 logger = logging.getLogger(__name__)
 
+def _load_user(validated_token):
+    return get_user_model().objects.get(id=validated_token.get("user_id"))
+
 @database_sync_to_async
 def get_user_from_jwt(raw_token):
     User = get_user_model()
     try:
-        # Log the full token and current server time
-        logger.error(f"[DEBUG] Received token: {raw_token}")
-        logger.error(f"[DEBUG] Server UTC time: {datetime.utcnow().isoformat()}")
+        # Verified tokens and users are cached, so a repeat handshake costs no queries
+        token = auth_cache.get_validated_token(raw_token, AccessToken)
+        if not token.get("user_id"):
+            logger.warning("[JWT] No user_id found in token payload")
+            return AnonymousUser()
 
-        # Decode payload without verifying signature
-        try:
-            payload = jwt.decode(raw_token, options={"verify_signature": False})
-            logger.error(f"[DEBUG] Token payload: {payload}")
-        except Exception as e:
-            logger.error(f"[DEBUG] Could not decode token payload: {e}")
+        user = auth_cache.get_user(token, lambda: _load_user(token))
+        logger.debug("[JWT] User resolved from token: %s", user.id)
+        return user
 
-        # Validate and decode the token
-        token = AccessToken(raw_token)
-        user_id = token.get("user_id")
-        
-        logger.debug(f"[JWT] Extracted user_id from token: {user_id}")
-        
-        if user_id:
-            try:
-                user = User.objects.get(id=user_id)
-                logger.info(f"[JWT] User resolved from token: {user.username} (ID: {user.id})")
-                return user
-            except User.DoesNotExist:
-                logger.error(f"[JWT] User with ID {user_id} does not exist")
-        else:
-            logger.error("[JWT] No user_id found in token payload")
-            
-    except InvalidToken as e:
-        logger.error(f"[JWT] Invalid token: {e}")
-    except TokenError as e:
-        logger.error(f"[JWT] Token error: {e}")
+    except (InvalidToken, TokenError) as e:
+        logger.warning(f"[JWT] Invalid token: {e}")
+    except User.DoesNotExist:
+        logger.warning("[JWT] Token user does not exist")
     except Exception as e:
         logger.error(f"[JWT] Unexpected error during token validation: {e}")
     
-    logger.warning("[JWT] Returning AnonymousUser due to authentication failure")
     return AnonymousUser()
 
 def parse_cookies(cookie_header):
@@ -0,0 +1,277 @@
+"""
+Double-entry wallet ledger.
+
+Money moves between LedgerAccounts in transactions whose LedgerEntry legs
+sum to zero. Entries are append-only. Wallet balances are only changed with
+F() updates inside the posting transaction, so concurrent postings (say, two
+refunds hitting one mentor) cannot lose an update. System accounts keep no
+running balance: they take a leg of nearly every posting, and locking their
+rows would serialise all bookings and refunds. account_balance() reads them
+from snapshots plus recent entries instead. The legacy
+User.wallet_balance and Mentor.wallet_balance fields are no longer written:
+each is read once, as the opening entry of the owner's wallet account.
+
+LedgerSnapshots record an account's balance and total credits as of an
+entry. balance_at() and wallet_summary() start from the latest snapshot and
+read only the entries after it, instead of aggregating an account's whole
+history.
+"""
+import uuid
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Max, Q, Sum
+from django.utils import timezone
+
+from .models import LedgerAccount, LedgerEntry, LedgerSnapshot, Mentor, User
+
+ZERO = Decimal('0.00')
+CENT = Decimal('0.01')
+
+PLATFORM_REVENUE = 'platform:revenue'
+PLATFORM_TAX = 'platform:tax'
+PAYMENT_GATEWAY = 'external:razorpay'
+OPENING_BALANCES = 'external:opening_balances'
+
+# Snapshots skip entries newer than this, so an entry whose transaction is
+# still committing (with a lower id than one already visible) is never skipped
+SNAPSHOT_SETTLE_SECONDS = 300
+
+WALLET_ACCOUNT_TYPES = ('user_wallet', 'mentor_wallet')
+
+SYSTEM_ACCOUNTS = {
+    PLATFORM_REVENUE: 'platform',
+    PLATFORM_TAX: 'platform',
+    PAYMENT_GATEWAY: 'external',
+    OPENING_BALANCES: 'external',
+}
+
+
+# ---------- Accounts ----------
+def _get_or_create_account(code, **fields):
+    account = LedgerAccount.objects.filter(code=code).first()
+    if account is not None:
+        return account, False
+    try:
+        with transaction.atomic():
+            return LedgerAccount.objects.create(code=code, **fields), True
+    except IntegrityError:
+        # Created concurrently
+        return LedgerAccount.objects.get(code=code), False
+
+
+def system_account(code):
+    account, _ = _get_or_create_account(code, account_type=SYSTEM_ACCOUNTS[code])
+    return account
+
+
+def _wallet_account(code, account_type, owner_model, owner_id, **owner):
+    account = LedgerAccount.objects.filter(code=code).first()
+    if account is not None:
+        return account
+    try:
+        with transaction.atomic():
+            # Lock the owner so its legacy balance is read once, by whoever opens the account
+            opening = owner_model.objects.select_for_update().filter(pk=owner_id).values_list(
+                'wallet_balance', flat=True
+            ).first() or ZERO
+            account = LedgerAccount.objects.create(code=code, account_type=account_type, **owner)
+            _open(account, opening)
+            return account
+    except IntegrityError:
+        # Opened concurrently
+        return LedgerAccount.objects.get(code=code)
+
+
+def user_account(user_id):
+    """A user's wallet account; a legacy wallet_balance becomes its opening entry"""
+    return _wallet_account(f'user:{user_id}', 'user_wallet', User, user_id, user_id=user_id)
+
+
+def mentor_account(mentor_id):
+    """A mentor's wallet account; a legacy wallet_balance becomes its opening entry"""
+    return _wallet_account(f'mentor:{mentor_id}', 'mentor_wallet', Mentor, mentor_id, mentor_id=mentor_id)
+
+
+def _open(account, opening):
+    if opening:
+        post_transaction(
+            'opening_balance',
+            [(account, opening), (system_account(OPENING_BALANCES), -opening)],
+            description='Wallet balance before the ledger',
+        )
+
+
+# ---------- Posting ----------
+def post_transaction(entry_type, legs, session=None, description=''):
+    """
+    Record one balanced ledger transaction.
+
+    Args:
+        entry_type: LedgerEntry.entry_type of every leg
+        legs: (LedgerAccount, signed Decimal amount) pairs; positive credits the account
+        session: MentorSession the money relates to, if any
+
+    Returns:
+        list: the created LedgerEntry rows
+    """
+    legs = [(account, Decimal(amount).quantize(CENT)) for account, amount in legs]
+    if sum(amount for _, amount in legs) != ZERO:
+        raise ValueError("Ledger transaction legs must sum to zero")
+
+    transaction_id = uuid.uuid4()
+    now = timezone.now()
+    wallet_legs = [leg for leg in legs if leg[0].account_type in WALLET_ACCOUNT_TYPES]
+    with transaction.atomic():
+        # Fixed lock order keeps concurrent postings on the same wallets from deadlocking
+        for account, amount in sorted(wallet_legs, key=lambda leg: leg[0].pk):
+            LedgerAccount.objects.filter(pk=account.pk).update(balance=F('balance') + amount)
+        return LedgerEntry.objects.bulk_create([
+            LedgerEntry(
+                transaction_id=transaction_id,
+                account=account,
+                entry_type=entry_type,
+                amount=amount,
+                session=session,
+                description=description,
+                created_at=now,
+            )
+            for account, amount in legs
+        ])
+
+
+def record_session_payment(session, payment, mentor_earning, commission):
+    """The gateway pays in; the mentor, the platform and the tax account are credited"""
+    return post_transaction('session_payment', [
+        (system_account(PAYMENT_GATEWAY), -payment.amount),
+        (mentor_account(session.mentor_id), mentor_earning),
+        (system_account(PLATFORM_REVENUE), payment.platform_fee + commission),
+        (system_account(PLATFORM_TAX), payment.tax_amount),
+    ], session=session, description=f'Payment for session {session.id}')
+
+
+def record_session_refund(session, amount):
+    """
+    Refund a cancelled session to the student's wallet by reversing its
+    payment: the mentor's earning and the tax go back in full, and platform
+    revenue covers the rest of the refund (keeping any part not refunded).
+    A session paid before the ledger has no payment legs, so platform revenue
+    pays the whole refund.
+    """
+    amount = Decimal(amount).quantize(CENT)
+    paid = dict(
+        LedgerEntry.objects.filter(session=session, entry_type='session_payment')
+        .values('account_id').annotate(total=Sum('amount')).values_list('account_id', 'total')
+    )
+    mentor = mentor_account(session.mentor_id)
+    tax = system_account(PLATFORM_TAX)
+    earned = paid.get(mentor.pk, ZERO)
+    taxed = paid.get(tax.pk, ZERO)
+    legs = [
+        (user_account(session.student_id), amount),
+        (mentor, -earned),
+        (tax, -taxed),
+        (system_account(PLATFORM_REVENUE), earned + taxed - amount),
+    ]
+    return post_transaction(
+        'session_refund',
+        [(account, leg) for account, leg in legs if leg],
+        session=session,
+        description=f'Refund for cancelled session {session.id}',
+    )
+
+
+# ---------- Reading ----------
+def account_balance(account):
+    """An account's current balance: the running balance of a wallet, or snapshot plus entries"""
+    if account.account_type in WALLET_ACCOUNT_TYPES:
+        return LedgerAccount.objects.values_list('balance', flat=True).get(pk=account.pk)
+    return balance_at(account, timezone.now())
+
+
+def latest_snapshot(account, at=None):
+    snapshots = LedgerSnapshot.objects.filter(account=account)
+    if at is not None:
+        snapshots = snapshots.filter(as_of__lte=at)
+    return snapshots.order_by('-last_entry_id').first()
+
+
+def balance_at(account, at):
+    """An account's balance at a moment: the snapshot before it plus the entries since"""
+    snapshot = latest_snapshot(account, at)
+    entries = LedgerEntry.objects.filter(account=account, created_at__lte=at)
+    base = ZERO
+    if snapshot is not None:
+        entries = entries.filter(id__gt=snapshot.last_entry_id)
+        base = snapshot.balance
+    return (base + (entries.aggregate(total=Sum('amount'))['total'] or ZERO)).quantize(CENT)
+
+
+def wallet_summary(account, since):
+    """
+    Current balance plus the movement since `since`, reading only the
+    entries after the latest snapshot before that moment.
+
+    Returns:
+        dict: balance, opening_balance (at `since`), credits and debits since
+        then, and total_credits over the account's whole history
+    """
+    snapshot = latest_snapshot(account, since)
+    entries = LedgerEntry.objects.filter(account=account)
+    opening = ZERO
+    total_credits = ZERO
+    if snapshot is not None:
+        entries = entries.filter(id__gt=snapshot.last_entry_id)
+        opening = snapshot.balance
+        total_credits = snapshot.credits
+
+    totals = entries.aggregate(
+        later_credits=Sum('amount', filter=Q(amount__gt=0)),
+        before=Sum('amount', filter=Q(created_at__lte=since)),
+        credits=Sum('amount', filter=Q(created_at__gt=since, amount__gt=0)),
+        debits=Sum('amount', filter=Q(created_at__gt=since, amount__lt=0)),
+    )
+    opening = (opening + (totals['before'] or ZERO)).quantize(CENT)
+    credits = (totals['credits'] or ZERO).quantize(CENT)
+    debits = (-(totals['debits'] or ZERO)).quantize(CENT)
+    return {
+        'balance': opening + credits - debits,
+        'opening_balance': opening,
+        'credits': credits,
+        'debits': debits,
+        'total_credits': (total_credits + (totals['later_credits'] or ZERO)).quantize(CENT),
+    }
+
+
+# ---------- Snapshots ----------
+def snapshot_account(account, now=None):
+    """Snapshot an account at its newest settled entry, if it has any since its last snapshot"""
+    settled_before = (now or timezone.now()) - timedelta(seconds=SNAPSHOT_SETTLE_SECONDS)
+    previous = latest_snapshot(account)
+    entries = LedgerEntry.objects.filter(account=account, created_at__lte=settled_before)
+    if previous is not None:
+        entries = entries.filter(id__gt=previous.last_entry_id)
+    totals = entries.aggregate(
+        total=Sum('amount'), credits=Sum('amount', filter=Q(amount__gt=0)), last_id=Max('id'), count=Count('id')
+    )
+    if not totals['count']:
+        return None
+
+    last_entry = LedgerEntry.objects.filter(pk=totals['last_id']).values('created_at').first()
+    return LedgerSnapshot.objects.create(
+        account=account,
+        last_entry_id=totals['last_id'],
+        as_of=last_entry['created_at'],
+        balance=((previous.balance if previous else ZERO) + totals['total']).quantize(CENT),
+        credits=((previous.credits if previous else ZERO) + (totals['credits'] or ZERO)).quantize(CENT),
+    )
+
+
+def snapshot_balances(now=None):
+    """Snapshot every account with new entries; returns how many snapshots were taken"""
+    taken = 0
+    for account in LedgerAccount.objects.order_by('pk').iterator():
+        if snapshot_account(account, now=now) is not None:
+            taken += 1
+    return taken
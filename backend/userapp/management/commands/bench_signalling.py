@@ -0,0 +1,73 @@
+import asyncio
+import json
+import time
+import uuid
+
+from channels.layers import InMemoryChannelLayer, get_channel_layer
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = 'Compare room fan-out vs targeted delivery cost for WebRTC signalling by room size'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='2,4,8,16', help='Comma separated room sizes')
+        parser.add_argument('--messages', type=int, default=200, help='Signalling messages per run')
+        parser.add_argument(
+            '--in-memory', action='store_true',
+            help='Use an in-memory channel layer instead of the configured one'
+        )
+
+    def handle(self, *args, **options):
+        layer = InMemoryChannelLayer() if options['in_memory'] else get_channel_layer()
+        sizes = [int(size) for size in options['sizes'].split(',')]
+        messages = options['messages']
+
+        self.stdout.write(f"Channel layer: {layer.__class__.__name__}, {messages} messages per run")
+        self.stdout.write(f"{'room':>6} {'mode':>8} {'deliveries/msg':>15} {'us/msg':>10}")
+        for size in sizes:
+            for mode in ('fan-out', 'targeted'):
+                deliveries, elapsed = asyncio.run(self.run(layer, size, messages, mode))
+                self.stdout.write(
+                    f"{size:>6} {mode:>8} {deliveries / messages:>15.1f} "
+                    f"{elapsed / messages * 1_000_000:>10.1f}"
+                )
+
+    async def run(self, layer, size, messages, mode):
+        """Send ICE-candidate sized events between peers and drain every delivery like a consumer would"""
+        room = f"bench_{uuid.uuid4().hex}"
+        channels = [await layer.new_channel() for _ in range(size)]
+        for user_id, channel in enumerate(channels):
+            await layer.group_add(room, channel)
+            await layer.group_add(f"{room}_user_{user_id}", channel)
+
+        candidate = {'candidate': 'candidate:1 1 udp 2122260223 10.0.0.1 54400 typ host', 'sdpMLineIndex': 0}
+        deliveries = 0
+        start = time.perf_counter()
+        for n in range(messages):
+            target_id = n % size
+            event = {
+                'type': 'webrtc.ice_candidate',
+                'candidate': candidate,
+                'sender_id': (target_id + 1) % size,
+                'target_id': target_id,
+            }
+            if mode == 'fan-out':
+                await layer.group_send(room, event)
+                receivers = channels
+            else:
+                await layer.group_send(f"{room}_user_{target_id}", event)
+                receivers = [channels[target_id]]
+
+            for channel in receivers:
+                received = await layer.receive(channel)
+                deliveries += 1
+                # Every receiving consumer pays for the frame even when it only drops it
+                if received['target_id'] == target_id:
+                    json.dumps({'type': 'ice-candidate', 'candidate': received['candidate']})
+        elapsed = time.perf_counter() - start
+
+        for user_id, channel in enumerate(channels):
+            await layer.group_discard(room, channel)
+            await layer.group_discard(f"{room}_user_{user_id}", channel)
+        return deliveries, elapsed
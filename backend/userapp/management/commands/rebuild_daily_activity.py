@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from userapp.activity import rebuild_user_activity
+from userapp.models import User
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the UserDailyActivity rollup (counters and streaks) from source tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, help='Only rebuild this user id')
+
+    def handle(self, *args, **options):
+        user_ids = User.objects.order_by('id').values_list('id', flat=True)
+        if options['user']:
+            user_ids = user_ids.filter(id=options['user'])
+
+        users = days = 0
+        for user_id in user_ids.iterator():
+            days += rebuild_user_activity(user_id)
+            users += 1
+
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {days} activity days for {users} users"))
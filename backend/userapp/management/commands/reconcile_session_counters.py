@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, F, Q
+
+from userapp.models import FocusBuddySession
+
+
+class Command(BaseCommand):
+    help = 'Recompute FocusBuddySession.participant_count and reserved_seats from participant rows'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Check every session, not only active ones')
+        parser.add_argument('--dry-run', action='store_true', help='Report drift without fixing it')
+
+    def handle(self, *args, **options):
+        sessions = FocusBuddySession.objects.all()
+        if not options['all']:
+            sessions = sessions.filter(status='active')
+
+        sessions = sessions.annotate(
+            actual_participants=Count('participants', filter=Q(
+                participants__left_at__isnull=True,
+                participants__status='approved',
+            )),
+            actual_seats=Count('participants', filter=Q(
+                participants__left_at__isnull=True,
+                participants__status__in=['pending', 'approved'],
+            )),
+        ).exclude(
+            participant_count=F('actual_participants'),
+            reserved_seats=F('actual_seats'),
+        ).values_list('id', 'participant_count', 'actual_participants', 'reserved_seats', 'actual_seats')
+
+        repaired = 0
+        for session_id, count, actual_count, seats, actual_seats in sessions.iterator():
+            self.stdout.write(
+                f"Session {session_id}: participant_count {count} -> {actual_count}, "
+                f"reserved_seats {seats} -> {actual_seats}"
+            )
+            if not options['dry_run']:
+                FocusBuddySession.objects.filter(id=session_id).update(
+                    participant_count=actual_count, reserved_seats=actual_seats
+                )
+            repaired += 1
+
+        verb = 'Found' if options['dry_run'] else 'Repaired'
+        self.stdout.write(self.style.SUCCESS(f"{verb} {repaired} sessions with counter drift"))
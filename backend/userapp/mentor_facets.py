@@ -0,0 +1,157 @@
+"""
+Facet counts for the mentor browse page.
+
+For one set of mentor filters, compute_facets() counts the matches per
+expertise level, rating bucket and price bucket with conditional
+aggregates, and per subject in one GROUP BY over the subjects table. Each
+facet is counted without its own filter, as the browse page offers it. The
+result is cached under a signature of the normalised filters plus a
+catalogue version. Any mentor change that can move a count (approval,
+edits to rating, rate or expertise, or a rebuilt search document) bumps
+the version, which retires every cached facet set at once.
+"""
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .mentor_search import filter_stages
+from .models import Mentor, User
+
+VERSION_KEY = "mentor_facets:version"
+
+EXPERTISE_LEVELS = [value for value, _ in Mentor._meta.get_field('expertise_level').choices]
+
+# "& up" buckets, matching the browse page's minimum-rating filter
+RATING_BUCKETS = (4, 3, 2, 1)
+
+# (label, min inclusive, max exclusive or None), matching the 0-1000 rate slider
+PRICE_BUCKETS = (
+    ('0-250', 0, 250),
+    ('250-500', 250, 500),
+    ('500-750', 500, 750),
+    ('750-1000', 750, 1000),
+    ('1000+', 1000, None),
+)
+
+# Mentor fields whose change can move a facet count
+FACET_FIELDS = {'is_approved', 'approval_status', 'expertise_level', 'rating', 'hourly_rate'}
+
+
+# The filters each facet is counted without, so that its own selection does
+# not hide the other options of the same facet
+FACET_CLEARED_FILTERS = {
+    'subjects': {'subjects': []},
+    'expertise': {'expertise_levels': []},
+    'rating': {'min_rating': 0},
+    'price': {'min_rate': 0, 'max_rate': None},
+}
+
+
+def _price_filter(low, high):
+    condition = Q(hourly_rate__gte=low)
+    if high is not None:
+        condition &= Q(hourly_rate__lt=high)
+    return condition
+
+
+def _matching(filters):
+    return filter_stages(filters)[-1][1].order_by()
+
+
+def compute_facets(filters):
+    """
+    Facet counts for the mentors matching `filters` (see parse_mentor_filters).
+    Each facet is counted with every filter but its own; facets whose own
+    filter is unset share one aggregate over the full match.
+    """
+    without = {facet: {**filters, **cleared} for facet, cleared in FACET_CLEARED_FILTERS.items()}
+
+    # signature -> (filters, aggregates to compute over their matches)
+    groups = {}
+
+    def count(over, name, aggregate):
+        groups.setdefault(filter_signature(over), (over, {}))[1][name] = aggregate
+
+    count(filters, 'total', Count('pk'))
+    for level in EXPERTISE_LEVELS:
+        count(without['expertise'], f'expertise:{level}', Count('pk', filter=Q(expertise_level=level)))
+    for minimum in RATING_BUCKETS:
+        count(without['rating'], f'rating:{minimum}', Count('pk', filter=Q(rating__gte=minimum)))
+    for label, low, high in PRICE_BUCKETS:
+        count(without['price'], f'price:{label}', Count('pk', filter=_price_filter(low, high)))
+
+    counts = {}
+    for over, aggregates in groups.values():
+        counts.update(_matching(over).aggregate(**aggregates))
+
+    subjects = User.subjects.through.objects.filter(
+        user_id__in=_matching(without['subjects']).values('user_id')
+    ).values('subject_id', 'subject__name').annotate(count=Count('user_id')).order_by('-count', 'subject__name')
+
+    return {
+        'total': counts['total'],
+        'subjects': [
+            {'id': row['subject_id'], 'name': row['subject__name'], 'count': row['count']}
+            for row in subjects
+        ],
+        'expertise_levels': [
+            {'value': level, 'count': counts[f'expertise:{level}']} for level in EXPERTISE_LEVELS
+        ],
+        'rating': [
+            {'min_rating': minimum, 'count': counts[f'rating:{minimum}']} for minimum in RATING_BUCKETS
+        ],
+        'hourly_rate': [
+            {'label': label, 'min': low, 'max': high, 'count': counts[f'price:{label}']}
+            for label, low, high in PRICE_BUCKETS
+        ],
+    }
+
+
+def filter_signature(filters):
+    """Stable hash of normalised filters; equivalent requests share one cache entry"""
+    # Sort order does not change any count
+    filters = {name: value for name, value in filters.items() if name != 'sort'}
+    payload = json.dumps(filters, sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode()).hexdigest()
+
+
+def catalogue_version():
+    """Version of the mentor catalogue; caches keyed on it retire with the facets"""
+    return cache.get(VERSION_KEY, 0)
+
+
+def get_facets(filters):
+    """Cached compute_facets()"""
+    key = f"mentor_facets:{catalogue_version()}:{filter_signature(filters)}"
+    facets = cache.get(key)
+    if facets is None:
+        facets = compute_facets(filters)
+        cache.set(key, facets, settings.MENTOR_FACETS_CACHE_TTL)
+    return facets
+
+
+def invalidate_facets():
+    """Retire every cached facet set"""
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        # Unset reads as version 0, so starting at 1 still invalidates
+        cache.add(VERSION_KEY, 1, timeout=None)
+
+
+# ---------- Signal receivers ----------
+@receiver(post_save, sender=Mentor)
+def mentor_saved(sender, instance, created, update_fields=None, **kwargs):
+    """Approval and profile edits move counts; wallet or image updates do not"""
+    if created or update_fields is None or FACET_FIELDS.intersection(update_fields):
+        invalidate_facets()
+
+
+@receiver(post_delete, sender=Mentor)
+def mentor_deleted(sender, **kwargs):
+    invalidate_facets()
@@ -0,0 +1,275 @@
+"""
+Full-text search over the mentor catalogue.
+
+Each Mentor stores a precomputed search document built from the user's name
+and bio, their subjects and the mentor's expertise level. On Postgres the
+document is also kept as a weighted tsvector (name > subjects > expertise >
+bio) behind a GIN index, and as plain text behind a pg_trgm GIN index, so a
+search never joins through subjects or scans the table. Receivers below
+rebuild a mentor's document whenever one of its inputs changes.
+"""
+import logging
+import re
+
+from django.contrib.postgres.search import (
+    SearchQuery, SearchRank, SearchVector, TrigramWordSimilarity
+)
+from django.db import connection
+from django.db.models import Count, Exists, F, IntegerField, OuterRef, Q, Subquery, TextField, Value
+from django.db.models.functions import Coalesce
+from django.db.models.signals import m2m_changed, post_init, post_save
+from django.dispatch import receiver
+
+from .availability import free_at, parse_time, parse_weekday
+from .models import Mentor, MentorSession, Subject, User
+
+logger = logging.getLogger(__name__)
+
+SEARCH_CONFIG = 'simple'
+
+# ?sort= values for mentor lists; the default keeps rating (or search rank) order
+SORT_ORDERINGS = {
+    'next_available': (F('next_available_at').asc(nulls_last=True), '-rating', 'pk'),
+}
+
+_TOKEN = re.compile(r'\w+', re.UNICODE)
+
+
+def _is_postgres():
+    return connection.vendor == 'postgresql'
+
+
+def build_search_vector(name, subjects, expertise, bio):
+    """Weighted tsvector expression for one mentor's document"""
+    parts = ((name, 'A'), (subjects, 'B'), (expertise, 'C'), (bio, 'D'))
+    vector = None
+    for text, weight in parts:
+        part = SearchVector(Value(text or '', output_field=TextField()), weight=weight, config=SEARCH_CONFIG)
+        vector = part if vector is None else vector + part
+    return vector
+
+
+def refresh_search_documents(mentor_ids):
+    """Rebuild the stored search document of the given mentors"""
+    mentors = Mentor.objects.filter(pk__in=mentor_ids).select_related('user').prefetch_related('user__subjects')
+    for mentor in mentors:
+        name = mentor.user.name or ''
+        bio = mentor.user.bio or ''
+        subjects = ' '.join(subject.name for subject in mentor.user.subjects.all())
+        expertise = mentor.expertise_level or ''
+
+        fields = {'search_text': ' '.join(part for part in (name, subjects, expertise, bio) if part)}
+        if _is_postgres():
+            fields['search_vector'] = build_search_vector(name, subjects, expertise, bio)
+        # update() rather than save() so the Mentor receivers do not fire again
+        Mentor.objects.filter(pk=mentor.pk).update(**fields)
+
+    # Searches are part of the facet filter signature
+    from .mentor_facets import invalidate_facets
+    invalidate_facets()
+
+
+def prefix_query(term):
+    """
+    Turn user input into a raw tsquery where every word is a prefix match,
+    e.g. "pyth data" -> "pyth:* & data:*". Returns None if nothing is left.
+    """
+    tokens = _TOKEN.findall(term.lower())
+    if not tokens:
+        return None
+    return ' & '.join(f'{token}:*' for token in tokens)
+
+
+def search_mentors(queryset, term):
+    """
+    Filter and rank mentors by a free-text search term.
+
+    On Postgres, matches are prefix full-text hits on the weighted document
+    or close trigram matches (for typos); results carry a `search_rank`
+    annotation. Elsewhere every word must appear in the stored document.
+    """
+    tokens = _TOKEN.findall(term.lower())
+    if not tokens:
+        return queryset
+
+    if not _is_postgres():
+        for token in tokens:
+            queryset = queryset.filter(search_text__icontains=token)
+        return queryset
+
+    query = SearchQuery(prefix_query(term), search_type='raw', config=SEARCH_CONFIG)
+    similarity = TrigramWordSimilarity(Value(term), 'search_text')
+    return queryset.annotate(
+        search_rank=SearchRank(F('search_vector'), query) + similarity,
+    ).filter(
+        Q(search_vector=query) | Q(search_text__trigram_word_similar=term)
+    ).order_by('-search_rank', '-rating', 'pk')
+
+
+def _decimal_param(params, name, default):
+    value = params.get(name, '')
+    if value in ('', None):
+        return default
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        logger.warning(f"Ignoring invalid {name} value '{value}'")
+        return default
+
+
+def parse_mentor_filters(params):
+    """
+    Normalise mentor list query parameters. Invalid values are ignored
+    rather than rejected, as the browse page has always done.
+
+    Returns:
+        dict: search, subjects, expertise_levels, min_rating, min_rate,
+        max_rate, available_day (Monday=0), available_minute and sort
+    """
+    subjects = params.get('subjects', '').strip()
+    available_day = params.get('available_day', '')
+    available_time = params.get('available_time', '')
+    return {
+        'search': params.get('search', '').strip(),
+        'subjects': sorted({name.strip() for name in subjects.split(',') if name.strip()}),
+        'expertise_levels': sorted({level.strip() for level in params.getlist('expertise_level') if level.strip()}),
+        'min_rating': _decimal_param(params, 'rating', 0),
+        'min_rate': _decimal_param(params, 'min_hourly_rate', 0),
+        'max_rate': _decimal_param(params, 'max_hourly_rate', 1000),
+        'available_day': parse_weekday(available_day) if available_day else None,
+        'available_minute': parse_time(available_time) if available_time else None,
+        'sort': params.get('sort') if params.get('sort') in SORT_ORDERINGS else None,
+    }
+
+
+def filter_stages(filters):
+    """
+    Every predicate for a mentor list request, composed onto one queryset.
+
+    Returns:
+        list: (stage name, queryset) pairs; each queryset includes every
+        stage before it and the last one is the full result
+    """
+    mentors = Mentor.objects.filter(is_approved=True, approval_status='approved')
+    stages = [('base', mentors)]
+
+    if filters['search']:
+        mentors = search_mentors(mentors, filters['search'])
+        stages.append(('search', mentors))
+
+    if filters['subjects']:
+        # EXISTS instead of joining through subjects and de-duplicating with distinct()
+        teaches = User.subjects.through.objects.filter(
+            user_id=OuterRef('user_id'), subject__name__in=filters['subjects']
+        )
+        mentors = mentors.filter(Exists(teaches))
+        stages.append(('subjects', mentors))
+
+    if filters['expertise_levels']:
+        mentors = mentors.filter(expertise_level__in=filters['expertise_levels'])
+        stages.append(('expertise', mentors))
+
+    if filters['min_rating'] > 0:
+        mentors = mentors.filter(rating__gte=filters['min_rating'])
+        stages.append(('rating', mentors))
+
+    rate = Q(hourly_rate__gte=filters['min_rate'])
+    if filters['max_rate'] is not None:
+        rate &= Q(hourly_rate__lte=filters['max_rate'])
+    mentors = mentors.filter(rate)
+    stages.append(('rate', mentors))
+
+    if filters['available_day'] is not None and filters['available_minute'] is not None:
+        mentors = mentors.filter(free_at(filters['available_day'], filters['available_minute']))
+        stages.append(('availability', mentors))
+    return stages
+
+
+def filter_mentors(filters):
+    """Mentors matching the normalised filters, ready to serialise in two queries"""
+    mentors = filter_stages(filters)[-1][1]
+    session_count = MentorSession.objects.filter(
+        mentor_id=OuterRef('pk')
+    ).order_by().values('mentor_id').annotate(count=Count('pk')).values('count')
+    mentors = mentors.select_related('user').prefetch_related('user__subjects').annotate(
+        session_count=Coalesce(Subquery(session_count, output_field=IntegerField()), 0)
+    ).defer('search_text', 'search_vector')
+    if filters.get('sort'):
+        mentors = mentors.order_by(*SORT_ORDERINGS[filters['sort']])
+    return mentors
+
+
+# ---------- Signal receivers ----------
+def _mentor_ids_for_users(user_ids):
+    return list(Mentor.objects.filter(user_id__in=user_ids).values_list('pk', flat=True))
+
+
+@receiver(post_init, sender=User)
+def remember_search_source(sender, instance, **kwargs):
+    # Read __dict__ so deferred fields are not fetched just to remember them
+    instance.__dict__['_search_source'] = (instance.__dict__.get('name'), instance.__dict__.get('bio'))
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, **kwargs):
+    """Name and bio feed the document; logins and OTP writes do not"""
+    current = (instance.__dict__.get('name'), instance.__dict__.get('bio'))
+    changed = current != instance.__dict__.get('_search_source')
+    instance.__dict__['_search_source'] = current
+    if changed and not created:
+        mentor_ids = _mentor_ids_for_users([instance.pk])
+        if mentor_ids:
+            refresh_search_documents(mentor_ids)
+
+
+@receiver(post_init, sender=Mentor)
+def remember_expertise(sender, instance, **kwargs):
+    instance.__dict__['_search_source'] = instance.__dict__.get('expertise_level')
+
+
+@receiver(post_save, sender=Mentor)
+def mentor_saved(sender, instance, created, update_fields=None, **kwargs):
+    """Expertise is the only Mentor field in the document; rate, rating and approval saves leave it alone"""
+    if update_fields is not None and 'expertise_level' not in update_fields:
+        return
+    current = instance.__dict__.get('expertise_level')
+    changed = current != instance.__dict__.get('_search_source')
+    instance.__dict__['_search_source'] = current
+    if created or changed:
+        refresh_search_documents([instance.pk])
+
+
+@receiver(m2m_changed, sender=User.subjects.through)
+def user_subjects_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            mentor_ids = _mentor_ids_for_users([instance.pk])
+            if mentor_ids:
+                refresh_search_documents(mentor_ids)
+        return
+
+    # instance is a Subject and pk_set holds user ids, except for a clear,
+    # whose users have to be captured before the rows are gone
+    if action == 'pre_clear':
+        instance._search_clear_mentor_ids = list(
+            Mentor.objects.filter(user__subjects=instance).values_list('pk', flat=True)
+        )
+    elif action == 'post_clear':
+        mentor_ids = getattr(instance, '_search_clear_mentor_ids', [])
+        if mentor_ids:
+            refresh_search_documents(mentor_ids)
+    elif action in ('post_add', 'post_remove'):
+        mentor_ids = _mentor_ids_for_users(pk_set)
+        if mentor_ids:
+            refresh_search_documents(mentor_ids)
+
+
+@receiver(post_save, sender=Subject)
+def subject_saved(sender, instance, created, **kwargs):
+    """A renamed subject changes the document of every mentor who teaches it"""
+    if not created:
+        mentor_ids = list(
+            Mentor.objects.filter(user__subjects=instance).values_list('pk', flat=True)
+        )
+        if mentor_ids:
+            refresh_search_documents(mentor_ids)
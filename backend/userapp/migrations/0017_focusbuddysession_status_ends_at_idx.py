@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('userapp', '0016_focusbuddysession_userapp_foc_creator_745480_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='focusbuddysession',
+            index=models.Index(fields=['status', 'ends_at'], name='userapp_foc_status_200198_idx'),
+        ),
+    ]
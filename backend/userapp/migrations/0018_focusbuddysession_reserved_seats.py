@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:08
+
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def backfill_reserved_seats(apps, schema_editor):
+    FocusBuddySession = apps.get_model('userapp', 'FocusBuddySession')
+    sessions = FocusBuddySession.objects.filter(status='active').annotate(
+        seats=Count('participants', filter=Q(
+            participants__left_at__isnull=True,
+            participants__status__in=['pending', 'approved'],
+        ))
+    )
+    for session in sessions:
+        FocusBuddySession.objects.filter(pk=session.pk).update(reserved_seats=session.seats)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('userapp', '0017_focusbuddysession_status_ends_at_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='focusbuddysession',
+            name='reserved_seats',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_reserved_seats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:12
+
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def backfill_participant_count(apps, schema_editor):
+    FocusBuddySession = apps.get_model('userapp', 'FocusBuddySession')
+    sessions = FocusBuddySession.objects.filter(status='active').annotate(
+        approved=Count('participants', filter=Q(
+            participants__left_at__isnull=True,
+            participants__status='approved',
+        ))
+    )
+    for session in sessions:
+        FocusBuddySession.objects.filter(pk=session.pk).update(participant_count=session.approved)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('userapp', '0018_focusbuddysession_reserved_seats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='focusbuddysession',
+            name='participant_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_participant_count, migrations.RunPython.noop),
+    ]
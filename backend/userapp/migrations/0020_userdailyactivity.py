@@ -0,0 +1,62 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:11
+
+import django.db.models.deletion
+from datetime import timedelta
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def backfill_daily_activity(apps, schema_editor):
+    PomodoroSession = apps.get_model('userapp', 'PomodoroSession')
+    Journal = apps.get_model('userapp', 'Journal')
+    FocusBuddySession = apps.get_model('userapp', 'FocusBuddySession')
+    UserDailyActivity = apps.get_model('userapp', 'UserDailyActivity')
+
+    days = {}
+    sources = (
+        ('pomodoros', PomodoroSession.objects.filter(is_completed=True), 'task__user_id', 'start_time__date'),
+        ('journals', Journal.objects.all(), 'user_id', 'date'),
+        ('focus_sessions', FocusBuddySession.objects.all(), 'creator_id_id', 'started_at__date'),
+    )
+    for counter, queryset, user_field, day_field in sources:
+        grouped = queryset.values_list(user_field, day_field).annotate(count=Count('id')).order_by()
+        for user_id, day, count in grouped:
+            days.setdefault((user_id, day), {})[counter] = count
+
+    rows = []
+    streak, previous = 0, (None, None)
+    for user_id, day in sorted(days):
+        consecutive = previous[0] == user_id and day - previous[1] == timedelta(days=1)
+        streak = streak + 1 if consecutive else 1
+        rows.append(UserDailyActivity(user_id=user_id, date=day, streak=streak, **days[(user_id, day)]))
+        previous = (user_id, day)
+
+    UserDailyActivity.objects.bulk_create(rows, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('userapp', '0019_focusbuddysession_participant_count'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserDailyActivity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('pomodoros', models.PositiveIntegerField(default=0)),
+                ('journals', models.PositiveIntegerField(default=0)),
+                ('focus_sessions', models.PositiveIntegerField(default=0)),
+                ('streak', models.PositiveIntegerField(default=1)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_activity', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-date'],
+                'unique_together': {('user', 'date')},
+            },
+        ),
+        migrations.RunPython(backfill_daily_activity, migrations.RunPython.noop),
+    ]
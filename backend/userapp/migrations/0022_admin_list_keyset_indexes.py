@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('userapp', '0021_user_date_joined_id_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='focusbuddysession',
+            index=models.Index(fields=['created_at', 'id'], name='userapp_foc_created_96264e_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='journal',
+            index=models.Index(fields=['created_at', 'id'], name='userapp_jou_created_d1eea9_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='mentor',
+            index=models.Index(fields=['approval_status', 'created_at', 'id'], name='userapp_men_approva_eccbc9_idx'),
+        ),
+    ]
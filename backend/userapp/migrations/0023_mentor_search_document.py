@@ -0,0 +1,58 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:19
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.contrib.postgres.operations import TrigramExtension
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations, models
+from django.db.models import TextField, Value
+
+
+def backfill_search_documents(apps, schema_editor):
+    Mentor = apps.get_model('userapp', 'Mentor')
+    is_postgres = schema_editor.connection.vendor == 'postgresql'
+
+    for mentor in Mentor.objects.select_related('user').prefetch_related('user__subjects').iterator(chunk_size=500):
+        name = mentor.user.name or ''
+        bio = mentor.user.bio or ''
+        subjects = ' '.join(subject.name for subject in mentor.user.subjects.all())
+        expertise = mentor.expertise_level or ''
+
+        fields = {'search_text': ' '.join(part for part in (name, subjects, expertise, bio) if part)}
+        if is_postgres:
+            vector = None
+            for text, weight in ((name, 'A'), (subjects, 'B'), (expertise, 'C'), (bio, 'D')):
+                part = SearchVector(Value(text, output_field=TextField()), weight=weight, config='simple')
+                vector = part if vector is None else vector + part
+            fields['search_vector'] = vector
+        Mentor.objects.filter(pk=mentor.pk).update(**fields)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('userapp', '0022_admin_list_keyset_indexes'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddField(
+            model_name='mentor',
+            name='search_text',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.AddField(
+            model_name='mentor',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='mentor',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='mentor_search_vector_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='mentor',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_text'], name='mentor_search_trgm_idx', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.RunPython(backfill_search_documents, migrations.RunPython.noop),
+    ]
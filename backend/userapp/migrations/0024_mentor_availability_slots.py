@@ -0,0 +1,67 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:22
+
+from datetime import datetime
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+WEEKDAYS = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
+
+
+def _minutes(value):
+    for time_format in ('%I:%M %p', '%H:%M', '%H:%M:%S'):
+        try:
+            parsed = datetime.strptime(value.strip(), time_format)
+        except (AttributeError, ValueError):
+            continue
+        return parsed.hour * 60 + parsed.minute
+    return None
+
+
+def backfill_availability_slots(apps, schema_editor):
+    Mentor = apps.get_model('userapp', 'Mentor')
+    MentorAvailabilitySlot = apps.get_model('userapp', 'MentorAvailabilitySlot')
+
+    slots = []
+    for mentor_id, availability in Mentor.objects.values_list('id', 'availability').iterator():
+        if not isinstance(availability, dict):
+            continue
+        windows = set()
+        for day, times in availability.items():
+            if day not in WEEKDAYS or not isinstance(times, list):
+                continue
+            for value in times:
+                start = _minutes(value)
+                if start is not None:
+                    windows.add((WEEKDAYS.index(day), start, min(start + 60, 24 * 60)))
+        slots.extend(
+            MentorAvailabilitySlot(mentor_id=mentor_id, weekday=weekday, start_minute=start, end_minute=end)
+            for weekday, start, end in windows
+        )
+    MentorAvailabilitySlot.objects.bulk_create(slots, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('userapp', '0023_mentor_search_document'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MentorAvailabilitySlot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('weekday', models.PositiveSmallIntegerField(choices=[(0, 'Monday'), (1, 'Tuesday'), (2, 'Wednesday'), (3, 'Thursday'), (4, 'Friday'), (5, 'Saturday'), (6, 'Sunday')])),
+                ('start_minute', models.PositiveSmallIntegerField()),
+                ('end_minute', models.PositiveSmallIntegerField()),
+                ('mentor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='availability_slots', to='userapp.mentor')),
+            ],
+            options={
+                'ordering': ['weekday', 'start_minute'],
+                'indexes': [models.Index(fields=['weekday', 'start_minute', 'end_minute'], name='userapp_men_weekday_684a44_idx')],
+                'unique_together': {('mentor', 'weekday', 'start_minute')},
+            },
+        ),
+        migrations.RunPython(backfill_availability_slots, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('userapp', '0024_mentor_availability_slots'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mentor',
+            name='next_available_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='mentor',
+            name='upcoming_slots',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.AddIndex(
+            model_name='mentor',
+            index=models.Index(fields=['next_available_at'], name='userapp_men_next_av_46c763_idx'),
+        ),
+    ]
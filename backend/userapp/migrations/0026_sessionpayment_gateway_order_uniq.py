@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:26
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def detach_duplicate_orders(apps, schema_editor):
+    """
+    Double-submitted confirmations may have left several payments on one
+    gateway order. The first payment keeps the order id; later ones have it
+    moved into gateway_response so the unique constraint can be added and
+    the rows can still be reconciled by hand.
+    """
+    SessionPayment = apps.get_model('userapp', 'SessionPayment')
+
+    duplicated = (
+        SessionPayment.objects.exclude(gateway_order_id__isnull=True).exclude(gateway_order_id='')
+        .values('gateway_order_id').annotate(payments=Count('id')).filter(payments__gt=1)
+        .values_list('gateway_order_id', flat=True)
+    )
+    for order_id in list(duplicated):
+        for payment in SessionPayment.objects.filter(gateway_order_id=order_id).order_by('id')[1:]:
+            response = payment.gateway_response if isinstance(payment.gateway_response, dict) else {}
+            payment.gateway_response = {**response, 'duplicate_of_order': order_id}
+            payment.gateway_order_id = None
+            payment.save(update_fields=['gateway_order_id', 'gateway_response'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('userapp', '0025_mentor_next_available'),
+    ]
+
+    operations = [
+        migrations.RunPython(detach_duplicate_orders, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='sessionpayment',
+            constraint=models.UniqueConstraint(condition=models.Q(('gateway_order_id__isnull', False), models.Q(('gateway_order_id', ''), _negated=True)), fields=('gateway_order_id',), name='sessionpayment_gateway_order_uniq'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:14
+
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def backfill_snapshot_credits(apps, schema_editor):
+    """Give existing snapshots their running credit total"""
+    LedgerEntry = apps.get_model('userapp', 'LedgerEntry')
+    LedgerSnapshot = apps.get_model('userapp', 'LedgerSnapshot')
+    for snapshot in LedgerSnapshot.objects.iterator():
+        credits = LedgerEntry.objects.filter(
+            account_id=snapshot.account_id, id__lte=snapshot.last_entry_id, amount__gt=0
+        ).aggregate(total=Sum('amount'))['total'] or 0
+        LedgerSnapshot.objects.filter(pk=snapshot.pk).update(credits=credits)
+
+
+def clear_system_balances(apps, schema_editor):
+    """System accounts no longer keep a running balance; zero the stale one"""
+    LedgerAccount = apps.get_model('userapp', 'LedgerAccount')
+    LedgerAccount.objects.exclude(account_type__in=['user_wallet', 'mentor_wallet']).update(balance=0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('userapp', '0028_wallet_ledger'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ledgersnapshot',
+            name='credits',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=12),
+        ),
+        migrations.RunPython(backfill_snapshot_credits, migrations.RunPython.noop),
+        migrations.RunPython(clear_system_balances, migrations.RunPython.noop),
+    ]
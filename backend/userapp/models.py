@@ -1,5 +1,8 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, PermissionsMixin
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.utils import timezone
 from cloudinary.models import CloudinaryField
 from django.core.validators import MinValueValidator, MaxValueValidator
@@ -50,7 +53,13 @@ class Task(models.Model):
 
         # If is_completed changed to True, update related PomodoroSession objects
         if is_completed_changed:
-            self.sessions.filter(is_completed=False).update(is_completed=True)
+            from .activity import record_pomodoros_completed
+
+            pending_sessions = self.sessions.filter(is_completed=False)
+            start_times = list(pending_sessions.values_list('start_time', flat=True))
+            pending_sessions.update(is_completed=True)
+            # The bulk update skips signals, so feed the activity rollup directly
+            record_pomodoros_completed(self.user_id, start_times)
 
 class PomodoroSession(models.Model):
     SESSION_TYPES = [
@@ -80,7 +89,20 @@ class PomodoroSettings(models.Model):
     def __str__(self):
         return f"Pomodoro Settings - {self.user.name}"
 
-class UserManager(BaseUserManager):
+class UserQuerySet(models.QuerySet):
+    def update(self, **kwargs):
+        """Bulk updates skip post_save, so evict the affected users from the auth cache here"""
+        from .auth_cache import invalidate_users
+        user_ids = list(self.values_list('pk', flat=True))
+        updated = super().update(**kwargs)
+        if user_ids:
+            transaction.on_commit(lambda: invalidate_users(user_ids))
+        return updated
+
+    update.alters_data = True
+
+
+class UserManager(BaseUserManager.from_queryset(UserQuerySet)):
     def create_user(self, email, name, password=None, **extra_fields):
         if not email:
             raise ValueError("Users must have an email address")
@@ -117,6 +139,7 @@ class User(AbstractBaseUser, PermissionsMixin):
     subjects = models.ManyToManyField(Subject, related_name='users', blank=True)
     bio = models.TextField(blank=True, null=True)
     experience = models.IntegerField(default=0)
+    # Balance from before the wallet ledger; read once as the wallet's opening entry (see ledger.py)
     wallet_balance = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     
     # Google Auth specific fields
@@ -134,6 +157,12 @@ class User(AbstractBaseUser, PermissionsMixin):
     REQUIRED_FIELDS = ['name']
     
     objects = UserManager()
+
+    class Meta:
+        indexes = [
+            # Keyset pagination of the admin user list
+            models.Index(fields=['date_joined', 'id']),
+        ]
     
     def __str__(self):
         return self.email
@@ -194,15 +223,28 @@ class Mentor(models.Model):
         blank=True,
         related_name='approved_mentors'
     )
+    # Balance from before the wallet ledger; read once as the wallet's opening entry (see ledger.py)
     wallet_balance = models.DecimalField(max_digits=10, decimal_places=2, default=0)
 
+    # Soonest open slots, maintained by userapp.availability
+    next_available_at = models.DateTimeField(null=True, blank=True)
+    upcoming_slots = models.JSONField(default=list, blank=True)
+
+    # Search document (name, subjects, expertise, bio), maintained by userapp.mentor_search
+    search_text = models.TextField(blank=True, default='')
+    search_vector = SearchVectorField(null=True, blank=True)
+
     class Meta:
         ordering = ['-rating']
         indexes = [
             models.Index(fields=['is_approved', 'approval_status', 'is_available']),
+            models.Index(fields=['approval_status', 'created_at', 'id']),
             models.Index(fields=['expertise_level']),
             models.Index(fields=['hourly_rate']),
             models.Index(fields=['rating']),
+            models.Index(fields=['next_available_at']),
+            GinIndex(fields=['search_vector'], name='mentor_search_vector_idx'),
+            GinIndex(fields=['search_text'], opclasses=['gin_trgm_ops'], name='mentor_search_trgm_idx'),
         ]
 
     def __str__(self):
@@ -289,12 +331,57 @@ class Journal(models.Model):
         indexes = [
             models.Index(fields=['user', 'date']),
             models.Index(fields=['is_blocked']),
+            models.Index(fields=['created_at', 'id']),
         ]
 
     def __str__(self):
         return f"{self.user.name} - {self.date} ({self.mood})"
 
 
+class MentorAvailabilitySlot(models.Model):
+    """
+    One weekly availability window of a mentor, normalised from
+    Mentor.availability (see availability.py). Minutes count from midnight.
+    """
+    WEEKDAY_CHOICES = [
+        (0, 'Monday'), (1, 'Tuesday'), (2, 'Wednesday'), (3, 'Thursday'),
+        (4, 'Friday'), (5, 'Saturday'), (6, 'Sunday'),
+    ]
+
+    mentor = models.ForeignKey(Mentor, on_delete=models.CASCADE, related_name='availability_slots')
+    weekday = models.PositiveSmallIntegerField(choices=WEEKDAY_CHOICES)  # date.weekday(), Monday=0
+    start_minute = models.PositiveSmallIntegerField()
+    end_minute = models.PositiveSmallIntegerField()
+
+    class Meta:
+        unique_together = ('mentor', 'weekday', 'start_minute')
+        ordering = ['weekday', 'start_minute']
+        indexes = [
+            # "Who is free on this weekday at this minute"
+            models.Index(fields=['weekday', 'start_minute', 'end_minute']),
+        ]
+
+    def __str__(self):
+        return f"{self.mentor} - {self.get_weekday_display()} {self.start_minute}-{self.end_minute}"
+
+
+class UserDailyActivity(models.Model):
+    """Per-user, per-day activity rollup behind streaks and calendar heatmaps (see activity.py)"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='daily_activity')
+    date = models.DateField()
+    pomodoros = models.PositiveIntegerField(default=0)  # completed pomodoro sessions
+    journals = models.PositiveIntegerField(default=0)
+    focus_sessions = models.PositiveIntegerField(default=0)  # focus buddy sessions created
+    streak = models.PositiveIntegerField(default=1)  # consecutive active days ending on this date
+
+    class Meta:
+        unique_together = ('user', 'date')
+        ordering = ['-date']
+
+    def __str__(self):
+        return f"{self.user.name} - {self.date} (streak {self.streak})"
+
+
 
 class MentorSession(models.Model):
     SESSION_STATUS_CHOICES = [
@@ -476,6 +563,14 @@ class SessionPayment(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        constraints = [
+            # One booking per gateway order; booking confirmation retries replay it
+            models.UniqueConstraint(
+                fields=['gateway_order_id'],
+                condition=models.Q(gateway_order_id__isnull=False) & ~models.Q(gateway_order_id=''),
+                name='sessionpayment_gateway_order_uniq',
+            ),
+        ]
     
     def __str__(self):
         return f"Payment for {self.session} - {self.amount} {self.currency} ({self.status})"
@@ -590,6 +685,10 @@ class FocusBuddySession(models.Model):
         ('cancelled', 'Cancelled'),
         ('expired', 'Expired'),
     ]
+
+    # Statuses the join view has always accepted; 'waiting' is kept for rows written before
+    # the current choices
+    JOINABLE_STATUSES = ('waiting', 'active')
     
     SESSION_TYPE_CHOICES = [
         ('study', 'Study'),
@@ -606,6 +705,11 @@ class FocusBuddySession(models.Model):
     status = models.CharField(max_length=15, choices=SESSION_STATUS_CHOICES, default='active')
     duration_minutes = models.IntegerField(choices=DURATION_CHOICES, default=25)
     max_participants = models.IntegerField(default=10)  # Maximum number of participants
+    # Seats held by participants who have not left (pending or approved); see reserve_seat()
+    reserved_seats = models.PositiveIntegerField(default=0)
+    # Approved participants who have not left. Maintained by the join/approve/leave/end
+    # paths; `manage.py reconcile_session_counters` repairs drift
+    participant_count = models.PositiveIntegerField(default=0)
     
     # Session timing
     started_at = models.DateTimeField(auto_now_add=True)  # Session starts when created
@@ -622,6 +726,8 @@ class FocusBuddySession(models.Model):
             models.Index(fields=['creator_id', 'status']),
             models.Index(fields=['status']),
             models.Index(fields=['session_type']),
+            models.Index(fields=['status', 'ends_at']),
+            models.Index(fields=['created_at', 'id']),
         ]
     
     def __str__(self):
@@ -647,15 +753,10 @@ class FocusBuddySession(models.Model):
         remaining = (self.ends_at - timezone.now()).total_seconds()
         return max(0, int(remaining))
     
-    @property
-    def participant_count(self):
-        """Get current number of participants"""
-        return self.participants.filter(left_at__isnull=True).count()
-    
     @property
     def is_full(self):
         """Check if session is at maximum capacity"""
-        return self.participant_count >= self.max_participants
+        return self.reserved_seats >= self.max_participants
     
     @property
     def can_join(self):
@@ -664,17 +765,90 @@ class FocusBuddySession(models.Model):
                 not self.is_expired and 
                 not self.is_full)
     
-    def end_session(self, reason='completed'):
+    @classmethod
+    def reserve_seat(cls, session_id, approved=False):
+        """
+        Take a seat in a joinable session if one is free.
+        A single conditional UPDATE, so concurrent joiners cannot overfill the room.
+        Pass approved=True when the seat holder is admitted straight away (the creator).
+        Returns True if a seat was reserved.
+        """
+        updates = {'reserved_seats': F('reserved_seats') + 1}
+        if approved:
+            updates['participant_count'] = F('participant_count') + 1
+        return cls.objects.filter(
+            id=session_id,
+            status__in=cls.JOINABLE_STATUSES,
+            reserved_seats__lt=F('max_participants')
+        ).update(**updates) == 1
+
+    @classmethod
+    def release_seat(cls, session_id, approved=False):
+        """
+        Give a seat back after a participant leaves or is rejected.
+        Callers claim the participant's change with a conditional UPDATE first,
+        so each reserved seat is released exactly once.
+        """
+        updates = {'reserved_seats': F('reserved_seats') - 1}
+        if approved:
+            updates['participant_count'] = F('participant_count') - 1
+        cls.objects.filter(id=session_id).update(**updates)
+
+    @classmethod
+    def participant_approved(cls, session_id):
+        """Count a pending participant (who already holds a seat) as in the session"""
+        cls.objects.filter(id=session_id).update(participant_count=F('participant_count') + 1)
+
+    def end_session(self, reason='completed', message=None, sender=None):
         """End the focus session"""
-        self.status = reason
-        self.ended_at = timezone.now()
-        self.save()
-        
-        # Mark all active participants as left
-        active_participants = self.participants.filter(left_at__isnull=True)
-        for participant in active_participants:
-            participant.left_at = timezone.now()
-            participant.save()
+        ended = FocusBuddySession.end_sessions(
+            [self.pk], reason=reason, message=message, sender=sender
+        )
+        if ended:
+            self.status = reason
+            self.ended_at = ended[self.pk]
+        return bool(ended)
+
+    @classmethod
+    def end_sessions(cls, session_ids, reason='completed', message=None, sender=None):
+        """
+        End many active sessions at once.
+        One UPDATE for the sessions, one for their open participants and one
+        bulk INSERT for the system messages. Sessions that are no longer active
+        are skipped. Returns a dict of {session_id: ended_at} for ended sessions.
+        """
+        now = timezone.now()
+        with transaction.atomic():
+            sessions = list(
+                cls.objects.select_for_update()
+                .filter(id__in=session_ids, status='active')
+                .values_list('id', 'creator_id')
+            )
+            if not sessions:
+                return {}
+            ended_ids = [session_id for session_id, _ in sessions]
+
+            cls.objects.filter(id__in=ended_ids).update(
+                status=reason, ended_at=now, updated_at=now,
+                reserved_seats=0, participant_count=0
+            )
+            FocusBuddyParticipant.objects.filter(
+                session_id__in=ended_ids, left_at__isnull=True
+            ).update(left_at=now)
+
+            if message:
+                # System messages are attributed to the acting user, or the creator
+                FocusBuddyMessage.objects.bulk_create([
+                    FocusBuddyMessage(
+                        session_id=session_id,
+                        sender_id=sender.id if sender else creator_id,
+                        message=message,
+                        is_system_message=True
+                    )
+                    for session_id, creator_id in sessions
+                ])
+
+        return {session_id: now for session_id in ended_ids}
 
 
 class FocusBuddyParticipant(models.Model):
@@ -719,10 +893,26 @@ class FocusBuddyParticipant(models.Model):
         return max(0, int(duration))
     
     def leave_session(self):
-        """Mark participant as having left the session"""
-        if not self.left_at:
-            self.left_at = timezone.now()
-            self.save()
+        """
+        Mark participant as having left the session.
+        Conditional on left_at still being empty, so a double leave releases one seat.
+        Returns True if this call marked the participant as left.
+        """
+        now = timezone.now()
+        with transaction.atomic():
+            left = FocusBuddyParticipant.objects.filter(
+                pk=self.pk, left_at__isnull=True
+            ).update(left_at=now)
+            if not left:
+                return False
+            # Approve/reject only act on participants who have not left, so this status is final
+            self.status = FocusBuddyParticipant.objects.values_list('status', flat=True).get(pk=self.pk)
+            self.left_at = now
+            if self.status in ('pending', 'approved'):
+                FocusBuddySession.release_seat(
+                    self.session_id, approved=self.status == 'approved'
+                )
+        return True
 
 
 class FocusBuddyMessage(models.Model):
@@ -865,4 +1055,116 @@ class WalletTransaction(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     
     def __str__(self):
-        return f"{self.user.email} - {self.transaction_type} - {self.amount}"
\ No newline at end of file
+        return f"{self.user.email} - {self.transaction_type} - {self.amount}"
+
+class OutboxEvent(models.Model):
+    """A side effect recorded in the transaction that caused it and dispatched by a worker (see outbox.py)"""
+    EVENT_TYPE_CHOICES = [
+        ('notify_mentor', 'Notify Mentor'),
+        ('send_email', 'Send Email'),
+        ('schedule_reminder', 'Schedule Reminder'),
+    ]
+
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('dispatched', 'Dispatched'),
+        ('failed', 'Failed'),
+    ]
+
+    event_type = models.CharField(max_length=30, choices=EVENT_TYPE_CHOICES)
+    payload = models.JSONField(default=dict)
+    status = models.CharField(max_length=15, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    available_at = models.DateTimeField(default=timezone.now)  # pushed back after a failed attempt
+    last_error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    dispatched_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['status', 'available_at', 'id']),
+        ]
+
+    def __str__(self):
+        return f"{self.event_type} #{self.pk} ({self.status})"
+
+
+class LedgerAccount(models.Model):
+    """A balance in the double-entry wallet ledger (see ledger.py)"""
+    ACCOUNT_TYPE_CHOICES = [
+        ('user_wallet', 'User Wallet'),
+        ('mentor_wallet', 'Mentor Wallet'),
+        ('platform', 'Platform'),
+        ('external', 'External'),
+    ]
+
+    code = models.CharField(max_length=50, unique=True)  # e.g. "user:12", "mentor:3", "platform:revenue"
+    account_type = models.CharField(max_length=20, choices=ACCOUNT_TYPE_CHOICES)
+    # SET_NULL: deleting a user or mentor must not remove money movements from the books
+    user = models.OneToOneField(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='ledger_account')
+    mentor = models.OneToOneField(Mentor, on_delete=models.SET_NULL, null=True, blank=True, related_name='ledger_account')
+    # Running balance of wallet accounts, only ever changed with F(); system
+    # accounts leave it at zero and are read with ledger.account_balance()
+    balance = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.code} ({self.balance})"
+
+
+class LedgerEntry(models.Model):
+    """One leg of a ledger transaction; the legs of a transaction sum to zero. Never updated or deleted."""
+    ENTRY_TYPE_CHOICES = [
+        ('opening_balance', 'Opening Balance'),
+        ('session_payment', 'Session Payment'),
+        ('session_refund', 'Session Refund'),
+    ]
+
+    transaction_id = models.UUIDField(db_index=True)
+    account = models.ForeignKey(LedgerAccount, on_delete=models.PROTECT, related_name='entries')
+    entry_type = models.CharField(max_length=30, choices=ENTRY_TYPE_CHOICES)
+    amount = models.DecimalField(max_digits=12, decimal_places=2)  # positive credits the account
+    session = models.ForeignKey(
+        MentorSession, on_delete=models.SET_NULL, null=True, blank=True, related_name='ledger_entries'
+    )
+    description = models.CharField(max_length=255, blank=True, default='')
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['account', 'id']),
+            models.Index(fields=['account', 'created_at']),
+        ]
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError("Ledger entries are append-only")
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        raise ValueError("Ledger entries are append-only")
+
+    def __str__(self):
+        return f"{self.account.code} {self.amount} ({self.entry_type})"
+
+
+class LedgerSnapshot(models.Model):
+    """An account's balance as of one entry, so balance lookups only read the entries after it"""
+    account = models.ForeignKey(LedgerAccount, on_delete=models.CASCADE, related_name='snapshots')
+    last_entry_id = models.BigIntegerField()  # balance includes every entry up to this id
+    as_of = models.DateTimeField()  # created_at of that entry
+    balance = models.DecimalField(max_digits=12, decimal_places=2)
+    credits = models.DecimalField(max_digits=12, decimal_places=2, default=0)  # every credit up to that entry
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-last_entry_id']
+        unique_together = ('account', 'last_entry_id')
+        indexes = [
+            models.Index(fields=['account', 'as_of']),
+        ]
+
+    def __str__(self):
+        return f"{self.account.code} {self.balance} as of {self.as_of}"
@@ -0,0 +1,243 @@
+"""
+Transactional outbox for booking side effects.
+
+Request code calls record_events() inside the transaction that books or
+cancels a session, so an event exists if and only if the change committed.
+Nothing slow happens in the request: once the transaction commits, a
+dispatch_outbox task is queued. Workers lease pending events in batches
+(skipping rows another worker holds) and run them outside any transaction,
+then record the results in a second short one. WebSocket notifications
+for a batch go out together on one event loop, and emails and reminder
+scheduling run one by one. A failed event is retried with backoff and given
+up on after OUTBOX['MAX_ATTEMPTS']. Delivery is at least once.
+"""
+import asyncio
+import logging
+from datetime import datetime, timedelta
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.core.mail import send_mail
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import MentorSession, OutboxEvent
+
+logger = logging.getLogger(__name__)
+
+
+def record_events(*events):
+    """
+    Add (event_type, payload) pairs to the current transaction in one
+    insert, and queue a single dispatch for when it commits.
+    """
+    created = OutboxEvent.objects.bulk_create([
+        OutboxEvent(event_type=event_type, payload=payload) for event_type, payload in events
+    ])
+    transaction.on_commit(_queue_dispatch)
+    return created
+
+
+def _queue_dispatch():
+    from .tasks import dispatch_outbox
+    try:
+        dispatch_outbox.delay()
+    except Exception as e:
+        # The beat schedule sweeps the outbox too; the event is not lost
+        logger.warning(f"Could not queue outbox dispatch: {e}")
+
+
+def record_session_booked(session):
+    """Events for a newly confirmed booking"""
+    return record_events(
+        ('notify_mentor', {
+            'mentor_user_id': session.mentor.user_id,
+            'message': {
+                'event': 'session_booked',
+                'session_id': session.id,
+                'student_name': session.student.name,
+                'scheduled_date': str(session.scheduled_date),
+                'scheduled_time': str(session.scheduled_time),
+            },
+        }),
+        ('send_email', {
+            'subject': 'Your FocusBuddy session is confirmed',
+            'message': (
+                f"Hello {session.student.name}, your {session.duration_minutes} minute session with "
+                f"{session.mentor.user.name} on {session.scheduled_date} at "
+                f"{session.scheduled_time.strftime('%I:%M %p')} IST is confirmed."
+            ),
+            'recipient_list': [session.student.email],
+        }),
+        ('schedule_reminder', {'session_id': session.id}),
+    )
+
+
+def record_session_cancelled(session, reason):
+    """Events for a cancelled booking"""
+    return record_events(
+        ('notify_mentor', {
+            'mentor_user_id': session.mentor.user_id,
+            'message': {
+                'event': 'session_cancelled',
+                'session_id': session.id,
+                'student_name': session.student.name,
+                'scheduled_date': str(session.scheduled_date),
+                'scheduled_time': str(session.scheduled_time),
+                'reason': reason,
+            },
+        }),
+    )
+
+
+# ---------- Handlers ----------
+def notify_mentors(events):
+    """Send a batch of mentor notifications on one event loop; returns {event id: error}"""
+    channel_layer = get_channel_layer()
+
+    async def send_all():
+        return await asyncio.gather(*(
+            channel_layer.group_send(
+                f"mentor_notify_{event.payload['mentor_user_id']}",
+                {"type": "send_notification", "content": event.payload['message']},
+            )
+            for event in events
+        ), return_exceptions=True)
+
+    results = async_to_sync(send_all)()
+    return {
+        event.pk: result for event, result in zip(events, results) if isinstance(result, Exception)
+    }
+
+
+def send_email(event):
+    send_mail(
+        subject=event.payload['subject'],
+        message=event.payload['message'],
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        recipient_list=event.payload['recipient_list'],
+        fail_silently=False,
+    )
+
+
+def schedule_reminder(event):
+    from .tasks import schedule_session_reminder
+
+    session = MentorSession.objects.filter(
+        pk=event.payload['session_id'], status='confirmed', reminder_sent=False
+    ).values('scheduled_date', 'scheduled_time').first()
+    if session is None:
+        return
+    # Scheduled times are IST wall-clock; schedule_session_reminder localises them
+    scheduled = datetime.combine(session['scheduled_date'], session['scheduled_time'])
+    schedule_session_reminder(event.payload['session_id'], scheduled.isoformat())
+
+
+HANDLERS = {
+    'send_email': send_email,
+    'schedule_reminder': schedule_reminder,
+}
+
+
+# ---------- Dispatcher ----------
+def _claim(batch_size, now):
+    """
+    Lease a batch of due events in a short transaction: the rows are pushed
+    OUTBOX['LEASE'] seconds into the future, so other workers skip them while
+    this one runs their side effects without holding any lock. The attempt is
+    counted up front, so an event whose handler kills the worker still runs out
+    of attempts.
+    """
+    options = settings.OUTBOX
+    lease_until = now + timedelta(seconds=options['LEASE'])
+    with transaction.atomic():
+        due = OutboxEvent.objects.filter(status='pending', available_at__lte=now)
+        # Leases that ran out on their last attempt: the worker stopped mid-dispatch
+        due.filter(attempts__gte=options['MAX_ATTEMPTS']).update(
+            status='failed', last_error='Lease expired on the last attempt'
+        )
+        events = list(
+            due.select_for_update(skip_locked=True)
+            .filter(attempts__lt=options['MAX_ATTEMPTS'])
+            .order_by('id')[:batch_size]
+        )
+        if events:
+            OutboxEvent.objects.filter(pk__in=[event.pk for event in events]).update(
+                available_at=lease_until, attempts=F('attempts') + 1
+            )
+    for event in events:
+        event.available_at = lease_until
+        event.attempts += 1
+    return events, lease_until
+
+
+def _run(events):
+    """Run the side effects of claimed events; returns {event id: error}"""
+    errors = {}
+    notifications = [event for event in events if event.event_type == 'notify_mentor']
+    if notifications:
+        try:
+            errors.update(notify_mentors(notifications))
+        except Exception as e:
+            errors.update({event.pk: e for event in notifications})
+
+    for event in events:
+        handler = HANDLERS.get(event.event_type)
+        if handler is None:
+            continue
+        try:
+            handler(event)
+        except Exception as e:
+            errors[event.pk] = e
+    return errors
+
+
+def _mark_failed(event, error, now):
+    options = settings.OUTBOX
+    event.last_error = str(error)[:2000]
+    if event.attempts >= options['MAX_ATTEMPTS']:
+        event.status = 'failed'
+        logger.error(f"Giving up on outbox event {event.pk} ({event.event_type}): {error}")
+    else:
+        event.available_at = now + timedelta(seconds=options['RETRY_BACKOFF'] * 2 ** (event.attempts - 1))
+        logger.warning(f"Outbox event {event.pk} ({event.event_type}) failed, will retry: {error}")
+
+
+def dispatch_batch(batch_size=None):
+    """
+    Claim and dispatch one batch of due events.
+
+    Returns:
+        int: number of events claimed (dispatched or failed)
+    """
+    batch_size = batch_size or settings.OUTBOX['BATCH_SIZE']
+    events, lease_until = _claim(batch_size, timezone.now())
+    if not events:
+        return 0
+
+    errors = _run(events)
+
+    # Results are written only while this worker still holds the lease; once
+    # it has expired the events belong to whichever worker claimed them next
+    now = timezone.now()
+    with transaction.atomic():
+        OutboxEvent.objects.filter(
+            pk__in=[event.pk for event in events if event.pk not in errors],
+            available_at=lease_until,
+        ).update(status='dispatched', dispatched_at=now)
+        for event in events:
+            if event.pk in errors:
+                _mark_failed(event, errors[event.pk], now)
+                OutboxEvent.objects.filter(pk=event.pk, available_at=lease_until).update(
+                    status=event.status, available_at=event.available_at, last_error=event.last_error
+                )
+    return len(events)
+
+
+def purge_dispatched(now=None):
+    """Delete dispatched events older than OUTBOX['RETENTION_DAYS']"""
+    cutoff = (now or timezone.now()) - timedelta(days=settings.OUTBOX['RETENTION_DAYS'])
+    deleted, _ = OutboxEvent.objects.filter(status='dispatched', dispatched_at__lt=cutoff).delete()
+    return deleted
@@ -0,0 +1,245 @@
+"""
+Process-wide payment gateway client.
+
+get_gateway() returns one gateway per process. The Razorpay gateway shares a
+keep-alive connection pool across threads. Every call has connect and read
+timeouts, failures that cannot have reached Razorpay are retried with
+jittered backoff, and a circuit breaker fails fast while Razorpay is down,
+so a slow gateway cannot tie up every worker thread.
+
+Set PAYMENT_GATEWAY['BACKEND'] to 'fake' to use FakeGateway, which
+creates orders in memory and signs payments with the configured secret,
+for local development and tests.
+"""
+import hashlib
+import hmac
+import logging
+import random
+import threading
+import time
+import uuid
+
+import razorpay
+import requests
+from django.conf import settings
+from razorpay.errors import GatewayError, ServerError
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+
+logger = logging.getLogger(__name__)
+
+
+class PaymentGatewayError(Exception):
+    """The gateway rejected or failed a request"""
+
+
+class GatewayUnavailable(PaymentGatewayError):
+    """The circuit breaker is open; the gateway was not called"""
+
+
+class PaymentVerificationError(PaymentGatewayError):
+    """A payment signature did not match"""
+
+
+def payment_signature(order_id, payment_id, secret):
+    """Razorpay's checkout signature: HMAC-SHA256 of "order_id|payment_id" """
+    message = f"{order_id}|{payment_id}"
+    return hmac.new(secret.encode(), message.encode(), hashlib.sha256).hexdigest()
+
+
+def never_sent(error):
+    """Whether a failed call is known not to have reached Razorpay: the connection was never made"""
+    if isinstance(error, requests.ConnectTimeout):
+        return True
+    if isinstance(error, requests.ConnectionError) and error.args:
+        return isinstance(getattr(error.args[0], 'reason', None), NewConnectionError)
+    return False
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker.
+
+    After `threshold` failures in a row the circuit opens and calls fail
+    immediately. After `reset_timeout` seconds one trial call is let through;
+    its success closes the circuit, its failure opens it again.
+    """
+
+    def __init__(self, threshold, reset_timeout):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if self._trial_running or time.monotonic() - self._opened_at < self.reset_timeout:
+                return False
+            self._trial_running = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_running = False
+            if self._opened_at is not None or self._failures >= self.threshold:
+                self._opened_at = time.monotonic()
+
+    @property
+    def is_open(self):
+        return self._opened_at is not None
+
+
+class TimeoutSession(requests.Session):
+    """requests session that applies a default timeout to every request"""
+
+    def __init__(self, timeout):
+        super().__init__()
+        self.timeout = timeout
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault('timeout', self.timeout)
+        return super().request(method, url, **kwargs)
+
+
+class RazorpayGateway:
+    """Razorpay behind a shared connection pool, timeouts, retries and a circuit breaker"""
+
+    # Failures that count against the circuit breaker. Only those that happened
+    # before the request was sent are retried (see never_sent()): a 5xx, a read
+    # timeout or a dropped connection may follow an order Razorpay did create,
+    # and creating it again would leave the student with two orders.
+    TRANSIENT = (requests.ConnectionError, requests.Timeout, ServerError, GatewayError)
+
+    def __init__(self, key_id, key_secret, options):
+        self.key_id = key_id
+        self.key_secret = key_secret
+        self.timeout = (options['CONNECT_TIMEOUT'], options['READ_TIMEOUT'])
+        self.max_retries = options['MAX_RETRIES']
+        self.backoff = options['BACKOFF']
+        self.backoff_max = options['BACKOFF_MAX']
+        self.breaker = CircuitBreaker(options['BREAKER_THRESHOLD'], options['BREAKER_RESET'])
+
+        # One pool for the process; each thread gets its own session and client on top of it
+        self.adapter = HTTPAdapter(pool_connections=1, pool_maxsize=options['POOL_SIZE'])
+        self._local = threading.local()
+
+    @property
+    def client(self):
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            session = TimeoutSession(self.timeout)
+            session.mount('https://', self.adapter)
+            client = razorpay.Client(session=session, auth=(self.key_id, self.key_secret))
+            self._local.client = client
+        return client
+
+    def _sleep_before_retry(self, attempt):
+        # Full jitter keeps retries from many workers from arriving together
+        time.sleep(random.uniform(0, min(self.backoff_max, self.backoff * 2 ** attempt)))
+
+    def call(self, operation, *args, **kwargs):
+        """Run a Razorpay client call through the circuit breaker with retries"""
+        if not self.breaker.allow():
+            raise GatewayUnavailable("Payment gateway is temporarily unavailable")
+
+        for attempt in range(self.max_retries + 1):
+            try:
+                result = operation(*args, **kwargs)
+            except self.TRANSIENT as e:
+                if attempt < self.max_retries and never_sent(e):
+                    logger.warning(f"Payment gateway call failed (attempt {attempt + 1}), retrying: {e}")
+                    self._sleep_before_retry(attempt)
+                    continue
+                self.breaker.record_failure()
+                raise PaymentGatewayError(str(e)) from e
+            except Exception:
+                # The gateway answered (e.g. a bad request); it is healthy
+                self.breaker.record_success()
+                raise
+            self.breaker.record_success()
+            return result
+
+    def create_order(self, order_data):
+        return self.call(lambda: self.client.order.create(order_data))
+
+    def verify_payment_signature(self, order_id, payment_id, signature):
+        """Checked locally; no request is made"""
+        expected = payment_signature(order_id, payment_id, self.key_secret)
+        if not hmac.compare_digest(expected, str(signature)):
+            raise PaymentVerificationError("Razorpay Signature Verification Failed")
+        return True
+
+
+class FakeGateway:
+    """In-memory stand-in for Razorpay with the same interface"""
+
+    def __init__(self, key_id, key_secret):
+        self.key_id = key_id
+        self.key_secret = key_secret
+        self.orders = {}
+        self._lock = threading.Lock()
+
+    def create_order(self, order_data):
+        order = {
+            'id': f"order_fake_{uuid.uuid4().hex[:14]}",
+            'entity': 'order',
+            'amount': order_data['amount'],
+            'currency': order_data.get('currency', 'INR'),
+            'receipt': order_data.get('receipt'),
+            'notes': order_data.get('notes', {}),
+            'status': 'created',
+            'created_at': int(time.time()),
+        }
+        with self._lock:
+            self.orders[order['id']] = order
+        return order
+
+    def pay(self, order_id):
+        """Simulate a completed checkout: returns (payment_id, signature)"""
+        payment_id = f"pay_fake_{uuid.uuid4().hex[:14]}"
+        with self._lock:
+            if order_id in self.orders:
+                self.orders[order_id]['status'] = 'paid'
+        return payment_id, payment_signature(order_id, payment_id, self.key_secret)
+
+    def verify_payment_signature(self, order_id, payment_id, signature):
+        expected = payment_signature(order_id, payment_id, self.key_secret)
+        if not hmac.compare_digest(expected, str(signature)):
+            raise PaymentVerificationError("Razorpay Signature Verification Failed")
+        return True
+
+
+_gateway = None
+_gateway_lock = threading.Lock()
+
+
+def get_gateway():
+    """The process-wide gateway for PAYMENT_GATEWAY['BACKEND']"""
+    global _gateway
+    if _gateway is None:
+        with _gateway_lock:
+            if _gateway is None:
+                options = settings.PAYMENT_GATEWAY
+                if options['BACKEND'] == 'fake':
+                    _gateway = FakeGateway(settings.RAZORPAY_KEY_ID, settings.RAZORPAY_KEY_SECRET)
+                else:
+                    _gateway = RazorpayGateway(settings.RAZORPAY_KEY_ID, settings.RAZORPAY_KEY_SECRET, options)
+    return _gateway
+
+
+def reset_gateway():
+    """Drop the process-wide gateway, e.g. after changing settings in tests"""
+    global _gateway
+    with _gateway_lock:
+        _gateway = None
@@ -0,0 +1,124 @@
+"""
+Redis-backed presence registry for WebRTC rooms.
+
+Each room is a sorted set keyed by session id whose members are user ids,
+scored by the unix time at which their presence lapses. Consumers refresh
+that score on a heartbeat, so entries left behind by a crashed worker age
+out on their own and every signalling worker sees the same room state.
+"""
+import logging
+import time
+
+import redis
+import redis.asyncio as aioredis
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+def _room_key(session_id):
+    return f"presence:room:{session_id}"
+
+
+class PresenceRegistry:
+    """Shared 'who is in this room' state for WebRTCConsumer and REST views"""
+
+    _client = None
+    _async_client = None
+
+    @classmethod
+    def ttl(cls):
+        return settings.PRESENCE_CONFIG['TTL']
+
+    @classmethod
+    def get_client(cls):
+        """Synchronous client, used by REST views"""
+        if cls._client is None:
+            cls._client = redis.Redis.from_url(
+                settings.PRESENCE_CONFIG['REDIS_URL'], decode_responses=True
+            )
+        return cls._client
+
+    @classmethod
+    def get_async_client(cls):
+        """asyncio client, used by consumers"""
+        if cls._async_client is None:
+            cls._async_client = aioredis.Redis.from_url(
+                settings.PRESENCE_CONFIG['REDIS_URL'], decode_responses=True
+            )
+        return cls._async_client
+
+    # ---------- Consumer API (async) ----------
+    @classmethod
+    async def join(cls, session_id, user_id):
+        """
+        Atomically add a user to a room.
+
+        Returns:
+            list: ids of the other users already present
+        """
+        key = _room_key(session_id)
+        now = time.time()
+        ttl = cls.ttl()
+        async with cls.get_async_client().pipeline(transaction=True) as pipe:
+            pipe.zremrangebyscore(key, '-inf', now)
+            pipe.zrange(key, 0, -1)
+            pipe.zadd(key, {user_id: now + ttl})
+            pipe.expire(key, ttl)
+            _, members, _, _ = await pipe.execute()
+        return [int(member) for member in members if int(member) != user_id]
+
+    @classmethod
+    async def heartbeat(cls, session_id, user_id):
+        """Extend a user's presence; no-op if they already left"""
+        key = _room_key(session_id)
+        ttl = cls.ttl()
+        async with cls.get_async_client().pipeline(transaction=True) as pipe:
+            pipe.zadd(key, {user_id: time.time() + ttl}, xx=True)
+            pipe.expire(key, ttl)
+            await pipe.execute()
+
+    @classmethod
+    async def leave(cls, session_id, user_id):
+        """Remove a user from a room"""
+        await cls.get_async_client().zrem(_room_key(session_id), user_id)
+
+    # ---------- REST API (sync) ----------
+    @classmethod
+    def members(cls, session_id):
+        """Ids of users currently present in a room"""
+        members = cls.get_client().zrangebyscore(
+            _room_key(session_id), time.time(), '+inf'
+        )
+        return [int(member) for member in members]
+
+    @classmethod
+    def count(cls, session_id):
+        """Number of users currently present in a room"""
+        return cls.get_client().zcount(_room_key(session_id), time.time(), '+inf')
+
+    @classmethod
+    def counts(cls, session_ids):
+        """
+        Presence counts for many rooms in one round trip.
+
+        Returns:
+            dict: {session_id: count}
+        """
+        session_ids = list(session_ids)
+        if not session_ids:
+            return {}
+        now = time.time()
+        pipe = cls.get_client().pipeline(transaction=False)
+        for session_id in session_ids:
+            pipe.zcount(_room_key(session_id), now, '+inf')
+        return dict(zip(session_ids, pipe.execute()))
+
+    @classmethod
+    def safe_counts(cls, session_ids):
+        """counts(), but an unreachable Redis yields an empty dict instead of an error"""
+        try:
+            return cls.counts(session_ids)
+        except redis.RedisError as e:
+            logger.warning(f"Presence registry unavailable: {e}")
+            return {}
@@ -1,11 +1,15 @@
 from rest_framework import serializers
 from .models import *
+from .availability import is_available_at
+from .slot_holds import held_by_other, release_hold
+from .payments import get_gateway
+from .outbox import record_session_booked
+from .ledger import record_session_payment
 from django.contrib.auth import authenticate
 from rest_framework_simplejwt.tokens import RefreshToken
 import random
 from django.utils import timezone
 import logging
-import razorpay
 from django.conf import settings
 from django.db import transaction
 from datetime import timedelta
@@ -364,6 +368,7 @@ class MentorSerializer(serializers.ModelSerializer):
     # Convert decimal fields to float for frontend
     hourly_rate = serializers.SerializerMethodField()
     rating = serializers.SerializerMethodField()
+    total_sessions = serializers.SerializerMethodField()
 
     class Meta:
         model = Mentor
@@ -381,6 +386,8 @@ class MentorSerializer(serializers.ModelSerializer):
             'total_sessions',
             'total_students',
             'is_available',
+            'next_available_at',
+            'upcoming_slots',
             'profile_image_url',
             'created_at',
             'updated_at'
@@ -397,6 +404,12 @@ class MentorSerializer(serializers.ModelSerializer):
     def get_rating(self, obj):
         return float(obj.rating)
 
+    def get_total_sessions(self, obj):
+        # List views annotate session_count; fall back to a per-mentor COUNT otherwise
+        if hasattr(obj, 'session_count'):
+            return obj.session_count
+        return obj.total_sessions
+
 class SessionPaymentSerializer(serializers.ModelSerializer):
     class Meta:
         model = SessionPayment
@@ -503,43 +516,11 @@ class CreateOrderSerializer(serializers.Serializer):
         scheduled_date = data['scheduled_date']
         scheduled_time = data['scheduled_time']
         
-        # Check if mentor is available on the selected day and time
-        day_name = scheduled_date.strftime('%A').lower()
-        mentor_availability = mentor.availability.get(day_name, [])
-        
-        # Debug: Show the actual date and calculated day
-        print(f"Debug - Scheduled date: {scheduled_date}")
-        print(f"Debug - Scheduled date type: {type(scheduled_date)}")
-        print(f"Debug - Calculated day name: {day_name}")
-        print(f"Debug - Date weekday number: {scheduled_date.weekday()}")  # Monday=0, Sunday=6
-        
-        # Convert scheduled time to 12-hour format to match availability storage
-        scheduled_time_12hr = scheduled_time.strftime('%I:%M %p').lstrip('0')
-        # Remove leading zero from hour (e.g., "08:00 PM" becomes "8:00 PM")
-        
-        # Also try alternative formats
-        time_formats_to_check = [
-            scheduled_time_12hr,                    # "8:00 PM"
-            scheduled_time.strftime('%I:%M %p'),    # "08:00 PM" (with leading zero)
-            scheduled_time.strftime('%H:%M'),       # "20:00" (24-hour format)
-            scheduled_time.strftime('%H:%M:%S'),    # "20:00:00"
-        ]
-        
-        # Debug logging (remove after fixing)
-        print(f"Debug - Mentor availability for {day_name}: {mentor_availability}")
-        print(f"Debug - All mentor availability: {mentor.availability}")
-        print(f"Debug - Scheduled time formats to check: {time_formats_to_check}")
-        
-        # Check if the time slot is available
-        time_available = False
-        if mentor_availability:
-            for time_format in time_formats_to_check:
-                if time_format in mentor_availability:
-                    time_available = True
-                    print(f"Debug - Match found: {time_format}")
-                    break
-        
-        if not time_available:
+        # Check if mentor is available on the selected day and time (indexed slot lookup)
+        if not is_available_at(mentor.id, scheduled_date, scheduled_time):
+            day_name = scheduled_date.strftime('%A').lower()
+            scheduled_time_12hr = scheduled_time.strftime('%I:%M %p').lstrip('0')
+            mentor_availability = mentor.availability.get(day_name, [])
             available_times = ", ".join(mentor_availability) if mentor_availability else "None"
             raise serializers.ValidationError(
                 f"Mentor is not available on {day_name} at {scheduled_time_12hr}. "
@@ -578,15 +559,13 @@ class ConfirmBookingSerializer(serializers.Serializer):
     )
     
     def validate(self, data):
-        # Verify payment signature
-        client = razorpay.Client(auth=(settings.RAZORPAY_KEY_ID, settings.RAZORPAY_KEY_SECRET))
-        
+        # Verify payment signature (a local HMAC check, no gateway request)
         try:
-            client.utility.verify_payment_signature({
-                'razorpay_order_id': data['razorpay_order_id'],
-                'razorpay_payment_id': data['razorpay_payment_id'],
-                'razorpay_signature': data['razorpay_signature']
-            })
+            get_gateway().verify_payment_signature(
+                data['razorpay_order_id'],
+                data['razorpay_payment_id'],
+                data['razorpay_signature']
+            )
         except Exception as e:
             raise serializers.ValidationError(f"Payment verification failed: {str(e)}")
         
@@ -612,6 +591,12 @@ class ConfirmBookingSerializer(serializers.Serializer):
                 "This time slot was booked by someone else. Refund will be initiated."
             )
         
+        # Only reachable if this student's hold expired mid-payment and another student took the slot
+        if held_by_other(mentor.id, scheduled_date, scheduled_time, self.context['request'].user.id):
+            raise serializers.ValidationError(
+                "This time slot was reserved by someone else while payment was pending. Refund will be initiated."
+            )
+        
         return data
     
     def create(self, validated_data):
@@ -686,6 +671,15 @@ class ConfirmBookingSerializer(serializers.Serializer):
                 platform_commission=base_amount * Decimal('0.10'),
                 mentor_earning=mentor_earning
             )
+            
+            # Credit the mentor's wallet in the ledger
+            record_session_payment(session, payment, mentor_earning, base_amount * Decimal('0.10'))
+            
+            # Notification, confirmation email and reminder are sent by the outbox worker
+            record_session_booked(session)
+        
+        # The session row blocks the slot from here on
+        release_hold(mentor.id, session.scheduled_date, session.scheduled_time, user.id)
         
         # Store payment reference for API view access
         session._payment = payment
@@ -761,20 +755,25 @@ class ParticipantSerializer(serializers.ModelSerializer):
 class FocusBuddySessionListSerializer(serializers.ModelSerializer):
     """Serializer for listing active sessions that users can join"""
     creator_name = serializers.CharField(source='creator_id.name', read_only=True)
-    participant_count = serializers.IntegerField(source='annotated_participant_count', read_only=True)
+    participant_count = serializers.IntegerField(read_only=True)
     remaining_time_seconds = serializers.IntegerField(read_only=True)
     can_join = serializers.BooleanField(read_only=True)
     is_full = serializers.BooleanField(read_only=True)
+    online_count = serializers.SerializerMethodField()
     
     class Meta:
         model = FocusBuddySession
         fields = [
             'id', 'creator_name', 'title', 'session_type', 'status',
             'duration_minutes', 'max_participants', 'participant_count',
-            'started_at', 'ends_at', 'remaining_time_seconds', 
+            'online_count', 'started_at', 'ends_at', 'remaining_time_seconds', 
             'can_join', 'is_full', 'created_at'
         ]
 
+    def get_online_count(self, obj):
+        """Users connected to the call right now, from the presence registry"""
+        return self.context.get('online_counts', {}).get(obj.id, 0)
+
 
 class FocusBuddySessionDetailSerializer(serializers.ModelSerializer):
     """Detailed serializer for individual session with participants"""
@@ -926,6 +925,7 @@ class SessionStatsSerializer(serializers.Serializer):
     """Serializer for session statistics"""
     total_active_sessions = serializers.IntegerField()
     total_participants_online = serializers.IntegerField()
+    total_users_connected = serializers.IntegerField()
     sessions_by_duration = serializers.DictField()
     sessions_by_type = serializers.DictField()
 
@@ -992,6 +992,7 @@ class UserStatsSerializer(serializers.Serializer):
     focus_buddy_sessions = serializers.IntegerField()
     journals_created = serializers.IntegerField()
     daily_streak = serializers.IntegerField()
+    longest_streak = serializers.IntegerField()
     total_tasks = serializers.IntegerField()
     completed_tasks = serializers.IntegerField()
     mentor_sessions = serializers.IntegerField(required=False)
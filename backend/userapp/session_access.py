@@ -0,0 +1,78 @@
+"""
+Admission decisions for WebRTC connections.
+
+resolve_session_access() answers "may this user join this call room?" with
+one query per session type and caches the verdict in Redis, so reconnect
+storms are served without touching Postgres. Views that change a
+participant's admission status must call invalidate_session_access().
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import OuterRef, Subquery
+
+from .models import FocusBuddyParticipant, FocusBuddySession, MentorSession
+
+# Verdicts that only change through an explicit, invalidating action
+STABLE_VERDICTS = ('host', 'approved', 'allowed', 'forbidden')
+
+
+def _cache_key(session_id, user_id):
+    return f"ws_access:{session_id}:{user_id}"
+
+
+def _resolve(session_id, user_id):
+    focus_session = FocusBuddySession.objects.filter(id=session_id).annotate(
+        participant_status=Subquery(
+            FocusBuddyParticipant.objects.filter(
+                session_id=OuterRef('pk'), user_id=user_id
+            ).values('status')[:1]
+        )
+    ).values('creator_id', 'participant_status').first()
+
+    if focus_session:
+        if focus_session['creator_id'] == user_id:
+            return 'focusbuddy', 'host'
+        return 'focusbuddy', focus_session['participant_status'] or 'not-registered'
+
+    mentor_session = MentorSession.objects.filter(id=session_id).values(
+        'student_id', 'mentor__user_id'
+    ).first()
+
+    if mentor_session:
+        allowed = user_id in (mentor_session['student_id'], mentor_session['mentor__user_id'])
+        return 'mentor', 'allowed' if allowed else 'forbidden'
+
+    return None, 'missing'
+
+
+def resolve_session_access(session_id, user_id):
+    """
+    Decide whether a user may connect to a session's call room.
+
+    Returns:
+        tuple: (session_type, verdict) where session_type is 'focusbuddy',
+        'mentor' or None, and verdict is one of 'host', 'approved', 'pending',
+        'rejected', 'not-registered' (focus buddy), 'allowed', 'forbidden'
+        (mentor) or 'missing'
+    """
+    try:
+        session_id = int(session_id)
+    except (TypeError, ValueError):
+        return None, 'missing'
+
+    key = _cache_key(session_id, user_id)
+    cached = cache.get(key)
+    if cached is not None:
+        return tuple(cached)
+
+    session_type, verdict = _resolve(session_id, user_id)
+    # Unknown ids are not cached: the id may belong to a session created a moment later
+    if session_type is not None:
+        ttl_key = 'ACCESS_CACHE_TTL' if verdict in STABLE_VERDICTS else 'ACCESS_CACHE_SHORT_TTL'
+        cache.set(key, (session_type, verdict), settings.WEBRTC_CONFIG[ttl_key])
+    return session_type, verdict
+
+
+def invalidate_session_access(session_id, user_id):
+    """Forget a cached verdict after the participant's admission status changes"""
+    cache.delete(_cache_key(session_id, user_id))
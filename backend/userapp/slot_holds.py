@@ -0,0 +1,106 @@
+"""
+Short-lived holds on mentor session slots.
+
+A student who starts checkout for (mentor, date, time) takes a hold on that
+slot with cache.add(), which is an atomic SET NX with a TTL on Redis. While
+the hold lives, nobody else can create a payment order for the slot. It is
+released once the booking is confirmed and the session row itself blocks the
+slot, or it simply expires if the student abandons payment.
+
+The slot key names its holder and is only ever written with cache.add(), so a
+hold is never overwritten: a hold read as ours stays ours until it expires or
+we delete it. Everything else about the hold (the payment order) lives under
+a key of the holder's own, so no write can land on another student's hold.
+"""
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+# A hold this close to expiry is left to expire rather than deleted, since
+# another student may take the slot between our read and our delete
+RELEASE_MARGIN = 5
+
+
+def _hold_key(mentor_id, scheduled_date, scheduled_time):
+    return f"slot_hold:{mentor_id}:{scheduled_date.isoformat()}:{scheduled_time.strftime('%H:%M')}"
+
+
+def _order_key(hold_key, student_id):
+    return f"{hold_key}:order:{student_id}"
+
+
+def _remaining(hold):
+    return (datetime.fromisoformat(hold['expires_at']) - timezone.now()).total_seconds()
+
+
+def _fresh(key, hold):
+    # Forget any order left over from the student's earlier, lapsed hold
+    cache.delete(_order_key(key, hold['student_id']))
+    return {**hold, 'order_id': None}
+
+
+def get_hold(mentor_id, scheduled_date, scheduled_time):
+    """The current hold on a slot: dict with student_id, order_id and expires_at, or None"""
+    key = _hold_key(mentor_id, scheduled_date, scheduled_time)
+    hold = cache.get(key)
+    if hold is None:
+        return None
+    return {**hold, 'order_id': cache.get(_order_key(key, hold['student_id']))}
+
+
+def acquire_hold(mentor_id, scheduled_date, scheduled_time, student_id):
+    """
+    Hold a slot for a student. A student who already holds the slot (for
+    example after closing the checkout and trying again) keeps their hold
+    and its expiry; once it lapses they can take a fresh one.
+
+    Returns:
+        tuple: (acquired, hold); hold is the competing hold when not acquired
+    """
+    ttl = settings.SLOT_HOLDS['TTL']
+    key = _hold_key(mentor_id, scheduled_date, scheduled_time)
+    hold = {
+        'student_id': student_id,
+        'expires_at': (timezone.now() + timedelta(seconds=ttl)).isoformat(),
+    }
+    if cache.add(key, hold, ttl):
+        return True, _fresh(key, hold)
+    current = get_hold(mentor_id, scheduled_date, scheduled_time)
+    if current is None:
+        # Expired between the two calls; the next add decides who gets it
+        if cache.add(key, hold, ttl):
+            return True, _fresh(key, hold)
+        current = get_hold(mentor_id, scheduled_date, scheduled_time)
+        if current is None:
+            return False, hold
+    return current['student_id'] == student_id, current
+
+
+def attach_order(mentor_id, scheduled_date, scheduled_time, student_id, order_id):
+    """Record the payment order created under a student's hold, keeping its expiry"""
+    key = _hold_key(mentor_id, scheduled_date, scheduled_time)
+    hold = cache.get(key)
+    if hold is None or hold['student_id'] != student_id:
+        return
+    remaining = _remaining(hold)
+    if remaining > 0:
+        cache.set(_order_key(key, student_id), order_id, int(remaining) + 1)
+
+
+def release_hold(mentor_id, scheduled_date, scheduled_time, student_id):
+    """Drop a student's hold; holds taken since by someone else are left alone"""
+    key = _hold_key(mentor_id, scheduled_date, scheduled_time)
+    hold = cache.get(key)
+    if hold is None or hold['student_id'] != student_id:
+        return
+    cache.delete(_order_key(key, student_id))
+    if _remaining(hold) > RELEASE_MARGIN:
+        cache.delete(key)
+
+
+def held_by_other(mentor_id, scheduled_date, scheduled_time, student_id):
+    """Whether someone other than `student_id` currently holds the slot"""
+    hold = cache.get(_hold_key(mentor_id, scheduled_date, scheduled_time))
+    return hold is not None and hold['student_id'] != student_id
@@ -4,7 +4,10 @@ from django.core.mail import send_mail
 from django.utils import timezone
 from datetime import datetime, timedelta
 import pytz
-from .models import MentorSession
+from django.db import transaction
+from .models import MentorSession, FocusBuddySession
+
+EXPIRY_BATCH_SIZE = 500
 
 @shared_task
 def send_session_reminders():
@@ -97,24 +100,29 @@ def schedule_session_reminder(session_id, scheduled_time_ist_str):
         eta=reminder_time_utc
     )
 
-@shared_task
-def send_individual_reminder(session_id):
+@shared_task(bind=True, max_retries=3, default_retry_delay=60)
+def send_individual_reminder(self, session_id):
     """
     Send reminder for a specific session
+    A failed send is retried; reminder_sent stays False until one succeeds
     """
     try:
-        session = YourSessionModel.objects.get(id=session_id)
-        ist = pytz.timezone('Asia/Kolkata')
-        
-        # Convert session time to IST for display
-        session_time_ist = session.scheduled_time.astimezone(ist)
-        
+        session = MentorSession.objects.select_related('student', 'mentor__user').get(id=session_id)
+    except MentorSession.DoesNotExist:
+        return f"Session {session_id} not found"
+    if session.status != 'confirmed' or session.reminder_sent:
+        return f"Session {session_id} needs no reminder"
+    
+    # Scheduled date and time are already IST wall-clock values
+    session_time_ist = datetime.combine(session.scheduled_date, session.scheduled_time)
+    
+    try:
         send_mail(
             subject=f'Session Starting Soon - 15 minutes reminder',
             message=f'''
-            Hi {session.user.first_name},
+            Hi {session.student.name},
             
-            Your session is starting in 15 minutes!
+            Your session with {session.mentor.user.name} is starting in 15 minutes!
             
             Session Time: {session_time_ist.strftime('%I:%M %p IST on %B %d, %Y')}
             
@@ -124,12 +132,82 @@ def send_individual_reminder(session_id):
             Focus Buddy Team
             ''',
             from_email='noreply@focusbuddy.com',
-            recipient_list=[session.user.email],
+            recipient_list=[session.student.email, session.mentor.user.email],
         )
-        
-        return f"Reminder sent for session {session_id}"
-        
-    except YourSessionModel.DoesNotExist:
-        return f"Session {session_id} not found"
     except Exception as e:
-        return f"Error sending reminder: {e}"
\ No newline at end of file
+        raise self.retry(exc=e)
+    
+    MentorSession.objects.filter(pk=session.pk).update(
+        reminder_sent=True, reminder_sent_at=timezone.now()
+    )
+    return f"Reminder sent for session {session_id}"
+
+
+@shared_task
+def expire_focus_sessions():
+    """
+    End every active focus buddy session whose ends_at has passed.
+    Runs on the beat schedule so read endpoints never have to write.
+    """
+    total = 0
+    while True:
+        now = timezone.now()
+        with transaction.atomic():
+            # Lock a batch of due sessions; skip rows another worker is already ending
+            session_ids = list(
+                FocusBuddySession.objects.select_for_update(skip_locked=True)
+                .filter(status='active', ends_at__lte=now)
+                .values_list('id', flat=True)[:EXPIRY_BATCH_SIZE]
+            )
+            if not session_ids:
+                break
+
+            ended = FocusBuddySession.end_sessions(
+                session_ids, reason='expired', message="Session time is up"
+            )
+
+        total += len(ended)
+        if len(session_ids) < EXPIRY_BATCH_SIZE:
+            break
+
+    return f"Expired {total} focus sessions"
+
+
+@shared_task
+def refresh_mentor_availability():
+    """
+    Roll next_available_at forward for mentors whose soonest slot has passed.
+    Bookings and availability edits refresh their mentor immediately.
+    """
+    from .availability import refresh_due_mentors
+    return f"Refreshed availability for {refresh_due_mentors()} mentors"
+
+
+@shared_task
+def dispatch_outbox():
+    """
+    Dispatch pending booking side effects (see outbox.py) until none are due.
+    Queued after each commit that records events, and on the beat schedule.
+    """
+    from .outbox import dispatch_batch
+    total = 0
+    while True:
+        claimed = dispatch_batch()
+        total += claimed
+        if not claimed:
+            break
+    return f"Dispatched {total} outbox events"
+
+
+@shared_task
+def purge_outbox_events():
+    """Delete dispatched outbox events past their retention period"""
+    from .outbox import purge_dispatched
+    return f"Purged {purge_dispatched()} outbox events"
+
+
+@shared_task
+def snapshot_ledger_balances():
+    """Snapshot ledger account balances so balance lookups only read recent entries"""
+    from .ledger import snapshot_balances
+    return f"Took {snapshot_balances()} ledger snapshots"
@@ -1,3 +1,699 @@
-from django.test import TestCase
+from datetime import date, time, timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+import requests
+from django.conf import settings
+from django.core import mail
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.db.models import Sum
+from django.utils import timezone
+from razorpay.errors import BadRequestError, ServerError
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+from urllib3.exceptions import MaxRetryError, NewConnectionError
+
+from . import auth_cache, ledger, outbox, payments, slot_holds
+from .availability import WEEKDAYS, free_at, is_available_at
+from .models import (
+    FocusBuddyParticipant, FocusBuddySession, LedgerEntry, Mentor, MentorSession, OutboxEvent, SessionPayment,
+    User,
+)
+from .payments import (
+    FakeGateway, GatewayUnavailable, PaymentGatewayError, PaymentVerificationError, RazorpayGateway,
+)
+from .tasks import send_individual_reminder
+
+
+class FocusSessionTestCase(TestCase):
+    """A focus session whose creator already holds the first seat"""
+
+    def setUp(self):
+        self.creator = User.objects.create_user('host@example.com', 'Host', 'pass12345')
+        self.user = User.objects.create_user('guest@example.com', 'Guest', 'pass12345')
+        self.session = FocusBuddySession.objects.create(
+            creator_id=self.creator,
+            ends_at=timezone.now() + timedelta(minutes=25),
+            max_participants=3,
+            reserved_seats=1,
+            participant_count=1,
+        )
+        FocusBuddyParticipant.objects.create(session=self.session, user=self.creator, status='approved')
+        self.client = APIClient()
+
+    def as_user(self, user):
+        self.client.force_authenticate(user)
+        return self.client
+
+    def join(self, user=None):
+        return self.as_user(user or self.user).post(f'/api/user/focus-sessions/{self.session.id}/join/', {}, format='json')
+
+    def leave(self, user=None):
+        return self.as_user(user or self.user).post(f'/api/user/focus-sessions/{self.session.id}/leave/', {}, format='json')
+
+    def participant(self, user=None):
+        return FocusBuddyParticipant.objects.get(session=self.session, user=user or self.user)
+
+    def assertSeats(self, reserved, approved):
+        self.session.refresh_from_db()
+        self.assertEqual(self.session.reserved_seats, reserved)
+        self.assertEqual(self.session.participant_count, approved)
+
+
+class SeatReservationTests(FocusSessionTestCase):
+
+    def test_join_reserves_one_seat(self):
+        self.assertEqual(self.join().status_code, 202)
+        self.assertEqual(self.join().status_code, 202)
+        self.assertSeats(2, 1)
+
+    def test_full_session_rejects_join(self):
+        FocusBuddySession.objects.filter(pk=self.session.pk).update(max_participants=1)
+        response = self.join()
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['error'], 'Session is full')
+        self.assertFalse(FocusBuddyParticipant.objects.filter(session=self.session, user=self.user).exists())
+        self.assertSeats(1, 1)
+
+    def test_waiting_session_is_joinable(self):
+        FocusBuddySession.objects.filter(pk=self.session.pk).update(status='waiting')
+        self.assertEqual(self.join().status_code, 202)
+        self.assertSeats(2, 1)
+
+    def test_leave_releases_seat_once(self):
+        self.join()
+        stale = self.participant()
+        self.assertEqual(self.leave().status_code, 200)
+        # A second leave, or one from an instance loaded before the first, releases nothing
+        self.assertFalse(stale.leave_session())
+        self.assertEqual(self.leave().status_code, 400)
+        self.assertSeats(1, 1)
+
+    def test_approved_leave_releases_seat_and_count(self):
+        self.join()
+        self.as_user(self.creator).post(
+            f'/api/user/focus-sessions/{self.session.id}/participants/{self.participant().id}/approve/'
+        )
+        self.assertSeats(2, 2)
+        self.leave()
+        self.assertSeats(1, 1)
+
+    def test_rejoin_reserves_one_seat(self):
+        self.join()
+        self.leave()
+        self.assertSeats(1, 1)
+        self.assertEqual(self.join().data['message'], 'Join request is now pending approval')
+        # A second rejoin finds the row already claimed and reserves nothing
+        self.assertEqual(self.join().data['message'], 'Join request is still pending approval')
+        participant = self.participant()
+        self.assertIsNone(participant.left_at)
+        self.assertEqual(participant.status, 'pending')
+        self.assertSeats(2, 1)
+
+    def test_rejoin_into_full_session_keeps_participant_out(self):
+        self.join()
+        self.leave()
+        FocusBuddySession.objects.filter(pk=self.session.pk).update(max_participants=1)
+        response = self.join()
+        self.assertEqual(response.data['error'], 'Session is full')
+        self.assertIsNotNone(self.participant().left_at)
+        self.assertSeats(1, 1)
+
+
+class ApproveParticipantTests(FocusSessionTestCase):
+
+    def approve(self):
+        return self.as_user(self.creator).post(
+            f'/api/user/focus-sessions/{self.session.id}/participants/{self.participant().id}/approve/'
+        )
+
+    def reject(self):
+        return self.as_user(self.creator).post(
+            f'/api/user/focus-sessions/{self.session.id}/participants/{self.participant().id}/reject/'
+        )
+
+    def test_approve_counts_participant_once(self):
+        self.join()
+        self.assertEqual(self.approve().status_code, 200)
+        self.assertEqual(self.approve().status_code, 400)
+        self.assertSeats(2, 2)
+
+    def test_approve_after_leave_is_refused(self):
+        self.join()
+        self.leave()
+        self.assertEqual(self.approve().status_code, 400)
+        self.assertEqual(self.participant().status, 'pending')
+        self.assertSeats(1, 1)
+
+    def test_reject_after_leave_does_not_release_again(self):
+        self.join()
+        self.leave()
+        self.assertEqual(self.reject().status_code, 400)
+        self.assertSeats(1, 1)
+
+    def test_approve_in_ended_session_is_refused(self):
+        self.join()
+        FocusBuddySession.objects.filter(pk=self.session.pk).update(status='completed')
+        self.assertEqual(self.approve().status_code, 400)
+        self.assertEqual(self.participant().status, 'pending')
+        self.assertSeats(2, 1)
+
+
+class MentorTestCase(TestCase):
+    """An approved mentor with one weekly slot at 7:00 PM a week from today"""
+
+    def setUp(self):
+        self.mentor_user = User.objects.create_user('mentor@example.com', 'Mentor', 'pass12345', is_mentor=True)
+        self.student = User.objects.create_user('student@example.com', 'Student', 'pass12345')
+        self.day = date.today() + timedelta(days=7)
+        self.mentor = Mentor.objects.create(
+            user=self.mentor_user,
+            expertise_level='advanced',
+            hourly_rate=Decimal('1000.00'),
+            availability={WEEKDAYS[self.day.weekday()]: ['7:00 PM']},
+            is_approved=True,
+            approval_status='approved',
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.student)
+
+    def booking(self, scheduled_time='19:00', **extra):
+        return dict({
+            'mentor_id': self.mentor.id,
+            'scheduled_date': self.day.isoformat(),
+            'scheduled_time': scheduled_time,
+            'duration_minutes': 60,
+            'session_mode': 'video',
+        }, **extra)
+
+
+class BookingAvailabilityTests(MentorTestCase):
+
+    def test_only_the_slot_start_is_bookable(self):
+        self.assertTrue(is_available_at(self.mentor.id, self.day, time(19, 0)))
+        self.assertFalse(is_available_at(self.mentor.id, self.day, time(19, 30)))
+        self.assertFalse(is_available_at(self.mentor.id, self.day, time(18, 59)))
+        self.assertFalse(is_available_at(self.mentor.id, self.day, time(20, 0)))
+
+    def test_search_matches_the_slot_start(self):
+        weekday = self.day.weekday()
+        self.assertTrue(Mentor.objects.filter(free_at(weekday, 19 * 60), pk=self.mentor.pk).exists())
+        self.assertFalse(Mentor.objects.filter(free_at(weekday, 19 * 60 + 30), pk=self.mentor.pk).exists())
+
+    def test_order_inside_a_slot_is_refused(self):
+        response = self.client.post('/api/user/sessions/create-order/', self.booking('19:30'), format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Mentor is not available', str(response.data))
+
+    def test_unchanged_availability_is_not_resynced(self):
+        mentor = Mentor.objects.get(pk=self.mentor.pk)
+        with mock.patch('userapp.availability.sync_availability_slots') as sync:
+            mentor.hourly_rate = Decimal('1200.00')
+            mentor.save()
+            sync.assert_not_called()
+            mentor.availability[WEEKDAYS[self.day.weekday()]].append('9:00 PM')
+            mentor.save()
+            sync.assert_called_once_with(mentor)
+
+
+class MentorSearchDocumentTests(MentorTestCase):
+
+    def test_search_document_rebuilds_only_on_expertise_change(self):
+        mentor = Mentor.objects.get(pk=self.mentor.pk)
+        self.assertIn('advanced', mentor.search_text)
+        with mock.patch('userapp.mentor_search.refresh_search_documents') as refresh:
+            mentor.hourly_rate = Decimal('1200.00')
+            mentor.save()
+            refresh.assert_not_called()
+            mentor.expertise_level = 'expert'
+            mentor.save()
+            refresh.assert_called_once_with([mentor.pk])
+
+
+class MentorSearchTests(MentorTestCase):
+    """The mentor from MentorTestCase (advanced, 1000/hour) plus a beginner at 300/hour"""
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.beginner = Mentor.objects.create(
+            user=User.objects.create_user('beginner@example.com', 'Beginner', 'pass12345', is_mentor=True),
+            expertise_level='beginner',
+            hourly_rate=Decimal('300.00'),
+            is_approved=True,
+            approval_status='approved',
+        )
+
+    def search(self, **params):
+        return self.client.get('/api/user/mentors/search/', params)
+
+    def facet_counts(self, facets, name, key):
+        return {option[key]: option['count'] for option in facets[name]}
+
+    def test_selected_facet_keeps_counting_its_other_options(self):
+        facets = self.search(expertise_level='beginner').data['facets']
+        self.assertEqual(facets['total'], 1)
+        expertise = self.facet_counts(facets, 'expertise_levels', 'value')
+        self.assertEqual((expertise['beginner'], expertise['advanced']), (1, 1))
+        # Other facets are still narrowed by the expertise selection
+        prices = self.facet_counts(facets, 'hourly_rate', 'label')
+        self.assertEqual((prices['250-500'], prices['1000+']), (1, 0))
+
+    def test_count_matches_the_page(self):
+        response = self.search(max_hourly_rate=500, page_size=1)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['count'], response.data['total_pages']), (1, 1))
+        self.assertEqual([mentor['id'] for mentor in response.data['data']], [self.beginner.id])
+        prices = self.facet_counts(response.data['facets'], 'hourly_rate', 'label')
+        self.assertEqual(prices['1000+'], 1)
+
+    def test_mentor_change_invalidates_cached_results(self):
+        self.assertEqual(self.search(expertise_level='advanced').data['count'], 1)
+        self.beginner.expertise_level = 'advanced'
+        self.beginner.save(update_fields=['expertise_level'])
+        response = self.search(expertise_level='advanced')
+        self.assertEqual(response.data['count'], 2)
+        self.assertEqual(response.data['facets']['total'], 2)
+
+    def test_unrelated_update_keeps_cached_results(self):
+        self.search()
+        with mock.patch('userapp.mentor_facets.compute_facets') as compute:
+            self.beginner.save(update_fields=['is_available'])
+            self.search()
+            compute.assert_not_called()
+
+
+class AuthCacheTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('cached@example.com', 'Cached', 'pass12345')
+        self.admin = User.objects.create_superuser('admin@example.com', 'Admin', 'pass12345')
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.user).access_token}')
+
+    def tearDown(self):
+        auth_cache.invalidate_users([self.user.pk, self.admin.pk])
+
+    def get_stats(self):
+        return self.client.get('/api/user/focus-buddy/stats/')
+
+    def test_bulk_update_block_evicts_cached_user(self):
+        self.assertEqual(self.get_stats().status_code, 200)
+        with self.captureOnCommitCallbacks(execute=True):
+            User.objects.filter(pk=self.user.pk).update(is_active=False)
+        self.assertEqual(self.get_stats().status_code, 401)
+
+    def test_admin_block_evicts_cached_user(self):
+        self.assertEqual(self.get_stats().status_code, 200)
+        admin_client = APIClient()
+        admin_client.force_authenticate(self.admin)
+        response = admin_client.post(f'/api/admin/users/{self.user.pk}/block/')
+        self.assertFalse(response.data['user']['is_active'])
+        self.assertEqual(self.get_stats().status_code, 401)
+
+    def test_cached_inactive_user_is_refused(self):
+        token = RefreshToken.for_user(self.user).access_token
+        self.user.is_active = False
+        with self.assertRaises(AuthenticationFailed):
+            auth_cache.get_user(token, lambda: self.user)
+
+
+@override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend')
+class OutboxDispatchTests(MentorTestCase):
+
+    def record_email(self):
+        event, = outbox.record_events(('send_email', {
+            'subject': 'Booked', 'message': 'Your session is booked', 'recipient_list': [self.student.email],
+        }))
+        return event
+
+    def due_now(self, event):
+        OutboxEvent.objects.filter(pk=event.pk).update(available_at=timezone.now())
+
+    def test_dispatch_runs_each_event_once(self):
+        event = self.record_email()
+        notify, = outbox.record_events(('notify_mentor', {'mentor_user_id': self.mentor_user.id, 'message': {}}))
+        self.assertEqual(outbox.dispatch_batch(), 2)
+        self.assertEqual(outbox.dispatch_batch(), 0)
+        self.assertEqual(len(mail.outbox), 1)
+        for dispatched in (event, notify):
+            dispatched.refresh_from_db()
+            self.assertEqual(dispatched.status, 'dispatched')
+            self.assertEqual(dispatched.attempts, 1)
+
+    def test_failed_event_is_retried_with_backoff(self):
+        event = self.record_email()
+        with mock.patch('userapp.outbox.send_mail', side_effect=OSError('SMTP down')):
+            self.assertEqual(outbox.dispatch_batch(), 1)
+        event.refresh_from_db()
+        self.assertEqual(event.status, 'pending')
+        self.assertEqual(event.last_error, 'SMTP down')
+        self.assertGreater(event.available_at, timezone.now())
+        self.assertEqual(outbox.dispatch_batch(), 0)
+
+        self.due_now(event)
+        self.assertEqual(outbox.dispatch_batch(), 1)
+        event.refresh_from_db()
+        self.assertEqual(event.status, 'dispatched')
+        self.assertEqual(event.attempts, 2)
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_event_fails_after_max_attempts(self):
+        event = self.record_email()
+        with mock.patch('userapp.outbox.send_mail', side_effect=OSError('SMTP down')):
+            for _ in range(5):
+                outbox.dispatch_batch()
+                self.due_now(event)
+        event.refresh_from_db()
+        self.assertEqual(event.status, 'failed')
+        self.assertEqual(event.attempts, 5)
+        self.assertEqual(outbox.dispatch_batch(), 0)
+
+    def test_leased_events_are_skipped_until_the_lease_expires(self):
+        event = self.record_email()
+        # A worker claims the batch and stops before recording the results
+        claimed, _ = outbox._claim(10, timezone.now())
+        self.assertEqual([e.pk for e in claimed], [event.pk])
+        self.assertEqual(outbox.dispatch_batch(), 0)
+
+        self.due_now(event)
+        self.assertEqual(outbox.dispatch_batch(), 1)
+        event.refresh_from_db()
+        self.assertEqual(event.status, 'dispatched')
+        self.assertEqual(event.attempts, 2)
+
+    def test_events_are_leased_while_handlers_run(self):
+        event = self.record_email()
+        started = timezone.now()
+
+        def send(claimed):
+            # Other workers see the lease, not a locked row, while the handler runs
+            self.assertGreater(OutboxEvent.objects.get(pk=claimed.pk).available_at, started)
+
+        with mock.patch.dict(outbox.HANDLERS, {'send_email': send}):
+            self.assertEqual(outbox.dispatch_batch(), 1)
+        event.refresh_from_db()
+        self.assertEqual(event.status, 'dispatched')
+
+    def test_reminder_failure_is_raised(self):
+        session = MentorSession.objects.create(
+            student=self.student, mentor=self.mentor, scheduled_date=self.day,
+            scheduled_time=time(19, 0), duration_minutes=60, status='confirmed',
+        )
+        with mock.patch('userapp.tasks.send_mail', side_effect=OSError('SMTP down')):
+            with self.assertRaises(OSError):
+                send_individual_reminder(session.id)
+        session.refresh_from_db()
+        self.assertFalse(session.reminder_sent)
+
+        send_individual_reminder(session.id)
+        session.refresh_from_db()
+        self.assertTrue(session.reminder_sent)
+
+
+class PaymentGatewayTests(TestCase):
+
+    def setUp(self):
+        self.gateway = RazorpayGateway('key', 'secret', dict(settings.PAYMENT_GATEWAY, BREAKER_THRESHOLD=2))
+        patcher = mock.patch.object(RazorpayGateway, '_sleep_before_retry')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def refused(self):
+        reason = NewConnectionError(None, 'Connection refused')
+        return requests.ConnectionError(MaxRetryError(None, '/v1/orders', reason))
+
+    def test_connection_refused_is_retried(self):
+        operation = mock.Mock(side_effect=[self.refused(), {'id': 'order_1'}])
+        self.assertEqual(self.gateway.call(operation), {'id': 'order_1'})
+        self.assertEqual(operation.call_count, 2)
+
+    def test_failures_after_sending_are_not_retried(self):
+        for error in (ServerError('502'), requests.ReadTimeout(), requests.ConnectionError('Connection aborted')):
+            self.gateway.breaker.record_success()
+            operation = mock.Mock(side_effect=error)
+            with self.assertRaises(PaymentGatewayError):
+                self.gateway.call(operation)
+            self.assertEqual(operation.call_count, 1)
+
+    def test_breaker_opens_after_consecutive_failures(self):
+        for _ in range(2):
+            with self.assertRaises(PaymentGatewayError):
+                self.gateway.call(mock.Mock(side_effect=ServerError('503')))
+        operation = mock.Mock()
+        with self.assertRaises(GatewayUnavailable):
+            self.gateway.call(operation)
+        operation.assert_not_called()
+
+    def test_rejected_request_keeps_breaker_closed(self):
+        for _ in range(3):
+            with self.assertRaises(BadRequestError):
+                self.gateway.call(mock.Mock(side_effect=BadRequestError('amount missing')))
+        self.assertFalse(self.gateway.breaker.is_open)
+
+    def test_fake_gateway_payment_verifies(self):
+        gateway = FakeGateway('key', 'secret')
+        order = gateway.create_order({'amount': 118000, 'currency': 'INR'})
+        payment_id, signature = gateway.pay(order['id'])
+        self.assertEqual(gateway.orders[order['id']]['status'], 'paid')
+        self.assertTrue(gateway.verify_payment_signature(order['id'], payment_id, signature))
+        self.assertTrue(self.gateway.verify_payment_signature(order['id'], payment_id, signature))
+        with self.assertRaises(PaymentVerificationError):
+            gateway.verify_payment_signature(order['id'], 'pay_other', signature)
+
+
+@override_settings(
+    PAYMENT_GATEWAY=dict(settings.PAYMENT_GATEWAY, BACKEND='fake'),
+    EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend',
+)
+class BookingTestCase(MentorTestCase):
+    """Bookings paid through the in-memory FakeGateway"""
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        payments.reset_gateway()
+        self.addCleanup(payments.reset_gateway)
+        self.gateway = payments.get_gateway()
+
+    def client_for(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client
+
+    def create_order(self, client=None, **extra):
+        return (client or self.client).post('/api/user/sessions/create-order/', self.booking(**extra), format='json')
+
+    def confirm(self, order_id, payment_id, signature, client=None):
+        return (client or self.client).post('/api/user/sessions/confirm-booking/', self.booking(
+            razorpay_order_id=order_id, razorpay_payment_id=payment_id, razorpay_signature=signature,
+        ), format='json')
+
+    def book(self):
+        order_id = self.create_order().data['order_id']
+        payment_id, signature = self.gateway.pay(order_id)
+        with self.captureOnCommitCallbacks():
+            response = self.confirm(order_id, payment_id, signature)
+        self.assertEqual(response.status_code, 201)
+        return response
+
+
+class SlotHoldTests(BookingTestCase):
+
+    def test_held_slot_conflicts_for_another_student(self):
+        self.assertEqual(self.create_order().status_code, 200)
+        rival = User.objects.create_user('rival@example.com', 'Rival', 'pass12345')
+        response = self.create_order(self.client_for(rival))
+        self.assertEqual(response.status_code, 409)
+        self.assertIn('held_until', response.data)
+
+    def test_holder_can_start_checkout_again(self):
+        first = self.create_order()
+        second = self.create_order()
+        self.assertEqual(second.status_code, 200)
+        self.assertNotEqual(first.data['order_id'], second.data['order_id'])
+
+    def test_renewal_keeps_the_hold_and_its_expiry(self):
+        acquired, first = slot_holds.acquire_hold(self.mentor.id, self.day, time(19, 0), self.student.id)
+        self.assertTrue(acquired)
+        acquired, second = slot_holds.acquire_hold(self.mentor.id, self.day, time(19, 0), self.student.id)
+        self.assertTrue(acquired)
+        self.assertEqual(second['expires_at'], first['expires_at'])
+
+    def test_another_students_hold_is_never_written(self):
+        rival = User.objects.create_user('rival@example.com', 'Rival', 'pass12345')
+        slot = (self.mentor.id, self.day, time(19, 0))
+        slot_holds.acquire_hold(*slot, rival.id)
+        slot_holds.attach_order(*slot, rival.id, 'order_rival')
+
+        acquired, hold = slot_holds.acquire_hold(*slot, self.student.id)
+        self.assertFalse(acquired)
+        self.assertEqual(hold['student_id'], rival.id)
+        slot_holds.attach_order(*slot, self.student.id, 'order_mine')
+        slot_holds.release_hold(*slot, self.student.id)
+        self.assertEqual(slot_holds.get_hold(*slot)['student_id'], rival.id)
+        self.assertEqual(slot_holds.get_hold(*slot)['order_id'], 'order_rival')
+
+    def test_confirmation_releases_the_hold(self):
+        self.book()
+        rival = User.objects.create_user('rival@example.com', 'Rival', 'pass12345')
+        # The slot is now taken by the session itself rather than by a hold
+        response = self.create_order(self.client_for(rival))
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('already booked', str(response.data))
+
+
+class BookingConfirmationReplayTests(BookingTestCase):
+
+    def test_replayed_confirmation_returns_the_first_response(self):
+        order_id = self.create_order().data['order_id']
+        payment_id, signature = self.gateway.pay(order_id)
+        with self.captureOnCommitCallbacks():
+            first = self.confirm(order_id, payment_id, signature)
+        replay = self.confirm(order_id, payment_id, signature)
+        self.assertEqual(replay.status_code, 201)
+        self.assertEqual(replay['Idempotent-Replayed'], 'true')
+        self.assertEqual(replay.data['session']['id'], first.data['session']['id'])
+        self.assertEqual(MentorSession.objects.filter(mentor=self.mentor).count(), 1)
+        self.assertEqual(SessionPayment.objects.filter(gateway_order_id=order_id).count(), 1)
+
+    def test_replay_is_rebuilt_when_the_cached_response_is_gone(self):
+        order_id = self.create_order().data['order_id']
+        payment_id, signature = self.gateway.pay(order_id)
+        with self.captureOnCommitCallbacks():
+            first = self.confirm(order_id, payment_id, signature)
+        cache.clear()
+        replay = self.confirm(order_id, payment_id, signature)
+        self.assertEqual(replay.status_code, 201)
+        self.assertEqual(replay.data['session']['id'], first.data['session']['id'])
+
+    def test_order_confirmed_with_another_payment_conflicts(self):
+        order_id = self.create_order().data['order_id']
+        payment_id, signature = self.gateway.pay(order_id)
+        with self.captureOnCommitCallbacks():
+            self.confirm(order_id, payment_id, signature)
+        other_payment_id, other_signature = self.gateway.pay(order_id)
+        response = self.confirm(order_id, other_payment_id, other_signature)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(MentorSession.objects.filter(mentor=self.mentor).count(), 1)
+
+    def test_bad_signature_is_refused(self):
+        order_id = self.create_order().data['order_id']
+        payment_id, _ = self.gateway.pay(order_id)
+        response = self.confirm(order_id, payment_id, 'not-a-signature')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(MentorSession.objects.filter(mentor=self.mentor).exists())
+
+
+class WalletLedgerTests(BookingTestCase):
+    # A one hour session at 1000/hour: 100 platform fee, 180 tax, 100 commission
+
+    def balances(self):
+        accounts = {
+            'mentor': ledger.mentor_account(self.mentor.id),
+            'student': ledger.user_account(self.student.id),
+            'revenue': ledger.system_account(ledger.PLATFORM_REVENUE),
+            'tax': ledger.system_account(ledger.PLATFORM_TAX),
+            'gateway': ledger.system_account(ledger.PAYMENT_GATEWAY),
+        }
+        return {name: ledger.account_balance(account) for name, account in accounts.items()}
+
+    def assertBalanced(self):
+        self.assertEqual(LedgerEntry.objects.aggregate(total=Sum('amount'))['total'], 0)
+
+    def test_booking_credits_mentor_platform_and_tax(self):
+        self.book()
+        self.assertEqual(self.balances(), {
+            'mentor': Decimal('900.00'), 'student': Decimal('0.00'), 'revenue': Decimal('200.00'),
+            'tax': Decimal('180.00'), 'gateway': Decimal('-1280.00'),
+        })
+        self.assertBalanced()
+
+    def test_cancellation_reverses_the_payment(self):
+        session_id = self.book().data['session']['id']
+        with self.captureOnCommitCallbacks():
+            response = self.client.patch(f'/api/user/{session_id}/cancel/', {'reason': 'Clash'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        # 90% of 1280 goes back; the platform keeps the other 128
+        self.assertEqual(self.balances(), {
+            'mentor': Decimal('0.00'), 'student': Decimal('1152.00'), 'revenue': Decimal('128.00'),
+            'tax': Decimal('0.00'), 'gateway': Decimal('-1280.00'),
+        })
+        self.assertBalanced()
+        self.assertEqual(
+            self.client.patch(f'/api/user/{session_id}/cancel/', {'reason': 'Clash'}, format='json').status_code, 400
+        )
+        self.assertEqual(self.balances()['student'], Decimal('1152.00'))
+
+    def test_system_accounts_keep_no_running_balance(self):
+        self.book()
+        revenue = ledger.system_account(ledger.PLATFORM_REVENUE)
+        revenue.refresh_from_db()
+        self.assertEqual(revenue.balance, Decimal('0.00'))
+        self.assertEqual(ledger.account_balance(revenue), Decimal('200.00'))
+
+    def test_wallet_pages_read_the_ledger(self):
+        self.book()
+        mentor_client = self.client_for(self.mentor_user)
+        summary = mentor_client.get('/api/mentor/wallet/').data['wallet_summary']
+        self.assertEqual(
+            (summary['total_earnings'], summary['available_balance'], summary['this_month_earnings']),
+            (Decimal('900.00'), Decimal('900.00'), Decimal('900.00')),
+        )
+        self.assertEqual(summary['total_sessions'], 1)
+
+        admin = User.objects.create_superuser('admin@example.com', 'Admin', 'pass12345')
+        summary = self.client_for(admin).get('/api/admin/wallet/').data['wallet_summary']
+        self.assertEqual(summary['total_platform_commission'], Decimal('200.00'))
+
+    def test_legacy_balance_opens_the_account_once(self):
+        Mentor.objects.filter(pk=self.mentor.pk).update(wallet_balance=Decimal('50.00'))
+        self.book()
+        account = ledger.mentor_account(self.mentor.id)
+        self.assertEqual(ledger.account_balance(account), Decimal('950.00'))
+        self.assertEqual(LedgerEntry.objects.filter(account=account, entry_type='opening_balance').count(), 1)
+        # Once the account is open, saves that write the legacy field do not touch the ledger
+        self.mentor.save()
+        account = ledger.mentor_account(self.mentor.id)
+        account.refresh_from_db()
+        self.assertEqual(account.balance, Decimal('950.00'))
+        self.assertEqual(LedgerEntry.objects.filter(account=account, entry_type='opening_balance').count(), 1)
+        self.assertBalanced()
+
+    def test_snapshots_keep_balances_and_summaries(self):
+        self.book()
+        account = ledger.mentor_account(self.mentor.id)
+        booked_at = timezone.now()
+        # Entries younger than the settle window are left for the next snapshot
+        self.assertEqual(ledger.snapshot_balances(now=booked_at), 0)
+
+        later = booked_at + timedelta(hours=1)
+        self.assertEqual(ledger.snapshot_balances(now=later), 4)
+        self.assertEqual(ledger.snapshot_balances(now=later), 0)
+        self.assertEqual(ledger.latest_snapshot(account).balance, Decimal('900.00'))
+
+        ledger.post_transaction('session_refund', [
+            (account, Decimal('-100.00')), (ledger.system_account(ledger.PLATFORM_REVENUE), Decimal('100.00')),
+        ])
+        self.assertEqual(ledger.balance_at(account, timezone.now()), Decimal('800.00'))
+        self.assertEqual(ledger.balance_at(account, booked_at - timedelta(days=1)), Decimal('0.00'))
+        self.assertEqual(ledger.wallet_summary(account, booked_at - timedelta(days=1)), {
+            'balance': Decimal('800.00'), 'opening_balance': Decimal('0.00'),
+            'credits': Decimal('900.00'), 'debits': Decimal('100.00'), 'total_credits': Decimal('900.00'),
+        })
+        # Lifetime credits carry over from the snapshot when the month starts after it
+        self.assertEqual(ledger.wallet_summary(account, timezone.now())['total_credits'], Decimal('900.00'))
+
+    def test_entries_are_append_only(self):
+        self.book()
+        entry = LedgerEntry.objects.first()
+        with self.assertRaises(ValueError):
+            entry.save()
+        with self.assertRaises(ValueError):
+            entry.delete()
+
+    def test_unbalanced_transaction_is_refused(self):
+        with self.assertRaises(ValueError):
+            ledger.post_transaction('session_refund', [(ledger.user_account(self.student.id), Decimal('1.00'))])
@@ -50,6 +50,7 @@ urlpatterns = [
     
     # Mentor URLs
     path('mentors/', MentorListAPIView.as_view(), name='mentor-list'),
+    path('mentors/search/', MentorSearchAPIView.as_view(), name='mentor-search'),
     path('mentors/<int:mentor_id>/', MentorDetailAPIView.as_view(), name='mentor-detail'),
     path('mentor-sessions/<int:session_id>/join/', JoinMentorSessionView.as_view(),name='join-mentor-session'),
     path('mentor-sessions/<int:session_id>/leave/', LeaveMentorSessionView.as_view(), name='leave-mentor-session'),
@@ -92,6 +93,7 @@ urlpatterns = [
     path('user-settings/', UserSettingsAPIView.as_view(), name='user-settings'),
     path('user-settings/password/', PasswordChangeAPIView.as_view(), name='change-password'),
     path('user-settings/stats/', UserStatsAPIView.as_view(), name='user-stats'),
+    path('user-settings/activity/', UserActivityCalendarAPIView.as_view(), name='user-activity-calendar'),
     path('user-settings/delete-account/', DeleteAccountAPIView.as_view(), name='delete-account'),
 
     path('focus-buddy/history/', FocusBuddyHistoryListView.as_view(), name='focus-buddy-history'),
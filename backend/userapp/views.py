@@ -1,6 +1,7 @@
 from .models import *
 from .serializers import *
 from django.core.mail import send_mail
+from django.core.cache import cache
 from django.conf import settings
 import logging
 from rest_framework.permissions import AllowAny, IsAuthenticated
@@ -17,12 +18,21 @@ from rest_framework.response import Response
 from django.shortcuts import get_object_or_404
 from django.db.models import Q
 from rest_framework.pagination import PageNumberPagination
-import razorpay
 from django.conf import settings
 from django.db.models import Count
-from django.db import IntegrityError
+from django.db import IntegrityError, transaction
 from rest_framework.exceptions import ValidationError
 from .combine import *
+from .presence import PresenceRegistry
+from .session_access import invalidate_session_access
+from .activity import get_streaks
+from .mentor_search import filter_mentors, filter_stages, parse_mentor_filters
+from .mentor_facets import catalogue_version, filter_signature, get_facets
+from .slot_holds import acquire_hold, attach_order, release_hold
+from .booking_confirmations import booking_response, find_confirmation, remember_confirmation
+from .payments import GatewayUnavailable, get_gateway
+from .outbox import record_session_cancelled
+from .ledger import record_session_refund
 from django.contrib.auth import update_session_auth_hash
 from .serializers import CancelSessionSerializer
 from decimal import Decimal
@@ -43,16 +53,6 @@ import json
 
 logger = logging.getLogger(__name__)
 
-def notify_mentor(mentor_user_id, message):
-    channel_layer = get_channel_layer()
-    async_to_sync(channel_layer.group_send)(
-        f"mentor_notify_{mentor_user_id}",
-        {
-            "type": "send_notification",
-            "content": message
-        }
-    )
-
 class SignupView(APIView):
     permission_classes=[]
     authentication_classes=[]
@@ -611,104 +611,21 @@ class MoodChoicesAPIView(APIView):
 
 class MentorListAPIView(APIView):
     
+    # Hard cap on returned mentors to prevent timeouts
+    MAX_RESULTS = 100
+
     def get(self, request):
         try:
-            logger.info(f"Mentor list request with params: {request.query_params}")
-            
-            # Get query parameters with better validation
-            search_query = request.query_params.get('search', '').strip()
-            subjects_param = request.query_params.get('subjects', '').strip()
-            expertise_levels = request.query_params.getlist('expertise_level')
-            min_rating = request.query_params.get('rating', '0')
-            min_hourly_rate = request.query_params.get('min_hourly_rate', '0')
-            max_hourly_rate = request.query_params.get('max_hourly_rate', '1000')
-            
-            logger.info(f"Parsed params - search: '{search_query}', subjects: '{subjects_param}', "
-                       f"expertise: {expertise_levels}, rating: '{min_rating}', "
-                       f"rate_range: '{min_hourly_rate}'-'{max_hourly_rate}'")
-            
-            # Base queryset - only approved mentors
-            mentors = Mentor.objects.filter(
-                is_approved=True,
-                approval_status='approved'
-            ).select_related('user').prefetch_related('user__subjects')
-            
-            logger.info(f"Base queryset count: {mentors.count()}")
-            
-            # Apply search filter
-            if search_query:
-                try:
-                    mentors = mentors.filter(
-                        Q(user__name__icontains=search_query) |
-                        Q(user__bio__icontains=search_query) |
-                        Q(user__subjects__name__icontains=search_query)
-                    ).distinct()
-                    logger.info(f"After search filter count: {mentors.count()}")
-                except Exception as e:
-                    logger.error(f"Error applying search filter: {e}")
-                    # Continue without search filter rather than failing
-            
-            # Apply subject filter
-            if subjects_param:
-                try:
-                    subject_names = [s.strip() for s in subjects_param.split(',') if s.strip()]
-                    if subject_names:
-                        logger.info(f"Filtering by subjects: {subject_names}")
-                        mentors = mentors.filter(
-                            user__subjects__name__in=subject_names
-                        ).distinct()
-                        logger.info(f"After subject filter count: {mentors.count()}")
-                except Exception as e:
-                    logger.error(f"Error applying subject filter: {e}")
-                    # Continue without subject filter
-            
-            # Apply expertise level filter
-            if expertise_levels:
-                try:
-                    # Clean the expertise levels
-                    clean_levels = [level.strip() for level in expertise_levels if level.strip()]
-                    if clean_levels:
-                        logger.info(f"Filtering by expertise levels: {clean_levels}")
-                        mentors = mentors.filter(expertise_level__in=clean_levels)
-                        logger.info(f"After expertise filter count: {mentors.count()}")
-                except Exception as e:
-                    logger.error(f"Error applying expertise filter: {e}")
-                    # Continue without expertise filter
-            
-            # Apply rating filter
-            try:
-                min_rating_val = float(min_rating) if min_rating else 0
-                if min_rating_val > 0:
-                    logger.info(f"Filtering by min rating: {min_rating_val}")
-                    mentors = mentors.filter(rating__gte=min_rating_val)
-                    logger.info(f"After rating filter count: {mentors.count()}")
-            except (ValueError, TypeError) as e:
-                logger.warning(f"Invalid min_rating value '{min_rating}': {e}")
-                # Continue without rating filter
-            
-            # Apply hourly rate filter
-            try:
-                min_rate = float(min_hourly_rate) if min_hourly_rate else 0
-                max_rate = float(max_hourly_rate) if max_hourly_rate else 1000
-                
-                logger.info(f"Filtering by rate range: {min_rate} - {max_rate}")
-                mentors = mentors.filter(
-                    hourly_rate__gte=min_rate,
-                    hourly_rate__lte=max_rate
-                )
-                logger.info(f"After rate filter count: {mentors.count()}")
-            except (ValueError, TypeError) as e:
-                logger.warning(f"Invalid hourly rate values '{min_hourly_rate}'-'{max_hourly_rate}': {e}")
-                # Continue without rate filter
+            filters = parse_mentor_filters(request.query_params)
+            logger.info(f"Mentor list request with filters: {filters}")
             
-            # Limit results to prevent timeouts
-            mentors = mentors[:100]  # Limit to 100 mentors
+            # One composed queryset (plus the subjects prefetch): two queries in total
+            mentors = filter_mentors(filters)[:self.MAX_RESULTS]
             
             # Serialize the data
             try:
                 serializer = MentorSerializer(mentors, many=True)
                 serialized_data = serializer.data
-                logger.info(f"Successfully serialized {len(serialized_data)} mentors")
             except Exception as e:
                 logger.error(f"Serialization error: {e}")
                 return Response({
@@ -716,11 +633,16 @@ class MentorListAPIView(APIView):
                     'error': 'Error processing mentor data'
                 }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
             
-            return Response({
+            response_data = {
                 'success': True,
                 'count': len(serialized_data),
                 'data': serialized_data
-            }, status=status.HTTP_200_OK)
+            }
+            if self.debug_requested(request):
+                response_data['debug'] = {
+                    'stage_counts': {name: queryset.count() for name, queryset in filter_stages(filters)}
+                }
+            return Response(response_data, status=status.HTTP_200_OK)
             
         except Exception as e:
             logger.error(f"Unexpected error in MentorListAPIView: {e}", exc_info=True)
@@ -729,6 +651,69 @@ class MentorListAPIView(APIView):
                 'error': 'An unexpected error occurred while fetching mentors'
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+    def debug_requested(self, request):
+        """Per-stage counts cost one COUNT per filter, so only staff or DEBUG may opt in"""
+        if request.query_params.get('debug') != 'counts':
+            return False
+        return settings.DEBUG or (request.user.is_authenticated and request.user.is_staff)
+
+
+class MentorSearchAPIView(APIView):
+    """
+    Faceted mentor search: one page of results plus per-facet counts
+    (subjects, expertise levels, rating and price buckets) for the same filters
+    """
+
+    MAX_PAGE_SIZE = 50
+
+    def get(self, request):
+        try:
+            filters = parse_mentor_filters(request.query_params)
+            try:
+                page = max(1, int(request.query_params.get('page', 1)))
+                page_size = max(1, min(int(request.query_params.get('page_size', 12)), self.MAX_PAGE_SIZE))
+            except (TypeError, ValueError):
+                return Response({
+                    'success': False,
+                    'error': 'Invalid pagination parameters'
+                }, status=status.HTTP_400_BAD_REQUEST)
+
+            facets = get_facets(filters)
+
+            # The count is cached together with its page, so the two never
+            # disagree; both retire with the facets when the catalogue changes
+            key = (
+                f"mentor_search:{catalogue_version()}:{filter_signature(filters)}:"
+                f"{filters['sort']}:{page}:{page_size}"
+            )
+            results = cache.get(key)
+            if results is None:
+                mentors = filter_mentors(filters)
+                start = (page - 1) * page_size
+                results = {
+                    'count': mentors.count(),
+                    'data': MentorSerializer(mentors[start:start + page_size], many=True).data,
+                }
+                cache.set(key, results, settings.MENTOR_FACETS_CACHE_TTL)
+            total = results['count']
+
+            return Response({
+                'success': True,
+                'count': total,
+                'page': page,
+                'page_size': page_size,
+                'total_pages': (total + page_size - 1) // page_size,
+                'data': results['data'],
+                'facets': facets,
+            }, status=status.HTTP_200_OK)
+
+        except Exception as e:
+            logger.error(f"Unexpected error in MentorSearchAPIView: {e}", exc_info=True)
+            return Response({
+                'success': False,
+                'error': 'An unexpected error occurred while searching mentors'
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
 
 class MentorDetailAPIView(APIView):
     
@@ -749,7 +734,9 @@ class MentorDetailAPIView(APIView):
             try:
                 mentor = Mentor.objects.select_related('user').prefetch_related(
                     'user__subjects'
-                ).get(
+                ).annotate(
+                    session_count=Count('mentor_sessions')
+                ).defer('search_text', 'search_vector').get(
                     id=mentor_id,
                     is_approved=True,
                     approval_status='approved'
@@ -817,6 +804,17 @@ class CreateOrderAPIView(APIView):
                         'message': 'Mentor not found or not available'
                     }, status=status.HTTP_404_NOT_FOUND)
             
+            # Reserve the slot before asking the student to pay for it
+            acquired, hold = acquire_hold(
+                mentor.id, validated_data['scheduled_date'], validated_data['scheduled_time'], request.user.id
+            )
+            if not acquired:
+                return Response({
+                    'success': False,
+                    'message': 'This time slot is being booked by another student. Please try again in a few minutes.',
+                    'held_until': hold['expires_at']
+                }, status=status.HTTP_409_CONFLICT)
+            
             # Calculate amount using the mentor object
             duration_hours = validated_data['duration_minutes'] / 60
             base_amount = Decimal(str(mentor.hourly_rate)) * Decimal(str(duration_hours))
@@ -825,7 +823,7 @@ class CreateOrderAPIView(APIView):
             total_amount = base_amount + platform_fee + tax_amount
             
             # Create Razorpay order
-            client = razorpay.Client(auth=(settings.RAZORPAY_KEY_ID, settings.RAZORPAY_KEY_SECRET))
+            gateway = get_gateway()
             
             try:
                 order_data = {
@@ -843,7 +841,11 @@ class CreateOrderAPIView(APIView):
                     }
                 }
                 
-                razorpay_order = client.order.create(order_data)
+                razorpay_order = gateway.create_order(order_data)
+                attach_order(
+                    mentor.id, validated_data['scheduled_date'], validated_data['scheduled_time'],
+                    request.user.id, razorpay_order['id']
+                )
                 
                 return Response({
                     'success': True,
@@ -852,6 +854,7 @@ class CreateOrderAPIView(APIView):
                     'amount': total_amount,
                     'currency': 'INR',
                     'razorpay_key': settings.RAZORPAY_KEY_ID,
+                    'held_until': hold['expires_at'],
                     'session_details': {
                         'mentor_name': mentor.user.name,  # Now using mentor object
                         'scheduled_date': validated_data['scheduled_date'],
@@ -861,7 +864,19 @@ class CreateOrderAPIView(APIView):
                     }
                 }, status=status.HTTP_200_OK)
                 
+            except GatewayUnavailable as e:
+                release_hold(
+                    mentor.id, validated_data['scheduled_date'], validated_data['scheduled_time'], request.user.id
+                )
+                return Response({
+                    'success': False,
+                    'message': 'Payments are temporarily unavailable. Please try again shortly.',
+                    'error': str(e)
+                }, status=status.HTTP_503_SERVICE_UNAVAILABLE)
             except Exception as e:
+                release_hold(
+                    mentor.id, validated_data['scheduled_date'], validated_data['scheduled_time'], request.user.id
+                )
                 return Response({
                     'success': False,
                     'message': 'Failed to create payment order',
@@ -878,58 +893,50 @@ class ConfirmBookingAPIView(APIView):
     permission_classes = [IsAuthenticated]
     
     def post(self, request):
+        order_id = request.data.get('razorpay_order_id')
+        payment_id = request.data.get('razorpay_payment_id')
+        
+        # Retries of a confirmed order replay the first response
+        replay, conflict = find_confirmation(order_id, payment_id, request.user.id)
+        if conflict:
+            return Response({
+                'success': False,
+                'message': 'This order has already been used for another booking'
+            }, status=status.HTTP_409_CONFLICT)
+        if replay is not None:
+            return Response(replay, status=status.HTTP_201_CREATED, headers={'Idempotent-Replayed': 'true'})
+        
         serializer = ConfirmBookingSerializer(data=request.data, context={'request': request})
         if serializer.is_valid():
             try:
                 session = serializer.save()
-                # Get the payment object
-                try:
-                    if hasattr(session, '_payment'):
-                        payment = session._payment
-                    else:
-                        payment = SessionPayment.objects.get(session=session)
-                    session_serializer = MentorSessionSerializer(session)
-                    payment_serializer = SessionPaymentSerializer(payment)
-                    # Send real-time notification to mentor
-                    notify_mentor(session.mentor.user.id, {
-                        "event": "session_booked",
-                        "session_id": session.id,
-                        "student_name": session.student.name,
-                        "scheduled_date": str(session.scheduled_date),
-                        "scheduled_time": str(session.scheduled_time)
-                    })
-                    print(f"[ConfirmBookingAPIView] Notifying mentor {session.mentor.user.id} for session {session.id}")
-                    return Response({
-                        'success': True,
-                        'message': 'Session booked successfully',
-                        'session': session_serializer.data,
-                        'payment': payment_serializer.data
-                    }, status=status.HTTP_201_CREATED)
-                except SessionPayment.DoesNotExist:
-                    session_serializer = MentorSessionSerializer(session)
-                    print("Warning: Payment object not found for session")
-                    notify_mentor(session.mentor.user.id, {
-                        "event": "session_booked",
-                        "session_id": session.id,
-                        "student_name": session.student.name,
-                        "scheduled_date": str(session.scheduled_date),
-                        "scheduled_time": str(session.scheduled_time)
-                    })
-                    return Response({
-                        'success': True,
-                        'message': 'Session booked successfully',
-                        'session': session_serializer.data,
-                        'payment': None
-                    }, status=status.HTTP_201_CREATED)
+            except IntegrityError:
+                # A concurrent retry of the same order committed first
+                replay, conflict = find_confirmation(order_id, payment_id, request.user.id)
+                if replay is not None:
+                    return Response(replay, status=status.HTTP_201_CREATED, headers={'Idempotent-Replayed': 'true'})
+                logger.warning(f"Booking conflict for order {order_id}", exc_info=True)
+                return Response({
+                    'success': False,
+                    'message': 'This time slot was booked by someone else. Refund will be initiated.'
+                }, status=status.HTTP_409_CONFLICT)
             except Exception as e:
-                print(f"Error in confirm booking: {str(e)}")
-                import traceback
-                traceback.print_exc()
+                logger.error(f"Error in confirm booking: {e}", exc_info=True)
                 return Response({
                     'success': False,
                     'message': 'Failed to create session',
                     'error': str(e)
                 }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+            
+            payment = getattr(session, '_payment', None)
+            body = booking_response(session, payment)
+            remember_confirmation(order_id, payment_id, request.user.id, body)
+            return Response(body, status=status.HTTP_201_CREATED)
+        
+        # The slot conflict check also trips when a concurrent retry of this order won
+        replay, conflict = find_confirmation(order_id, payment_id, request.user.id)
+        if replay is not None:
+            return Response(replay, status=status.HTTP_201_CREATED, headers={'Idempotent-Replayed': 'true'})
         return Response({
             'success': False,
             'errors': serializer.errors
@@ -1082,46 +1089,50 @@ class CancelSessionAPIView(APIView):
         serializer = CancelSessionSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         reason = serializer.validated_data.get('reason', '')
-        session.cancel_session(user, reason)
-        
-        # Handle refund if payment was made
-        if hasattr(session, 'payment') and session.payment.status == 'completed':
-            payment = session.payment
-            refund_amount = payment.amount * Decimal('0.90')  # 90% refund
-            platform_fee = payment.amount * Decimal('0.10')   # 10% platform fee
-
-            # Refund to user (student)
-            session.student.wallet_balance += refund_amount
-            session.student.save()
-            WalletTransaction.objects.create(
-                user=session.student,
-                amount=refund_amount,
-                transaction_type='credit',
-                description=f'Refund for cancelled session {session.id}'
-            )
-
-            # Deduct from mentor (if already credited)
-            if hasattr(session.mentor, 'wallet_balance'):
-                mentor_user = session.mentor.user
-                session.mentor.wallet_balance -= refund_amount
-                session.mentor.save()
-                WalletTransaction.objects.create(
-                    user=mentor_user,
-                    amount=refund_amount,
-                    transaction_type='debit',
-                    description=f'Refund for cancelled session {session.id}'
+        with transaction.atomic():
+            # Lock the session so two concurrent cancellations cannot both refund it
+            still_cancellable = MentorSession.objects.select_for_update().filter(
+                pk=session.pk, status__in=['pending', 'confirmed']
+            ).values_list('pk', flat=True).first()
+            if still_cancellable is None:
+                return Response({
+                    'success': False,
+                    'error': 'Cannot cancel session in current status'
+                }, status=status.HTTP_400_BAD_REQUEST)
+            
+            session.cancel_session(user, reason)
+        
+            # Handle refund if payment was made
+            if hasattr(session, 'payment') and session.payment.status == 'completed':
+                payment = session.payment
+                refund_amount = (payment.amount * Decimal('0.90')).quantize(Decimal('0.01'))  # 90% refund
+
+                # Reverse the payment's ledger legs: the mentor gives back their earning,
+                # tax and platform revenue cover the rest of the refund
+                entries = record_session_refund(session, refund_amount)
+                mentor_debit = -sum(
+                    (entry.amount for entry in entries if entry.account.account_type == 'mentor_wallet'),
+                    Decimal('0.00')
                 )
-        
-        # Send real-time notification to mentor
-        notify_mentor(session.mentor.user.id, {
-            "event": "session_cancelled",
-            "session_id": session.id,
-            "student_name": session.student.name,
-            "scheduled_date": str(session.scheduled_date),
-            "scheduled_time": str(session.scheduled_time),
-            "reason": reason
-        })
-        print(f"[CancelSessionAPIView] Notifying mentor {session.mentor.user.id} for session {session.id}")
+                transactions = [
+                    WalletTransaction(
+                        user=session.student,
+                        amount=refund_amount,
+                        transaction_type='credit',
+                        description=f'Refund for cancelled session {session.id}'
+                    ),
+                ]
+                if mentor_debit:
+                    transactions.append(WalletTransaction(
+                        user=session.mentor.user,
+                        amount=mentor_debit,
+                        transaction_type='debit',
+                        description=f'Refund for cancelled session {session.id}'
+                    ))
+                WalletTransaction.objects.bulk_create(transactions)
+            
+            # The mentor is notified by the outbox worker once this commits
+            record_session_cancelled(session, reason)
         
         session_serializer = MentorSessionSerializer(session)
         return Response({
@@ -1365,25 +1376,16 @@ class FocusBuddySessionListView(APIView):
     
     def get(self, request):
         """Get list of active sessions"""
-        # Filter only active sessions that haven't expired
+        # Expiry is handled by the expire_focus_sessions beat task, so this is a pure read
         sessions = FocusBuddySession.objects.filter(
-            status='active'
-        ).annotate(
-    annotated_participant_count=Count('participants', filter=Q(participants__left_at__isnull=True))
-).order_by('-created_at')
-        
-        # Remove expired sessions (cleanup)
-        expired_sessions = []
-        for session in sessions:
-            if session.is_expired and session.status == 'active':
-                session.end_session('expired')
-                expired_sessions.append(session.id)
-        
-        # Filter out expired sessions from queryset
-        if expired_sessions:
-            sessions = sessions.exclude(id__in=expired_sessions)
-        
-        serializer = FocusBuddySessionListSerializer(sessions, many=True)
+            status='active',
+            ends_at__gt=timezone.now()
+        ).select_related('creator_id').order_by('-created_at')
+        
+        online_counts = PresenceRegistry.safe_counts(session.id for session in sessions)
+        serializer = FocusBuddySessionListSerializer(
+            sessions, many=True, context={'online_counts': online_counts}
+        )
         return Response({
             'sessions': serializer.data,
             'total_active_sessions': sessions.count()
@@ -1405,6 +1407,10 @@ class FocusBuddySessionListView(APIView):
                 camera_enabled=True,        
                 microphone_enabled=True      
             )
+            # The creator holds the first seat
+            if FocusBuddySession.reserve_seat(session.id, approved=True):
+                session.reserved_seats += 1
+                session.participant_count += 1
             print("Creator added as participant successfully")
 
             #  Create a welcome system message
@@ -1461,15 +1467,7 @@ class FocusBuddySessionDetailView(APIView):
         
         # End the session
         reason = 'cancelled' if not session.is_expired else 'completed'
-        session.end_session(reason)
-        
-        # Create system message about session ending
-        FocusBuddyMessage.objects.create(
-            session=session,
-            sender=request.user,
-            message="Session ended by creator",
-            is_system_message=True
-        )
+        session.end_session(reason, message="Session ended by creator", sender=request.user)
         
         return Response({'message': f'Session {reason} successfully'})
 
@@ -1478,18 +1476,15 @@ class FocusBuddySessionDetailView(APIView):
 
 class JoinSessionView(APIView):
     permission_classes = [IsAuthenticated]
-    
+
     def post(self, request, session_id):
-        print(f"DEBUG: Join request - User: {request.user.id}, Session: {session_id}")
-        print(f"DEBUG: Request data: {request.data}")
-        
+        logger.debug(f"Join request - User: {request.user.id}, Session: {session_id}")
+
         try:
             session = get_object_or_404(FocusBuddySession, id=session_id)
-            print(f"DEBUG: Session found - Status: {session.status}, Creator: {session.creator_id.id}")
-            
+
             # Check if user is the creator
             if session.creator_id == request.user:
-                print("DEBUG: User is the session creator")
                 return Response(
                     {'error': 'Session creators do not need to join - you are automatically the host'}, 
                     status=status.HTTP_400_BAD_REQUEST
@@ -1519,65 +1514,65 @@ class JoinSessionView(APIView):
                             status=status.HTTP_403_FORBIDDEN
                         )
                     else:
-                        print(f"DEBUG: User already in session as participant {participant.id}")
                         return Response(
                             {'error': 'You are already in this session'}, 
                             status=status.HTTP_400_BAD_REQUEST
                         )
-                else:
-                    print(f"DEBUG: Rejoining session - updating left_at = None for {participant.id}")
-                    participant.left_at = None
-                    participant.camera_enabled = request.data.get('camera_enabled', True)
-                    participant.microphone_enabled = request.data.get('microphone_enabled', True)
-                    participant.status = 'pending'  # Rejoining requires approval again
-                    participant.save()
+
+                # Rejoining: claim the row with a conditional UPDATE first, so of
+                # two concurrent rejoins only one goes on to reserve a seat
+                with transaction.atomic():
+                    claimed = FocusBuddyParticipant.objects.filter(
+                        id=participant.id, left_at__isnull=False
+                    ).update(
+                        left_at=None,
+                        camera_enabled=request.data.get('camera_enabled', True),
+                        microphone_enabled=request.data.get('microphone_enabled', True),
+                        status='pending',  # Rejoining requires approval again
+                    )
+                    seated = claimed and FocusBuddySession.reserve_seat(session.id)
+                    if claimed and not seated:
+                        transaction.set_rollback(True)
+
+                if not claimed:
+                    # A concurrent request rejoined first
                     return Response(
-                        {'message': 'Join request is now pending approval', 'pending': True},
+                        {'message': 'Join request is still pending approval', 'pending': True},
                         status=status.HTTP_202_ACCEPTED
                     )
-            
-            # Check session status
-            if session.status not in ['waiting', 'active']:
-                print(f"DEBUG: Session not joinable - status: {session.status}")
-                return Response(
-                    {'error': f'Cannot join session in {session.status} status'}, 
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            
-            # Check capacity *after* confirming not already in
-            current_participants = FocusBuddyParticipant.objects.filter(
-                session=session, 
-                left_at__isnull=True,
-                status='approved'
-            ).count()
-            print(f"DEBUG: Current participants: {current_participants}/{session.max_participants}")
-            
-            if current_participants >= session.max_participants:
-                # Undo if newly created
-                if created:
-                    print(f"DEBUG: Rolling back participant creation due to full session")
-                    participant.delete()
+                if not seated:
+                    return self.no_seat_response(session)
+
+                logger.debug(f"Participant {participant.id} rejoined session {session.id}")
+                invalidate_session_access(session.id, request.user.id)
                 return Response(
-                    {'error': 'Session is full'}, 
-                    status=status.HTTP_400_BAD_REQUEST
+                    {'message': 'Join request is now pending approval', 'pending': True},
+                    status=status.HTTP_202_ACCEPTED
                 )
-            
+
+            # Reserve a seat in one conditional UPDATE; this is what enforces max_participants
+            if not FocusBuddySession.reserve_seat(session.id):
+                participant.delete()
+                invalidate_session_access(session.id, request.user.id)
+                return self.no_seat_response(session)
+
+            invalidate_session_access(session.id, request.user.id)
+
             # Send real-time notification to host about new join request
-            if created or (not created and participant.status == 'pending'):
-                try:
-                    channel_layer = get_channel_layer()
-                    async_to_sync(channel_layer.group_send)(
-                        f'webrtc_session_{session_id}',
-                        {
-                            'type': 'notify_host_new_request',
-                            'participant_id': participant.id,
-                            'user_name': request.user.name,
-                            'user_id': request.user.id
-                        }
-                    )
-                    print(f"DEBUG: Sent real-time notification to host for participant {participant.id}")
-                except Exception as e:
-                    print(f"DEBUG: Failed to send real-time notification: {e}")
+            try:
+                channel_layer = get_channel_layer()
+                async_to_sync(channel_layer.group_send)(
+                    f'webrtc_session_{session_id}',
+                    {
+                        'type': 'notify_host_new_request',
+                        'participant_id': participant.id,
+                        'user_name': request.user.name,
+                        'user_id': request.user.id
+                    }
+                )
+                logger.debug(f"Sent real-time notification to host for participant {participant.id}")
+            except Exception as e:
+                logger.warning(f"Failed to send real-time notification: {e}")
 
             # Return pending status to user
             return Response(
@@ -1585,16 +1580,25 @@ class JoinSessionView(APIView):
                 status=status.HTTP_202_ACCEPTED
             )
 
-        except Exception as e:
-            print(f"DEBUG: Exception in join session: {str(e)}")
-            print(f"DEBUG: Exception type: {type(e)}")
-            import traceback
-            print(f"DEBUG: Traceback: {traceback.format_exc()}")
+        except Exception:
+            logger.exception(f"Error joining session {session_id}")
             return Response(
                 {'error': 'Internal server error'}, 
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
+    def no_seat_response(self, session):
+        session.refresh_from_db(fields=['status'])
+        if session.status not in FocusBuddySession.JOINABLE_STATUSES:
+            return Response(
+                {'error': f'Cannot join session in {session.status} status'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return Response(
+            {'error': 'Session is full'}, 
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
 
 
 class LeaveSessionView(APIView):
@@ -1605,34 +1609,23 @@ class LeaveSessionView(APIView):
         user = request.user
 
         # ✅ If creator leaves → end session directly
-        if session.creator_id == user.id:
-            print("DEBUG: Creator is leaving — ending session.")
-
-            try:
-                participant = FocusBuddyParticipant.objects.get(
-                    session=session,
-                    user=user,
-                    left_at__isnull=True
-                )
-            except FocusBuddyParticipant.DoesNotExist:
+        if session.creator_id_id == user.id:
+            if not FocusBuddyParticipant.objects.filter(
+                session=session,
+                user=user,
+                left_at__isnull=True
+            ).exists():
                 return Response(
                     {"error": "Creator is not in the participant list"},
                     status=status.HTTP_400_BAD_REQUEST
                 )
 
-            with transaction.atomic():
-                # Mark creator as left
-                participant.leave_session()
-
-                # End session regardless of other participants
-                session.end_session('completed')
-
-                FocusBuddyMessage.objects.create(
-                    session=session,
-                    sender=user,
-                    message=f"{user.name} (creator) ended the session by leaving",
-                    is_system_message=True
-                )
+            # Ends the session and marks every open participant (creator included) as left
+            session.end_session(
+                'completed',
+                message=f"{user.name} (creator) ended the session by leaving",
+                sender=user
+            )
 
             return Response(
                 {"message": "Session ended because the creator left"},
@@ -1653,7 +1646,12 @@ class LeaveSessionView(APIView):
             )
 
         with transaction.atomic():
-            participant.leave_session()
+            if not participant.leave_session():
+                # A concurrent request already marked them as left
+                return Response(
+                    {"error": "You are not currently in this session"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
 
             FocusBuddyMessage.objects.create(
                 session=session,
@@ -1845,20 +1843,14 @@ class SessionStatsView(APIView):
     
     def get(self, request):
         """Get general session statistics"""
-        # Active sessions count
-        active_sessions = FocusBuddySession.objects.filter(status='active')
-        
-        # Clean up expired sessions
-        for session in active_sessions:
-            if session.is_expired:
-                session.end_session('expired')
-        
-        # Refresh active sessions after cleanup
-        active_sessions = FocusBuddySession.objects.filter(status='active')
+        # Active sessions count (expired rows are ended by the expire_focus_sessions task)
+        now = timezone.now()
+        active_sessions = FocusBuddySession.objects.filter(status='active', ends_at__gt=now)
         
         # Total participants currently online
         total_participants = FocusBuddyParticipant.objects.filter(
             session__status='active',
+            session__ends_at__gt=now,
             left_at__isnull=True
         ).count()
         
@@ -1876,9 +1868,15 @@ class SessionStatsView(APIView):
             ).values_list('session_type', 'count')
         )
         
+        # Users connected to a call right now, from the presence registry
+        online_counts = PresenceRegistry.safe_counts(
+            active_sessions.values_list('id', flat=True)
+        )
+        
         stats_data = {
             'total_active_sessions': active_sessions.count(),
             'total_participants_online': total_participants,
+            'total_users_connected': sum(online_counts.values()),
             'sessions_by_duration': sessions_by_duration,
             'sessions_by_type': sessions_by_type
         }
@@ -2107,7 +2105,7 @@ class UserStatsAPIView(APIView):
         completed_tasks = Task.objects.filter(user=user, is_completed=True).count()
         
         # Calculate daily streak
-        daily_streak = self.calculate_daily_streak(user)
+        daily_streak, longest_streak = self.calculate_daily_streak(user)
         
         # Get mentor sessions if user is a mentor
         mentor_sessions = 0
@@ -2119,6 +2117,7 @@ class UserStatsAPIView(APIView):
             'focus_buddy_sessions': focus_buddy_count,
             'journals_created': journals_count,
             'daily_streak': daily_streak,
+            'longest_streak': longest_streak,
             'total_tasks': total_tasks,
             'completed_tasks': completed_tasks,
             'mentor_sessions': mentor_sessions
@@ -2132,44 +2131,34 @@ class UserStatsAPIView(APIView):
         })
     
     def calculate_daily_streak(self, user):
-        """Calculate user's daily streak based on activity"""
-        today = timezone.now().date()
-        current_date = today
-        streak = 0
-        
-        # Check each day going backwards
-        for i in range(365):  # Check up to 365 days
-            # Check if user had any activity on this date
-            has_activity = (
-                # Pomodoro sessions
-                PomodoroSession.objects.filter(
-                    task__user=user,
-                    start_time__date=current_date,
-                    is_completed=True
-                ).exists() or
-                # Journal entries
-                Journal.objects.filter(
-                    user=user,
-                    date=current_date
-                ).exists() or
-                # Focus buddy sessions
-                FocusBuddySession.objects.filter(
-                    creator_id=user,
-                    started_at__date=current_date
-                ).exists()
-            )
-            
-            if has_activity:
-                streak += 1
-                current_date -= timedelta(days=1)
-            else:
-                # If it's today and no activity, streak is 0
-                # If it's not today, break the streak
-                if current_date == today:
-                    streak = 0
-                break
-        
-        return streak
+        """Current and longest daily streak from the activity rollup (one query)"""
+        return get_streaks(user)
+
+
+class UserActivityCalendarAPIView(APIView):
+    """Daily activity counts for calendar heatmaps"""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        """Get per-day activity between ?start=YYYY-MM-DD and ?end=YYYY-MM-DD (default: last 365 days)"""
+        try:
+            end = datetime.strptime(request.GET['end'], '%Y-%m-%d').date() if 'end' in request.GET else timezone.localdate()
+            start = datetime.strptime(request.GET['start'], '%Y-%m-%d').date() if 'start' in request.GET else end - timedelta(days=364)
+        except ValueError:
+            return Response({'success': False, 'error': 'Dates must be in YYYY-MM-DD format'}, status=status.HTTP_400_BAD_REQUEST)
+
+        days = UserDailyActivity.objects.filter(
+            user=request.user, date__range=(start, end)
+        ).order_by('date').values('date', 'pomodoros', 'journals', 'focus_sessions', 'streak')
+
+        return Response({
+            'success': True,
+            'data': {
+                'start': start,
+                'end': end,
+                'days': list(days)
+            }
+        })
 
 
 class DeleteAccountAPIView(APIView):
@@ -2209,7 +2198,7 @@ class FocusBuddyHistoryListView(APIView):
         queryset = FocusBuddySession.objects.filter(
             Q(creator_id=user) |  # Sessions created by user
             Q(participants__user=user)  # Sessions user participated in
-        ).distinct().select_related('creator_id').prefetch_related('participants')
+        ).distinct().select_related('creator_id')
         
         # Optional filtering by status
         status_param = request.query_params.get('status', None)
@@ -2254,7 +2243,7 @@ class UserCreatedSessionsView(APIView):
         
         queryset = FocusBuddySession.objects.filter(
             creator_id=user
-        ).select_related('creator_id').prefetch_related('participants').order_by('-created_at')
+        ).select_related('creator_id').order_by('-created_at')
         
         # Optional filtering by status
         status_param = request.query_params.get('status', None)
@@ -2291,7 +2280,7 @@ class UserParticipatedSessionsView(APIView):
             participants__user=user
         ).exclude(
             creator_id=user
-        ).distinct().select_related('creator_id').prefetch_related('participants').order_by('-created_at')
+        ).distinct().select_related('creator_id').order_by('-created_at')
         
         # Optional filtering by status
         status_param = request.query_params.get('status', None)
@@ -2328,7 +2317,7 @@ class FocusBuddySessionDetailedView(APIView):
         try:
             session = FocusBuddySession.objects.filter(
                 Q(creator_id=user) | Q(participants__user=user)
-            ).distinct().select_related('creator_id').prefetch_related('participants').get(id=session_id)
+            ).distinct().select_related('creator_id').get(id=session_id)
         except FocusBuddySession.DoesNotExist:
             return Response(
                 {"error": "Session not found or you don't have permission to view it"}, 
@@ -2619,10 +2608,17 @@ class ApproveParticipantView(APIView):
         if session.creator_id != request.user:
             return Response({'error': 'Only the session creator can approve participants.'}, status=403)
         participant = get_object_or_404(FocusBuddyParticipant, id=participant_id, session=session)
-        if participant.status != 'pending':
+        # Conditional update so a double click cannot count the participant twice
+        # Participants who left, or whose session ended, gave their seat back already
+        updated = FocusBuddyParticipant.objects.filter(
+            id=participant.id, status='pending', left_at__isnull=True,
+            session__status__in=FocusBuddySession.JOINABLE_STATUSES
+        ).update(status='approved')
+        if not updated:
             return Response({'error': 'Participant is not pending approval.'}, status=400)
         participant.status = 'approved'
-        participant.save()
+        FocusBuddySession.participant_approved(session.id)
+        invalidate_session_access(session.id, participant.user_id)
         
         # Send real-time notification to host about updated request
         try:
@@ -2663,10 +2659,15 @@ class RejectParticipantView(APIView):
         if session.creator_id != request.user:
             return Response({'error': 'Only the session creator can reject participants.'}, status=403)
         participant = get_object_or_404(FocusBuddyParticipant, id=participant_id, session=session)
-        if participant.status != 'pending':
+        # Conditional update so a double click cannot release the seat twice
+        updated = FocusBuddyParticipant.objects.filter(
+            id=participant.id, status='pending', left_at__isnull=True
+        ).update(status='rejected')
+        if not updated:
             return Response({'error': 'Participant is not pending approval.'}, status=400)
         participant.status = 'rejected'
-        participant.save()
+        FocusBuddySession.release_seat(session.id)
+        invalidate_session_access(session.id, participant.user_id)
         
         # Send real-time notification to host about updated request
         try:
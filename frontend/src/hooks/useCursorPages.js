@@ -0,0 +1,26 @@
+import { useRef, useCallback } from 'react';
+
+// Admin lists are keyset paginated: each page response carries the
+// next_cursor that loads the page after it. Remembering the cursor per page
+// number lets Previous, Next and reloads fetch by cursor instead of by offset.
+export const useCursorPages = () => {
+  const cursors = useRef({});
+
+  // Query params for a page; page 1 starts a fresh walk (new search or filter)
+  const pageParams = useCallback((page) => {
+    if (page <= 1) {
+      cursors.current = {};
+      return { page: '1' };
+    }
+    const cursor = cursors.current[page];
+    return cursor ? { cursor, page: page.toString() } : { page: page.toString() };
+  }, []);
+
+  const rememberPage = useCallback((pagination) => {
+    if (pagination?.next_cursor) {
+      cursors.current[pagination.current_page + 1] = pagination.next_cursor;
+    }
+  }, []);
+
+  return { pageParams, rememberPage };
+};
@@ -5,6 +5,7 @@ import { Search, X, ChevronLeft, ChevronRight, Clock, Users, Eye, BarChart3 } fr
 import { adminAxios } from '../../utils/axios';
 import { toast } from "react-hot-toast";
 import debounce from "lodash/debounce";
+import { useCursorPages } from "../../hooks/useCursorPages";
 
 const AdminFocusSessions = () => {
   const [sessions, setSessions] = useState([]);
@@ -24,6 +25,8 @@ const AdminFocusSessions = () => {
     has_previous: false
   });
 
+  const { pageParams, rememberPage } = useCursorPages();
+
   const fetchSessions = async (query = "", page = 1, status = "all") => {
     try {
       setLoading(true);
@@ -32,13 +35,14 @@ const AdminFocusSessions = () => {
       // Build query parameters
       const params = new URLSearchParams();
       if (query) params.append('search', query);
-      params.append('page', page.toString());
+      Object.entries(pageParams(page)).forEach(([key, value]) => params.append(key, value));
       params.append('page_size', pagination.page_size.toString());
       if (status !== "all") params.append('status', status);
       
       const response = await adminAxios.get(`/sessions/?${params.toString()}`);
       setSessions(response.data.sessions);
       setPagination(response.data.pagination);
+      rememberPage(response.data.pagination);
       setError(null);
     } catch (err) {
       console.error('Error fetching sessions:', err);
@@ -9,6 +9,7 @@ import { useDispatch } from "react-redux";
 import { adminLogout } from "../../store/adminSlice";
 import debounce from "lodash/debounce";
 import ViewJournalModal from "../../components/admin/ViewJournalModal";
+import { useCursorPages } from "../../hooks/useCursorPages";
 
 const AdminJournals = () => {
   const navigate = useNavigate();
@@ -30,15 +31,18 @@ const AdminJournals = () => {
     has_previous: false
   });
 
+  const { pageParams, rememberPage } = useCursorPages();
+
   const fetchJournals = async (query = "", page = 1) => {
     try {
       setLoading(true);
       setIsSearching(true);
       const response = await adminAxios.get(
-        `/journals/?search=${query}&page=${page}&page_size=${pagination.page_size}`
+        `/journals/?search=${query}&${new URLSearchParams(pageParams(page))}&page_size=${pagination.page_size}`
       );
       setJournals(response.data.journals);
       setPagination(response.data.pagination);
+      rememberPage(response.data.pagination);
       setError(null);
     } catch (err) {
       setError("Failed to fetch journals. Please try again.");
@@ -18,6 +18,7 @@ import {
 import { Button } from "../../components/ui/button";
 import { Input } from "../../components/ui/input";
 import { adminAxios } from "../../utils/axios";
+import { useCursorPages } from "../../hooks/useCursorPages";
 
 const Card = ({ children, className = "" }) => (
   <div className={`border border-gray-200 rounded-lg shadow-sm ${className}`}>
@@ -207,13 +208,15 @@ const AdminMentorsApproval = () => {
     info: (message) => addToast(message, 'info')
   };
 
+  const { pageParams, rememberPage } = useCursorPages();
+
   const fetchMentors = async (query = "", page = 1, status = "pending") => {
     try {
       setLoading(true);
       setIsSearching(true);
       
       const params = new URLSearchParams({
-        page: page.toString(),
+        ...pageParams(page),
         page_size: pagination.page_size.toString(),
         status: status,
       });
@@ -226,6 +229,7 @@ const AdminMentorsApproval = () => {
       
       setMentors(response.data.mentors || []);
       setPagination(response.data.pagination || pagination);
+      rememberPage(response.data.pagination);
       setError(null);
     } catch (err) {
       setError(`Failed to fetch mentor applications: ${err.response?.data?.error || err.message}`);
@@ -9,6 +9,7 @@ import { adminLogout } from "../../store/adminSlice";
 import EditUserModal from "../../components/admin/EditUserModal";
 import { useSimpleToast } from "../../components/ui/toast";
 import debounce from "lodash/debounce";
+import { useCursorPages } from "../../hooks/useCursorPages";
 
 const AdminUsers = () => {
   const navigate = useNavigate();
@@ -31,15 +32,18 @@ const AdminUsers = () => {
     has_previous: false
   });
 
+  const { pageParams, rememberPage } = useCursorPages();
+
   const fetchUsers = async (query = "", page = 1, mentorFilter = false) => {
     try {
       setLoading(true);
       setIsSearching(true);
       const response = await adminAxios.get(
-        `/users/?search=${query}&page=${page}&page_size=${pagination.page_size}&mentor_only=${mentorFilter}`
+        `/users/?search=${query}&${new URLSearchParams(pageParams(page))}&page_size=${pagination.page_size}&mentor_only=${mentorFilter}`
       );
       setUsers(response.data.users);
       setPagination(response.data.pagination);
+      rememberPage(response.data.pagination);
       setError(null);
     } catch (err) {
       setError("Failed to fetch users. Please try again.");
@@ -247,6 +247,9 @@ class WebRTCService {
                 }
                 // ======================
 
+                // Ask the server to batch trickle ICE candidates into 'ice-candidates' frames
+                wsUrl += (wsUrl.includes('?') ? '&' : '?') + 'ice_batching=1';
+
                 console.log('WebSocket URL:', wsUrl);
                 console.log('Current location:', window.location.href);
                 console.log('Protocol:', window.location.protocol);
@@ -497,6 +500,11 @@ class WebRTCService {
                 case 'ice-candidate':
                     await this.handleIceCandidate(message.candidate, message.sender_id);
                     break;
+                case 'ice-candidates':
+                    for (const candidate of message.candidates) {
+                        await this.handleIceCandidate(candidate, message.sender_id);
+                    }
+                    break;
                 case 'media-state-changed':
                     this.emit('peerMediaStateChanged', {
                         videoEnabled: message.video_enabled,